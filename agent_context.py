@@ -0,0 +1,110 @@
+# Conversation context for the agent loop
+#
+# The agent used to rebuild its prompt by appending the whole history to the
+# previous query on every iteration, so each tool result was re-sent again and
+# again and the prompt grew quadratically. ConversationContext keeps the turns
+# in an append-only list, renders each one exactly once and folds the oldest
+# turns into short summaries once a token budget is reached.
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def _shorten(text, limit):
+    """Trim text to limit characters, keeping the head and the tail"""
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    keep = max(limit - 5, 2) // 2
+    return f"{text[:keep]} ... {text[-keep:]}"
+
+
+class Turn:
+    """A single completed step of the agent loop"""
+
+    __slots__ = ("iteration", "text", "summary")
+
+    def __init__(self, iteration, text, summary):
+        self.iteration = iteration
+        self.text = text
+        self.summary = summary
+
+
+class ConversationContext:
+    """Append-only conversation history rendered under a token budget"""
+
+    def __init__(self, query, max_tokens=3000, keep_recent=3, summary_chars=120):
+        self.query = query
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summary_chars = summary_chars
+        self.turns = []
+        self.prompt_sizes = []
+
+    def add_turn(self, iteration, text, func_name=None, arguments=None, result=None):
+        """Record a completed step. The summary is used once the turn gets old."""
+        if func_name is not None:
+            summary = f"{func_name}({_shorten(arguments, self.summary_chars // 2)}) -> {_shorten(result, self.summary_chars)}"
+        else:
+            summary = _shorten(text, self.summary_chars)
+        self.turns.append(Turn(iteration, text, summary))
+
+    def _history_lines(self, budget):
+        """Return the history lines that fit in budget tokens, newest turns verbatim where they fit"""
+        recent = self.turns[-self.keep_recent:] if self.keep_recent else []
+        older = self.turns[:len(self.turns) - len(recent)]
+
+        lines = [turn.text for turn in recent]
+        used = sum(estimate_tokens(line) for line in lines)
+
+        # Drop verbatim turns (oldest first) if even the recent ones are too big
+        while len(lines) > 1 and used > budget:
+            older = older + [recent.pop(0)]
+            used -= estimate_tokens(lines.pop(0))
+
+        # The newest turn alone can still be too big: keep its head and tail
+        if lines and used > budget:
+            lines[0] = _shorten(lines[0], budget * 4)
+            used = estimate_tokens(lines[0])
+
+        # Summaries for older turns, newest first, until the budget runs out
+        summaries = []
+        for turn in reversed(older):
+            line = f"- step {turn.iteration}: {turn.summary}"
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            summaries.insert(0, line)
+            used += cost
+
+        dropped = len(older) - len(summaries)
+        header = []
+        if dropped:
+            header.append(f"({dropped} earlier steps omitted)")
+        if summaries:
+            header.append("Earlier steps (summarized):")
+        return header + summaries + lines
+
+    def render(self, system_prompt=""):
+        """Build the full prompt for the next LLM call and record its size"""
+        if not self.turns:
+            current_query = self.query
+        else:
+            budget = self.max_tokens - estimate_tokens(system_prompt) - estimate_tokens(self.query)
+            history = "\n".join(self._history_lines(max(budget, 0)))
+            current_query = f"{self.query}\n\n{history}\n\nWhat should I do next?"
+
+        prompt = f"{system_prompt}\n\nQuery: {current_query}" if system_prompt else current_query
+        self.prompt_sizes.append((len(prompt), estimate_tokens(prompt)))
+        return prompt
+
+    def report(self):
+        """Human readable line describing the last rendered prompt"""
+        if not self.prompt_sizes:
+            return "Prompt size: no prompt rendered yet"
+        chars, tokens = self.prompt_sizes[-1]
+        total = sum(t for _, t in self.prompt_sizes)
+        return (f"Prompt size: {chars} chars (~{tokens} tokens), "
+                f"{len(self.turns)} turns in history, ~{total} tokens sent so far")
@@ -0,0 +1,77 @@
+# Per-iteration timing of the agent loop
+#
+# run_agent records where each iteration spends its time: building the
+# prompt, waiting for the model, tool round trips and formatting results.
+# The numbers are cheap to collect and are what the agent-loop benchmark
+# reports.
+import time
+
+
+class ToolCallMetrics:
+    __slots__ = ("name", "round_trip_s", "format_s", "result_bytes", "speculated")
+
+    def __init__(self, name, round_trip_s, format_s, result_bytes, speculated=False):
+        self.name = name
+        self.round_trip_s = round_trip_s
+        self.format_s = format_s
+        self.result_bytes = result_bytes
+        self.speculated = speculated  # the result came from a speculative call
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class IterationMetrics:
+    __slots__ = ("iteration", "prompt_build_s", "prompt_bytes", "llm_s", "tool_calls", "dispatch_s", "turn_format_s")
+
+    def __init__(self, iteration):
+        self.iteration = iteration
+        self.prompt_build_s = 0.0
+        self.prompt_bytes = 0
+        self.llm_s = 0.0
+        self.tool_calls = []
+        self.dispatch_s = 0.0
+        self.turn_format_s = 0.0
+
+    def to_dict(self):
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        data["tool_calls"] = [call.to_dict() for call in self.tool_calls]
+        return data
+
+
+class RunMetrics:
+    """Timings for one query run through the agent loop"""
+
+    def __init__(self, query):
+        self.query = query
+        self.iterations = []
+        self.final_answer = None
+        self.error = None
+        self.total_s = 0.0
+        self._start = time.perf_counter()
+
+    def start_iteration(self, iteration):
+        metrics = IterationMetrics(iteration)
+        self.iterations.append(metrics)
+        return metrics
+
+    @property
+    def current(self):
+        return self.iterations[-1] if self.iterations else None
+
+    def record_tool_call(self, name, round_trip_s, format_s, result_bytes, speculated=False):
+        if self.current is not None:
+            self.current.tool_calls.append(ToolCallMetrics(name, round_trip_s, format_s, result_bytes, speculated))
+
+    def finish(self):
+        self.total_s = time.perf_counter() - self._start
+        return self
+
+    def to_dict(self):
+        return {
+            "query": self.query,
+            "final_answer": self.final_answer,
+            "error": self.error,
+            "total_s": self.total_s,
+            "iterations": [iteration.to_dict() for iteration in self.iterations],
+        }
@@ -0,0 +1,181 @@
+# Persistent automation bridge for the Keynote tools
+#
+# Spawning osascript for every script costs a process start plus an
+# AppleScript compile each time, and the tools used to follow every call with
+# a fixed sleep because they couldn't tell when the work was done. The bridge
+# starts one long-lived interpreter (automation_host.js under osascript) and
+# talks to it over a JSON-lines pipe with asyncio subprocess I/O: every script
+# gets an id, and the call returns when the host acknowledges that id, or
+# fails after a timeout.
+#
+# Configuration:
+#   AUTOMATION_INTERPRETER   command line of the interpreter to run instead of
+#                            osascript, e.g. a stub speaking the same protocol
+#                            (see benchmarks/automation_stub.py) for Linux
+#   AUTOMATION_TIMEOUT       seconds to wait for one script (30)
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shlex
+import shutil
+import sys
+
+logger = logging.getLogger("paint_mcp.automation")
+
+HOST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "automation_host.js")
+START_TIMEOUT = 10
+
+
+class AutomationError(RuntimeError):
+    """The interpreter reported an error for a script"""
+
+
+class AutomationTimeout(AutomationError, TimeoutError):
+    """No acknowledgement arrived within the timeout"""
+
+
+def interpreter_command():
+    """The interpreter command line, or None if none is available on this machine"""
+    configured = os.getenv("AUTOMATION_INTERPRETER")
+    if configured:
+        return shlex.split(configured)
+    if sys.platform == "darwin" and shutil.which("osascript"):
+        return ["osascript", "-l", "JavaScript", HOST_SCRIPT]
+    return None
+
+
+class AutomationBridge:
+    """One long-lived interpreter process, fed scripts over a pipe"""
+
+    def __init__(self, command, timeout=30.0):
+        self.command = command
+        self.timeout = timeout
+        self._process = None
+        self._reader = None
+        self._pending = {}  # request id -> future
+        self._ids = itertools.count(1)
+        self._start_lock = asyncio.Lock()
+        self.starts = 0
+
+    @classmethod
+    def from_env(cls):
+        command = interpreter_command()
+        if command is None:
+            raise AutomationError("No automation interpreter: needs macOS with osascript, or AUTOMATION_INTERPRETER")
+        return cls(command, timeout=float(os.getenv("AUTOMATION_TIMEOUT", "30")))
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.returncode is None
+
+    async def _ensure_started(self):
+        async with self._start_lock:
+            if self.running:
+                return
+            self._process = await asyncio.create_subprocess_exec(
+                *self.command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+            )
+            self.starts += 1
+            self._pending = {}  # each interpreter gets its own table, see _read_responses
+            try:
+                ready = await asyncio.wait_for(self._process.stdout.readline(), START_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self._kill()
+                raise AutomationTimeout(f"Automation interpreter did not start within {START_TIMEOUT}s") from None
+            try:
+                started = bool(ready) and json.loads(ready).get("ready") is True
+            except ValueError:
+                started = False
+            if not started:
+                await self._kill()
+                raise AutomationError(f"Automation interpreter failed to start: {ready!r}")
+            self._reader = asyncio.get_running_loop().create_task(self._read_responses(self._process, self._pending))
+            logger.info("automation interpreter started", extra={"command": self.command, "pid": self._process.pid})
+
+    async def _read_responses(self, process, pending):
+        """Resolve pending calls from the interpreter's acknowledgements"""
+        try:
+            while line := await process.stdout.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logger.warning("unparseable automation response: %r", line)
+                    continue
+                future = pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if message.get("ok"):
+                    future.set_result(message.get("result"))
+                else:
+                    future.set_exception(AutomationError(message.get("error") or "Automation script failed"))
+        finally:
+            # The interpreter exited: fail everything still waiting on it
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(AutomationError("Automation interpreter exited"))
+            pending.clear()
+
+    async def run(self, script, timeout=None):
+        """Run one script and return its result once the interpreter acknowledges it"""
+        await self._ensure_started()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending
+        pending[request_id] = future
+        self._process.stdin.write((json.dumps({"id": request_id, "script": script}) + "\n").encode("utf-8"))
+        try:
+            await self._process.stdin.drain()
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # The interpreter may be stuck in the script: start a fresh one next time
+            await self._kill()
+            raise AutomationTimeout(f"Automation script timed out after {timeout or self.timeout}s") from None
+        except (BrokenPipeError, ConnectionResetError):
+            await self._kill()
+            raise AutomationError("Automation interpreter exited") from None
+        finally:
+            pending.pop(request_id, None)
+
+    async def _kill(self):
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+
+    async def close(self, timeout=5):
+        """Close stdin so the interpreter exits, killing it if it doesn't"""
+        process = self._process
+        if process is None:
+            return
+        if process.returncode is None:
+            process.stdin.close()
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        await self._kill()
+
+
+_bridge = None
+
+
+def get_bridge():
+    """The process-wide bridge, created on first use"""
+    global _bridge
+    if _bridge is None:
+        _bridge = AutomationBridge.from_env()
+    return _bridge
+
+
+async def shutdown():
+    global _bridge
+    if _bridge is not None:
+        await _bridge.close()
+        _bridge = None
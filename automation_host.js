@@ -0,0 +1,58 @@
+// Long-lived automation host for automation_bridge.py
+//
+// Started once as `osascript -l JavaScript automation_host.js`. Reads one JSON
+// request per line from stdin, {"id": n, "script": "<AppleScript source>"},
+// runs the script in this process with NSAppleScript and answers each request
+// with one JSON line once the script has finished:
+//   {"id": n, "ok": true, "result": "..."}
+//   {"id": n, "ok": false, "error": "..."}
+// A {"ready": true} line is written first so the bridge knows it is up.
+ObjC.import("Foundation");
+
+function run() {
+    const input = $.NSFileHandle.fileHandleWithStandardInput;
+    const output = $.NSFileHandle.fileHandleWithStandardOutput;
+
+    function write(message) {
+        const line = $(JSON.stringify(message) + "\n");
+        output.writeData(line.dataUsingEncoding($.NSUTF8StringEncoding));
+    }
+
+    function handle(line) {
+        let request;
+        try {
+            request = JSON.parse(line);
+        } catch (e) {
+            write({id: null, ok: false, error: "Malformed request: " + e});
+            return;
+        }
+        const script = $.NSAppleScript.alloc.initWithSource($(request.script));
+        const error = Ref();
+        const result = script.executeAndReturnError(error);
+        if (result.isNil()) {
+            const info = ObjC.deepUnwrap(error[0]) || {};
+            write({id: request.id, ok: false, error: info.NSAppleScriptErrorMessage || "AppleScript error"});
+            return;
+        }
+        const text = result.stringValue;
+        write({id: request.id, ok: true, result: text.isNil() ? null : text.js});
+    }
+
+    write({ready: true});
+    let buffer = "";
+    while (true) {
+        const data = input.availableData;
+        if (data.length === 0) {
+            break;  // stdin closed: the bridge is shutting down
+        }
+        buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+        let newline;
+        while ((newline = buffer.indexOf("\n")) >= 0) {
+            const line = buffer.slice(0, newline);
+            buffer = buffer.slice(newline + 1);
+            if (line.trim()) {
+                handle(line);
+            }
+        }
+    }
+}
@@ -0,0 +1,44 @@
+# Vectorized math for the batch tools
+#
+# The scalar tools (sin, cos, log, ...) take one value per MCP call. These
+# helpers process a whole array in a single NumPy pass so the agent can send
+# all values at once.
+import math
+
+import numpy as np
+
+ELEMENTWISE_OPS = {
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "log": np.log,
+    "sqrt": np.sqrt,
+    "cbrt": np.cbrt,
+    "exp": np.exp,
+}
+
+
+def apply_elementwise(op, values):
+    """Apply a named elementwise operation to every value in one vectorized pass"""
+    func = ELEMENTWISE_OPS.get(op)
+    if func is None:
+        raise ValueError(f"Unknown operation {op!r}, expected one of {sorted(ELEMENTWISE_OPS)}")
+    arr = np.asarray(values, dtype=np.float64)
+    # Match the scalar tools, which raise instead of returning nan/inf
+    with np.errstate(invalid="raise", divide="raise", over="raise"):
+        try:
+            return func(arr).tolist()
+        except FloatingPointError as e:
+            raise ValueError(f"{op} is undefined or overflows for some of the values: {e}") from None
+
+
+def power_batch(bases, exponent):
+    """Raise every base to exponent, exactly like the scalar power tool"""
+    if not bases:
+        return []
+    largest = max(abs(int(b)) for b in bases)
+    # Stay in int64 while the results are guaranteed to fit, else use Python ints
+    if exponent >= 0 and (largest <= 1 or exponent * math.log2(largest) < 62):
+        return np.power(np.asarray(bases, dtype=np.int64), exponent).tolist()
+    return [int(b) ** exponent for b in bases]
+
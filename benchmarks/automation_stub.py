@@ -0,0 +1,59 @@
+# Stand-in automation interpreter for running the Keynote tools on Linux
+#
+# Speaks the automation_host.js protocol (a {"ready": true} line, then one
+# JSON acknowledgement per JSON request line) without running anything.
+# Point the server at it with
+#   AUTOMATION_INTERPRETER="python benchmarks/automation_stub.py"
+# Options:
+#   --delay S       pretend each script takes S seconds
+#   --log FILE      append every received script to FILE
+#   -e SCRIPT       handle one script given on the command line and exit,
+#                   like `osascript -e` (used to time per-call spawning)
+#
+# A script containing "error " followed by a quoted message is answered with
+# that message as an error, so failure paths can be exercised too.
+import argparse
+import json
+import re
+import sys
+import time
+
+
+def answer(request_id, script, delay, log):
+    if log:
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": request_id, "script": script}) + "\n")
+    if delay:
+        time.sleep(delay)
+    error = re.search(r'\berror "([^"]*)"', script)
+    if error:
+        return {"id": request_id, "ok": False, "error": error.group(1)}
+    return {"id": request_id, "ok": True, "result": "ok"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub automation interpreter")
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--log")
+    parser.add_argument("-e", dest="script")
+    args = parser.parse_args()
+
+    if args.script is not None:
+        answer(None, args.script, args.delay, args.log)
+        return
+
+    print(json.dumps({"ready": True}), flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {"id": None, "ok": False, "error": f"Malformed request: {e}"}
+        else:
+            response = answer(request.get("id"), request.get("script", ""), args.delay, args.log)
+        print(json.dumps(response), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# End-to-end benchmark of the agent loop with a deterministic fake LLM
+#
+# Runs the example queries from talk2mcp-2.py through run_agent against the
+# real example2.py server, with ScriptedLLM replaying a fixed conversation per
+# query instead of calling Gemini. Model latency is therefore ~0 and what is
+# left is the client's own overhead: prompt building, tool round trips over
+# stdio and result formatting.
+#
+# Usage: python benchmarks/bench_agent_loop.py [--repeat 3] [--transport stdio|inprocess] [--extra]
+#                                              [--json out.json] [--compare old.json]
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+
+os.environ["LLM_CACHE_MODE"] = "off"
+
+from harness import EXTRA_SCRIPTS, ROOT, SCRIPTS, ScriptedLLM, git_revision, load_agent  # noqa: E402
+
+SERVER = os.path.join(ROOT, "example2.py")
+
+FIELDS = ("prompt_build_s", "llm_s", "dispatch_s", "turn_format_s")
+
+
+async def run_suite(agent, repeat, transport, extra=False):
+    """Run every scripted query `repeat` times over one server session"""
+    suite = list(zip(agent.EXAMPLE_QUERIES, SCRIPTS)) + (EXTRA_SCRIPTS if extra else [])
+    runs = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with agent.open_session(transport, command=sys.executable, server_script=SERVER) as session:
+            catalog, system_prompt = await agent.prepare_session(session)
+            for _ in range(repeat):
+                for query, script in suite:
+                    metrics = await agent.run_agent(session, catalog, system_prompt, query, ScriptedLLM(script))
+                    runs.append(metrics.to_dict())
+    return runs
+
+
+def summarize(runs):
+    iterations = [it for run in runs for it in run["iterations"]]
+    calls = [call for it in iterations for call in it["tool_calls"]]
+    summary = {
+        "queries": len(runs),
+        "errors": sum(1 for run in runs if run["error"]),
+        "iterations": len(iterations),
+        "tool_calls": len(calls),
+        "total_median_s": statistics.median(run["total_s"] for run in runs),
+        "total_sum_s": sum(run["total_s"] for run in runs),
+        "prompt_bytes_median": statistics.median(it["prompt_bytes"] for it in iterations),
+    }
+    for field in FIELDS:
+        summary[f"{field}_median"] = statistics.median(it[field] for it in iterations)
+    if calls:
+        summary["round_trip_median_s"] = statistics.median(call["round_trip_s"] for call in calls)
+        summary["format_median_s"] = statistics.median(call["format_s"] for call in calls)
+    return summary
+
+
+def print_summary(summary):
+    print(f"{summary['queries']} queries, {summary['iterations']} iterations, {summary['tool_calls']} tool calls, {summary['errors']} errors")
+    print(f"{'metric':<26}{'median':>12}")
+    for key, value in summary.items():
+        if key.endswith("_s") or key.endswith("_s_median") or key.endswith("_median"):
+            if key == "prompt_bytes_median":
+                print(f"{key:<26}{value:>10.0f} B")
+            else:
+                print(f"{key:<26}{value * 1e3:>10.3f}ms")
+
+
+def compare(summary, old_path):
+    with open(old_path) as f:
+        old = json.load(f)["summary"]
+    print(f"\nComparison with {old_path}:")
+    print(f"{'metric':<26}{'old':>12}{'new':>12}{'change':>10}")
+    for key, new_value in summary.items():
+        old_value = old.get(key)
+        if not isinstance(new_value, float) or not old_value:
+            continue
+        change = (new_value - old_value) / old_value * 100
+        print(f"{key:<26}{old_value:>12.6g}{new_value:>12.6g}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop with scripted LLM responses")
+    parser.add_argument("--repeat", type=int, default=3, help="times to run the whole query suite")
+    parser.add_argument("--transport", choices=("stdio", "inprocess"), default="stdio")
+    parser.add_argument("--extra", action="store_true", help="also run EXTRA_SCRIPTS (changes the workload)")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    parser.add_argument("--compare", help="compare against results saved earlier with --json")
+    args = parser.parse_args()
+
+    agent = load_agent()
+    runs = asyncio.run(run_suite(agent, args.repeat, args.transport, args.extra))
+    summary = summarize(runs)
+    print_summary(summary)
+    for run in runs[:len(SCRIPTS) + (len(EXTRA_SCRIPTS) if args.extra else 0)]:
+        if run["error"]:
+            print(f"ERROR in {run['query']!r}: {run['error']}")
+
+    if args.compare:
+        compare(summary, args.compare)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "agent_loop", "transport": args.transport, "extra": args.extra, "commit": git_revision(), "summary": summary, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Cost of drawing a rectangle plus text: per-call spawns vs. the bridge
+#
+# The old Keynote tools ran osascript once to activate Keynote and once for
+# the action, and slept 0.5s after each, so a rectangle plus its text was
+# four process spawns and two seconds of fixed waiting. The bridge sends one
+# script per tool to a long-lived interpreter and returns on acknowledgement.
+# Both paths use benchmarks/automation_stub.py as the interpreter, so this
+# runs on Linux; --script-delay simulates the time Keynote itself needs.
+#
+# Usage: python benchmarks/bench_automation.py [--runs 5] [--script-delay 0.02] [--json out.json]
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from harness import ROOT, git_revision
+
+from automation_bridge import AutomationBridge
+
+STUB = os.path.join(ROOT, "benchmarks", "automation_stub.py")
+SLEEP_AFTER_SCRIPT = 0.5  # what the old tools waited after each osascript call
+
+
+async def spawn_per_call(delay, sleeps):
+    """The old flow: activate + action for each tool, each a new process"""
+    start = time.perf_counter()
+    for _ in range(4):  # activate, rectangle, activate, text
+        subprocess.run([sys.executable, STUB, "--delay", str(delay), "-e", "script"], check=True)
+        if sleeps:
+            await asyncio.sleep(SLEEP_AFTER_SCRIPT)
+    return time.perf_counter() - start
+
+
+async def bridged(bridge):
+    """The new flow: one acknowledged script per tool"""
+    start = time.perf_counter()
+    await bridge.run("rectangle")
+    await bridge.run("text")
+    return time.perf_counter() - start
+
+
+async def measure(runs, delay):
+    results = {"spawn_with_sleeps": [], "spawn_only": [], "bridge": []}
+    bridge = AutomationBridge([sys.executable, STUB, "--delay", str(delay)])
+    start = time.perf_counter()
+    await bridge.run("warm up")
+    bridge_start_s = time.perf_counter() - start
+    try:
+        for _ in range(runs):
+            results["spawn_with_sleeps"].append(await spawn_per_call(delay, sleeps=True))
+            results["spawn_only"].append(await spawn_per_call(delay, sleeps=False))
+            results["bridge"].append(await bridged(bridge))
+    finally:
+        await bridge.close()
+    return results, bridge_start_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-call interpreter spawns with the automation bridge")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--script-delay", type=float, default=0.02, help="simulated seconds per script")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results, bridge_start_s = asyncio.run(measure(args.runs, args.script_delay))
+    summary = {name: statistics.median(samples) for name, samples in results.items()}
+    for name, median in summary.items():
+        print(f"{name:<20}{median * 1e3:>10.1f}ms per rectangle + text")
+    print(f"bridge start (once per server): {bridge_start_s * 1e3:.1f}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "automation",
+                "commit": git_revision(),
+                "script_delay": args.script_delay,
+                "median_s": summary,
+                "bridge_start_s": bridge_start_s,
+                "samples": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
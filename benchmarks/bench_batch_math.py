@@ -0,0 +1,70 @@
+# Micro-benchmark: per-element scalar calls vs the vectorized batch path
+#
+# Usage: python benchmarks/bench_batch_math.py [--sizes 10 1000 100000] [--json out.json]
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import batch_math  # noqa: E402
+import math_tools  # noqa: E402
+
+SCALAR_OPS = {
+    "sin": lambda a: float(math.sin(a)),
+    "cos": lambda a: float(math.cos(a)),
+    "log": lambda a: float(math.log(a)),
+    "sqrt": lambda a: float(a ** 0.5),
+    "cbrt": lambda a: float(a ** (1/3)),
+}
+
+
+def best_of(func, repeat):
+    """Best wall-clock time of repeat runs, in seconds"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-element math calls with the batch tools")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        values = [random.uniform(1, 1000) for _ in range(size)]
+        for op, scalar in SCALAR_OPS.items():
+            per_element = best_of(lambda: [scalar(v) for v in values], args.repeat)
+            batch = best_of(lambda: batch_math.apply_elementwise(op, values), args.repeat)
+            results.append({"op": op, "size": size, "per_element_s": per_element, "batch_s": batch,
+                            "speedup": per_element / batch if batch else None})
+
+        ints = [random.randint(1, 200) for _ in range(size)]
+        naive = best_of(lambda: sum(math.exp(i) for i in ints), args.repeat)
+        stable = best_of(lambda: math_tools.exponential_sum(ints), args.repeat)
+        results.append({"op": "exponential_sum", "size": size, "per_element_s": naive, "batch_s": stable,
+                        "speedup": naive / stable if stable else None})
+
+    print(f"{'op':<16}{'size':>9}{'per-element':>14}{'batch':>12}{'speedup':>10}")
+    for r in results:
+        print(f"{r['op']:<16}{r['size']:>9}{r['per_element_s'] * 1e3:>12.3f}ms{r['batch_s'] * 1e3:>10.3f}ms{r['speedup']:>9.1f}x")
+
+    # The scalar path over MCP also pays one tool round trip per element,
+    # which this benchmark leaves out; the real gap is larger.
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "batch_math", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Cold-start benchmark for the example2.py server
+#
+# Measures the time from spawning the server process to a completed
+# initialize and list_tools, the cost talk2mcp-2.py pays on every run.
+#
+# Usage: python benchmarks/bench_cold_start.py [--runs 10] [--json out.json] [--importtime]
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SERVER = os.path.join(ROOT, "example2.py")
+
+
+async def cold_start():
+    """Spawn one server and return (initialize_s, list_tools_s, tool_count)"""
+    params = StdioServerParameters(command=sys.executable, args=[SERVER], cwd=ROOT)
+    start = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            initialized = time.perf_counter()
+            tools = (await session.list_tools()).tools
+            listed = time.perf_counter()
+    return initialized - start, listed - start, len(tools)
+
+
+def import_profile(top):
+    """Print the slowest imports of example2 by cumulative time (python -X importtime)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import example2"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self_us |   cumulative_us | name"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure example2.py spawn-to-list_tools latency")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    parser.add_argument("--importtime", action="store_true", help="also show the slowest imports")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        samples.append(asyncio.run(cold_start()))
+
+    init = [s[0] for s in samples]
+    listed = [s[1] for s in samples]
+    summary = {
+        "benchmark": "cold_start",
+        "runs": args.runs,
+        "tools": samples[-1][2],
+        "initialize_median_s": statistics.median(init),
+        "initialize_min_s": min(init),
+        "list_tools_median_s": statistics.median(listed),
+        "list_tools_min_s": min(listed),
+        "samples": [{"initialize_s": i, "list_tools_s": l} for i, l, _ in samples],
+    }
+    print(f"Tools registered: {summary['tools']}")
+    print(f"spawn -> initialize: median {summary['initialize_median_s'] * 1e3:.1f}ms, min {summary['initialize_min_s'] * 1e3:.1f}ms")
+    print(f"spawn -> list_tools: median {summary['list_tools_median_s'] * 1e3:.1f}ms, min {summary['list_tools_min_s'] * 1e3:.1f}ms")
+
+    if args.importtime:
+        import_profile(15)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Tool-call throughput with print(), queued logging and logging disabled
+#
+# The stdio server's output goes to a pipe that the other side drains at its
+# own pace. The benchmark calls a math tool in a loop while its log lines go
+# to a pipe whose reader is deliberately slow (--drain-kbps):
+#   print     the old print("CALLED: ...") in the tool body, line buffered
+#   queued    server_log's QueueHandler; the listener thread does the writing
+#   disabled  SERVER_LOG_TOOL_CALLS off, the tool is called unwrapped
+#
+# Usage: python benchmarks/bench_logging.py [--calls 20000] [--drain-kbps 64] [--json out.json]
+import argparse
+import io
+import json
+import os
+import threading
+import time
+
+from harness import git_revision
+
+import math_tools
+import server_log
+
+
+def slow_pipe(drain_kbps):
+    """A line-buffered text stream whose reader drains drain_kbps KiB/s"""
+    read_fd, write_fd = os.pipe()
+    chunk = 4096
+    pause = chunk / (drain_kbps * 1024)
+
+    def drain():
+        with os.fdopen(read_fd, "rb", buffering=0) as reader:
+            while reader.read(chunk):
+                time.sleep(pause)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    return io.TextIOWrapper(os.fdopen(write_fd, "wb"), line_buffering=True), thread
+
+
+def printing(stream):
+    def remainder(a: int, b: int) -> int:
+        print("CALLED: remainder(a: int, b: int) -> int:", file=stream)
+        return math_tools.remainder(a, b)
+    return remainder
+
+
+def run(tool, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        tool(a=i, b=7)
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tool-call throughput under different logging setups")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--drain-kbps", type=float, default=64, help="speed of the slow reader in KiB/s")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results = {}
+
+    stream, _ = slow_pipe(args.drain_kbps)
+    results["print"] = run(printing(stream), args.calls)
+
+    stream, _ = slow_pipe(args.drain_kbps)
+    server_log.setup(stream)
+    results["queued"] = run(server_log.logged_tool(math_tools.remainder), args.calls)
+    flush_start = time.perf_counter()
+    server_log.shutdown()  # waits for the listener to write out the backlog
+    flush_s = time.perf_counter() - flush_start
+
+    results["disabled"] = run(math_tools.remainder, args.calls)
+
+    for name, rate in results.items():
+        print(f"{name:<10}{rate:>14,.0f} calls/s")
+    print(f"(queued: listener needed another {flush_s:.2f}s to drain the backlog, off the tool-call path)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "logging",
+                "commit": git_revision(),
+                "calls": args.calls,
+                "drain_kbps": args.drain_kbps,
+                "calls_per_s": results,
+                "queued_flush_s": flush_s,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Benchmark of the modular tools against chaining the existing ones
+#
+# "chained" is what the agent did before: power (or factorial) builds the
+# full number, which crosses MCP as decimal text, and remainder parses it
+# back and takes the remainder. "modular" is one pow_mod / factorial_mod
+# call. The conversion rows compare str() with bigint.to_decimal, used for
+# the text of huge results. Every row runs with the bigint backends that are
+# available here (python, and gmpy2 when it is installed).
+#
+# Usage: python benchmarks/bench_modular.py [--exponents 10000 100000 1000000]
+#                                           [--factorials 10000 100000] [--json out.json]
+import argparse
+import importlib.util
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bigint  # noqa: E402
+import modular  # noqa: E402
+
+MODULUS = 1_000_000_007
+
+if hasattr(sys, "set_int_max_str_digits"):
+    sys.set_int_max_str_digits(0)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return time.perf_counter() - start, value
+
+
+def over_the_wire(value):
+    """A result sent as text and parsed back, as between two tool calls"""
+    return int(bigint.to_decimal(value))
+
+
+def run(backend, exponents, factorials):
+    os.environ["BIGINT_BACKEND"] = backend
+    bigint._gmpy2 = None
+    bigint.gmpy2()  # import the backend before timing
+    rows = []
+    for b in exponents:
+        chained_s, chained = timed(lambda: over_the_wire(bigint.power(2, b)) % 7)
+        modular_s, value = timed(modular.pow_mod, 2, b, 7)
+        assert value == chained
+        rows.append({"backend": backend, "case": f"2^{b} mod 7", "chained_s": chained_s, "modular_s": modular_s})
+    for n in factorials:
+        chained_s, chained = timed(lambda: over_the_wire(bigint.factorial(n)) % MODULUS)
+        modular_s, value = timed(modular.factorial_mod, n, MODULUS)
+        assert value == chained
+        rows.append({"backend": backend, "case": f"{n}! mod p", "chained_s": chained_s, "modular_s": modular_s})
+    for n in factorials:
+        value = bigint.factorial(n)
+        str_s, text = timed(str, value)
+        decimal_s, fast_text = timed(bigint.to_decimal, value)
+        assert text == fast_text
+        rows.append({"backend": backend, "case": f"text of {n}! ({len(text)} digits)", "chained_s": str_s, "modular_s": decimal_s})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the modular tools with power/factorial followed by remainder")
+    parser.add_argument("--exponents", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--factorials", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    backends = ["python"] + (["gmpy2"] if importlib.util.find_spec("gmpy2") is not None else [])
+    rows = [row for backend in backends for row in run(backend, args.exponents, args.factorials)]
+
+    print(f"{'backend':<9}{'case':<36}{'old':>12}{'new':>12}{'speedup':>10}")
+    for r in rows:
+        speedup = r["chained_s"] / r["modular_s"] if r["modular_s"] else math.inf
+        print(f"{r['backend']:<9}{r['case']:<36}{r['chained_s'] * 1e3:>10.2f}ms{r['modular_s'] * 1e3:>10.3f}ms{speedup:>9.0f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "modular", "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Micro-benchmark of the prime engine: cold sieve, warm queries and a
+# restart that maps the sieve saved by the previous process
+#
+# Each count in --counts is asked for with nth_prime, prime_sum and
+# primes_first_n. "cold" is a fresh process-wide sieve, "warm" the same
+# query again, "mapped" a new Sieve loaded from PRIME_SIEVE_FILE.
+#
+# Usage: python benchmarks/bench_primes.py [--counts 20 10000 1000000] [--json out.json]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import primes  # noqa: E402
+
+QUERIES = ("nth_prime", "prime_sum", "primes_first_n")
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time prime queries on a cold, warm and memory-mapped sieve")
+    parser.add_argument("--counts", type=int, nargs="+", default=[20, 10000, 1000000])
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sieve.bin")
+        for n in args.counts:
+            for query in QUERIES:
+                if os.path.exists(path):
+                    os.remove(path)
+                sieve = primes.Sieve(path)
+                cold = timed(getattr(sieve, query), n)
+                warm = timed(getattr(sieve, query), n)
+                load_start = time.perf_counter()
+                mapped_sieve = primes.Sieve(path)
+                load = time.perf_counter() - load_start
+                mapped = timed(getattr(mapped_sieve, query), n)
+                results.append({"query": query, "n": n, "cold_s": cold, "warm_s": warm,
+                                "map_s": load, "mapped_s": mapped, "sieve_limit": sieve.limit})
+
+    print(f"{'query':<16}{'n':>9}{'cold':>12}{'warm':>12}{'map':>12}{'mapped':>12}")
+    for r in results:
+        print(f"{r['query']:<16}{r['n']:>9}{r['cold_s'] * 1e3:>10.3f}ms{r['warm_s'] * 1e3:>10.3f}ms"
+              f"{r['map_s'] * 1e3:>10.3f}ms{r['mapped_s'] * 1e3:>10.3f}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "primes", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Result size and serialization cost of big results, inline vs result handles
+#
+# For factorials of growing size, compares what the server serializes and
+# what the client then carries in every later prompt:
+#   inline  the decimal text of the result, as tools returned it before
+#   handle  result_store's handle plus summary (the value stays server-side)
+#
+# Usage: python benchmarks/bench_result_handles.py [--sizes 1000,10000,100000] [--json out.json]
+import argparse
+import json
+import math
+import sys
+import time
+
+from harness import git_revision
+
+import result_store
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inline results with result handles")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="factorial arguments, comma separated")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+
+    rows = []
+    print(f"{'n!':>8}{'digits':>10}{'inline bytes':>14}{'inline ms':>11}{'handle bytes':>14}{'handle ms':>11}")
+    for n in (int(size) for size in args.sizes.split(",")):
+        value = math.factorial(n)
+        inline_s, inline = timed(lambda: str(value))
+        # A fresh store each time, so the handle is really built, not found
+        result_store.store = result_store.ResultStore()
+        handle_s, handle = timed(lambda: json.dumps(result_store.package("factorial", value, 1000)), repeat=1)
+        rows.append({
+            "n": n,
+            "digits": len(inline),
+            "inline_bytes": len(inline),
+            "inline_s": inline_s,
+            "handle_bytes": len(handle),
+            "handle_s": handle_s,
+        })
+        print(f"{n:>8}{len(inline):>10}{len(inline):>14,}{inline_s * 1000:>11.2f}{len(handle):>14,}{handle_s * 1000:>11.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "result_handles", "commit": git_revision(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
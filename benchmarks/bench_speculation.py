@@ -0,0 +1,107 @@
+# Benchmark of speculative tool execution in the agent loop
+#
+# Runs the scripted example queries with a fake model that takes
+# --llm-latency seconds per response, first with speculation off and then
+# on. The "on" pass starts from a transition table learned by --train passes
+# over the same scripts, the way a table learned from earlier traces would.
+# A hit means the tool call was already done while the model was "thinking",
+# so its round trip drops out of the iteration; a miss costs a wasted call on
+# a side-effect-free tool.
+#
+# Usage: python benchmarks/bench_speculation.py [--llm-latency 0.2] [--train 3]
+#                                               [--transport inprocess|stdio] [--json out.json]
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+os.environ["LLM_CACHE_MODE"] = "off"
+os.environ.pop("SPECULATION_TRACES", None)
+os.environ.pop("TRACE_FILE", None)
+
+from harness import ROOT, SCRIPTS, ScriptedLLM, git_revision, load_agent  # noqa: E402
+
+SERVER = os.path.join(ROOT, "example2.py")
+
+
+class SlowLLM(ScriptedLLM):
+    """ScriptedLLM that takes a fixed time to answer, like a remote model"""
+
+    def __init__(self, responses, latency):
+        super().__init__(responses)
+        self.latency = latency
+
+    async def __call__(self, prompt):
+        await asyncio.sleep(self.latency)
+        return await super().__call__(prompt)
+
+
+async def run_pass(agent, session, catalog, system_prompt, latency):
+    """Run every scripted query once; returns (wall seconds, RunMetrics dicts)"""
+    runs = []
+    start = time.perf_counter()
+    for query, script in zip(agent.EXAMPLE_QUERIES, SCRIPTS):
+        metrics = await agent.run_agent(session, catalog, system_prompt, query, SlowLLM(script, latency))
+        runs.append(metrics.to_dict())
+    return time.perf_counter() - start, runs
+
+
+async def run_benchmark(agent, latency, train, transport):
+    from speculation import TransitionTable
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with agent.open_session(transport, command=sys.executable, server_script=SERVER) as session:
+            catalog, system_prompt = await agent.prepare_session(session)
+            agent.speculation_enabled = False
+            results["off"] = await run_pass(agent, session, catalog, system_prompt, latency)
+
+            # Learn the transitions, then measure with a fresh pass
+            agent.speculation_table = TransitionTable()
+            for _ in range(train):
+                await run_pass(agent, session, catalog, system_prompt, 0)
+            agent.speculation_enabled = True
+            results["on"] = await run_pass(agent, session, catalog, system_prompt, latency)
+    return results
+
+
+def summarize(wall_s, runs):
+    calls = [call for run in runs for it in run["iterations"] for call in it["tool_calls"]]
+    return {
+        "wall_s": wall_s,
+        "errors": sum(1 for run in runs if run["error"]),
+        "tool_calls": len(calls),
+        "speculated": sum(1 for call in calls if call["speculated"]),
+        "dispatch_sum_s": sum(it["dispatch_s"] for run in runs for it in run["iterations"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speculative tool execution in the agent loop")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds the fake model takes per response")
+    parser.add_argument("--train", type=int, default=3, help="passes used to learn the transition table")
+    parser.add_argument("--transport", choices=("stdio", "inprocess"), default="inprocess")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    agent = load_agent()
+    results = asyncio.run(run_benchmark(agent, args.llm_latency, args.train, args.transport))
+    summaries = {mode: summarize(*result) for mode, result in results.items()}
+
+    print(f"{'speculation':<14}{'wall':>10}{'dispatch':>12}{'calls':>7}{'hits':>6}{'errors':>8}")
+    for mode, summary in summaries.items():
+        print(f"{mode:<14}{summary['wall_s']:>9.3f}s{summary['dispatch_sum_s'] * 1e3:>10.1f}ms"
+              f"{summary['tool_calls']:>7}{summary['speculated']:>6}{summary['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "speculation", "llm_latency_s": args.llm_latency, "commit": git_revision(),
+                       "summary": summaries}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Time-to-decision of streamed vs. fully awaited LLM responses
+#
+# A fake stream emits a decision followed by trailing text the agent doesn't
+# need (models often keep going after the FUNCTION_CALL line), one chunk
+# every --chunk-delay seconds. Each early-stop mode of llm_stream is timed on
+# it. The second part checks that timed-out requests don't leak threads: the
+# old run_in_executor path leaves a worker blocked on the request, the native
+# async path cancels it.
+#
+# Usage: python benchmarks/bench_streaming.py [--chunk-delay 0.02] [--runs 5] [--json out.json]
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+from harness import git_revision
+
+from llm_stream import EARLY_STOP_MODES, stream_decision
+
+RESPONSES = {
+    "single_call": "FUNCTION_CALL: factorial|10\n",
+    "parallel_calls": "FUNCTION_CALL: cbrt|1\nFUNCTION_CALL: cbrt|2\nFUNCTION_CALL: cbrt|3\n",
+    "final_answer": "FINAL_ANSWER: [3628800]",
+}
+TRAILER = "\nThe factorial tool multiplies every integer from 1 to n, which is what the query asks for. " * 4
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+async def fake_stream(text, chunk_size, delay):
+    for i in range(0, len(text), chunk_size):
+        await asyncio.sleep(delay)
+        yield Chunk(text[i:i + chunk_size])
+
+
+async def time_to_decision(text, mode, chunk_size, delay):
+    start = time.perf_counter()
+    response = await stream_decision(lambda: fake_stream(text, chunk_size, delay), mode)
+    return time.perf_counter() - start, response
+
+
+async def leaked_threads(requests, timeout, request_s):
+    """Threads still busy after `requests` timed-out calls, for the executor and the native path"""
+    def blocking_request():
+        time.sleep(request_s)
+
+    async def native_request():
+        await asyncio.sleep(request_s)
+
+    baseline = threading.active_count()
+    loop = asyncio.get_running_loop()
+    for _ in range(requests):
+        try:
+            await asyncio.wait_for(loop.run_in_executor(None, blocking_request), timeout)
+        except asyncio.TimeoutError:
+            pass
+    executor_leak = threading.active_count() - baseline
+
+    baseline = threading.active_count()
+    for _ in range(requests):
+        try:
+            await asyncio.wait_for(native_request(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    native_leak = threading.active_count() - baseline
+    return executor_leak, native_leak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-decision with streaming early stop")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument("--chunk-size", type=int, default=8, help="characters per chunk")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'response':<16}" + "".join(f"{mode:>12}" for mode in EARLY_STOP_MODES))
+    for name, decision in RESPONSES.items():
+        text = decision + TRAILER
+        row = {}
+        for mode in EARLY_STOP_MODES:
+            samples = [asyncio.run(time_to_decision(text, mode, args.chunk_size, args.chunk_delay)) for _ in range(args.runs)]
+            row[mode] = {
+                "median_s": statistics.median(s for s, _ in samples),
+                "calls": samples[-1][1].text.count("FUNCTION_CALL:"),
+            }
+        results[name] = row
+        print(f"{name:<16}" + "".join(f"{row[mode]['median_s'] * 1e3:>10.0f}ms" for mode in EARLY_STOP_MODES))
+
+    executor_leak, native_leak = asyncio.run(leaked_threads(requests=8, timeout=0.05, request_s=1.0))
+    print(f"\nthreads still blocked after 8 timeouts: executor {executor_leak}, native async {native_leak}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "streaming",
+                "commit": git_revision(),
+                "chunk_delay": args.chunk_delay,
+                "chunk_size": args.chunk_size,
+                "results": results,
+                "leaked_threads": {"executor": executor_leak, "native": native_leak},
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Event-loop stalls from heavy tool calls, inline vs in the worker pool
+#
+# While a few heavy calls (factorial(200000), power(7, 2 * 10**6)) run, a probe
+# task calls a cheap tool every 10 ms and records how late it gets to run:
+#   inline  TOOL_WORKERS=0 behaviour, the heavy tool runs on the event loop
+#   pool    the heavy tool runs in tool_pool's worker processes
+# Then one call over its CPU budget shows the structured error it returns.
+#
+# Usage: python benchmarks/bench_tool_pool.py [--workers 2] [--json out.json]
+import argparse
+import asyncio
+import inspect
+import json
+import time
+
+from harness import git_revision
+
+import math_tools
+import tool_pool
+
+HEAVY_CALLS = [
+    ("factorial", (200_000,)),
+    ("power", (7, 2 * 10**6)),
+    ("factorial", (150_000,)),
+]
+PROBE_INTERVAL = 0.01
+
+
+async def probe(stop, delays):
+    """Call a cheap tool every PROBE_INTERVAL and record how late each call ran"""
+    while not stop.is_set():
+        due = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        math_tools.add(1, 2)
+        delays.append(time.perf_counter() - due)
+
+
+async def run(call):
+    stop = asyncio.Event()
+    delays = []
+    probe_task = asyncio.create_task(probe(stop, delays))
+    await asyncio.sleep(PROBE_INTERVAL * 3)
+    start = time.perf_counter()
+    await asyncio.gather(*(call(name, args) for name, args in HEAVY_CALLS))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    delays.sort()
+    return {
+        "elapsed_s": elapsed,
+        "probe_calls": len(delays),
+        "probe_p50_ms": delays[len(delays) // 2] * 1000,
+        "probe_max_ms": delays[-1] * 1000,
+    }
+
+
+async def inline(name, args):
+    # The undecorated tool, the way it ran on the event loop before
+    return inspect.unwrap(getattr(math_tools, name))(*args)
+
+
+async def pooled(name, args):
+    return await getattr(math_tools, name)(*args)
+
+
+async def main_async(args):
+    results = {"inline": await run(inline)}
+
+    pool = tool_pool._pool = tool_pool.ToolPool(args.workers)
+    await pool.run("math_tools", "add", (1, 2), {})  # start the workers outside the measurement
+    results["pool"] = await run(pooled)
+
+    pool.cpu_seconds = 1
+    start = time.perf_counter()
+    try:
+        await math_tools.factorial(10**8)
+        over_budget = None
+    except tool_pool.BudgetExceeded as e:
+        over_budget = {"error": e.to_dict(), "returned_after_s": time.perf_counter() - start}
+    await tool_pool.shutdown()
+    return results, over_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop stalls caused by heavy tool calls")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results, over_budget = asyncio.run(main_async(args))
+    print(f"{'':<8}{'heavy calls':>12}{'probe calls':>13}{'p50 late':>11}{'max late':>11}")
+    for name, r in results.items():
+        print(f"{name:<8}{r['elapsed_s']:>11.2f}s{r['probe_calls']:>13}"
+              f"{r['probe_p50_ms']:>9.1f}ms{r['probe_max_ms']:>9.1f}ms")
+    if over_budget:
+        print(f"factorial(10**8) with a 1s CPU budget: {json.dumps(over_budget['error'])} "
+              f"after {over_budget['returned_after_s']:.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "tool_pool",
+                "commit": git_revision(),
+                "workers": args.workers,
+                "heavy_calls": [f"{name}{args}" for name, args in HEAVY_CALLS],
+                "results": results,
+                "over_budget": over_budget,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Per-call latency of the stdio and in-process transports
+#
+# Opens one session per transport through talk2mcp-2.open_session and times
+# session.call_tool for a few cheap math tools. The tools themselves take
+# microseconds (and the pure ones are served from the result cache after the
+# first call), so the numbers are almost entirely transport overhead:
+# JSON-RPC encoding, the pipe and the second interpreter for stdio.
+#
+# Usage: python benchmarks/bench_transport.py [--calls 200] [--json out.json]
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+from harness import ROOT, git_revision, load_agent
+
+SERVER = os.path.join(ROOT, "example2.py")
+
+CALLS = [
+    ("add", {"a": 2, "b": 3}),
+    ("factorial", {"a": 20}),
+    ("fibonacci_numbers", {"n": 50}),
+    ("evaluate_expression", {"expr": "sqrt(2) * 10^3 mod 7"}),
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def measure(agent, transport, calls):
+    """Return the session setup time and per-tool latency samples for one transport"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with agent.open_session(transport, command=sys.executable, server_script=SERVER) as session:
+            setup_s = time.perf_counter() - start
+            samples = {name: [] for name, _ in CALLS}
+            for _ in range(calls):
+                for name, arguments in CALLS:
+                    call_start = time.perf_counter()
+                    result = await session.call_tool(name, arguments=arguments)
+                    samples[name].append(time.perf_counter() - call_start)
+                    if result.isError:
+                        raise RuntimeError(f"{name} failed over {transport}: {result.content}")
+    return setup_s, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare tool-call latency of the stdio and in-process transports")
+    parser.add_argument("--calls", type=int, default=200, help="calls per tool and transport")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    agent = load_agent()
+    results = {}
+    for transport in agent.TRANSPORTS:
+        setup_s, samples = asyncio.run(measure(agent, transport, args.calls))
+        results[transport] = {
+            "setup_s": setup_s,
+            "tools": {
+                name: {"median_s": statistics.median(values), "p95_s": percentile(values, 0.95)}
+                for name, values in samples.items()
+            },
+            "all_median_s": statistics.median(v for values in samples.values() for v in values),
+        }
+
+    print(f"{'tool':<22}" + "".join(f"{t + ' p50':>16}{t + ' p95':>16}" for t in results))
+    for name, _ in CALLS:
+        row = "".join(
+            f"{r['tools'][name]['median_s'] * 1e6:>14.0f}us{r['tools'][name]['p95_s'] * 1e6:>14.0f}us"
+            for r in results.values()
+        )
+        print(f"{name:<22}{row}")
+    for transport, r in results.items():
+        print(f"{transport}: session setup {r['setup_s'] * 1e3:.1f}ms, median call {r['all_median_s'] * 1e6:.0f}us")
+    if {"stdio", "inprocess"} <= results.keys():
+        print(f"in-process speedup: {results['stdio']['all_median_s'] / results['inprocess']['all_median_s']:.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "transport", "commit": git_revision(), "calls": args.calls, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Shared helpers for the agent benchmarks
+#
+# load_agent() imports talk2mcp-2.py (its file name isn't a valid module
+# name), ScriptedLLM stands in for Gemini by replaying fixed responses, and
+# SCRIPTS holds one scripted conversation per example query. SCRIPTS stays
+# fixed so results compare across commits; conversations that use newer
+# tools go in EXTRA_SCRIPTS.
+import importlib.util
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def load_agent():
+    """Import talk2mcp-2.py as a module"""
+    module = sys.modules.get("talk2mcp2")
+    if module is None:
+        spec = importlib.util.spec_from_file_location("talk2mcp2", os.path.join(ROOT, "talk2mcp-2.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["talk2mcp2"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+class ScriptedResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class ScriptedLLM:
+    """Deterministic fake model: returns the scripted responses in order"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    async def __call__(self, prompt):
+        self.prompts.append(prompt)
+        if len(self.prompts) > len(self.responses):
+            return ScriptedResponse("FINAL_ANSWER: [script exhausted]")
+        return ScriptedResponse(self.responses[len(self.prompts) - 1])
+
+
+# One scripted conversation per entry of EXAMPLE_QUERIES in talk2mcp-2.py.
+# Only tools that are available on every platform are used, so the scripts
+# run on Linux without Keynote or email credentials.
+SCRIPTS = [
+    [
+        "FUNCTION_CALL: strings_to_chars_to_int|HELLO",
+        "FUNCTION_CALL: int_list_to_exponential_sum|[72, 69, 76, 76, 79]",
+        "FINAL_ANSWER: [2.2431923536979865e+34]",
+    ],
+    [
+        "FUNCTION_CALL: fibonacci_numbers|10",
+        "FINAL_ANSWER: [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]",
+    ],
+    [
+        "FUNCTION_CALL: factorial|24",
+        "FINAL_ANSWER: [620448401733239439360000]",
+    ],
+    [
+        "FUNCTION_CALL: evaluate_expression|sin(radians(45))",
+        "FINAL_ANSWER: [0.7071067811865475]",
+    ],
+    [
+        "FUNCTION_CALL: power|2|10",
+        "FUNCTION_CALL: remainder|1024|7",
+        "FINAL_ANSWER: [2]",
+    ],
+    [
+        "FUNCTION_CALL: factorial|10",
+        "FINAL_ANSWER: [3628800]",
+    ],
+    [
+        "FUNCTION_CALL: add_list|[2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71]",
+        "FINAL_ANSWER: [639]",
+    ],
+    [
+        "FUNCTION_CALL: factorial|15",
+        "FINAL_ANSWER: [1307674368000]",
+    ],
+    [
+        "FUNCTION_CALL: fibonacci_numbers|10",
+        "FUNCTION_CALL: evaluate_expression|sum([0**2, 1**2, 1**2, 2**2, 3**2, 5**2, 8**2, 13**2, 21**2, 34**2])",
+        "FINAL_ANSWER: [1870]",
+    ],
+    [
+        "FUNCTION_CALL: cbrt|1\nFUNCTION_CALL: cbrt|2\nFUNCTION_CALL: cbrt|3\nFUNCTION_CALL: cbrt|4\nFUNCTION_CALL: cbrt|5",
+        "FUNCTION_CALL: evaluate_expression|cbrt(1) * cbrt(2) * cbrt(3) * cbrt(4) * cbrt(5)",
+        "FINAL_ANSWER: [4.932424148660941]",
+    ],
+    [
+        "FUNCTION_CALL: factorial|7",
+        "FUNCTION_CALL: log|5040",
+        "FINAL_ANSWER: [8.525161361065415]",
+    ],
+    [
+        "FUNCTION_CALL: evaluate_expression|tan(radians(30))^2",
+        "FINAL_ANSWER: [0.3333333333333333]",
+    ],
+]
+
+
+# (query, script) pairs for tools added after SCRIPTS was fixed; run them
+# with bench_agent_loop.py --extra
+EXTRA_SCRIPTS = [
+    (
+        "Calculate the sum of the first 20 prime numbers.",
+        [
+            "FUNCTION_CALL: prime_sum|20",
+            "FINAL_ANSWER: [639]",
+        ],
+    ),
+    (
+        "Find the remainder when 2^10 is divided by 7.",
+        [
+            "FUNCTION_CALL: pow_mod|2|10|7",
+            "FINAL_ANSWER: [2]",
+        ],
+    ),
+]
+
+
+def git_revision():
+    """Current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
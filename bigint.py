@@ -0,0 +1,123 @@
+# Big-integer backend
+#
+# Factorials, powers and modular powers of huge numbers, and their decimal
+# text, go through here. With gmpy2 installed (GMP) they are several times
+# faster; without it they fall back to the standard library. gmpy2 is only
+# imported on first use and results are always returned as plain ints, so
+# callers never see an mpz.
+#
+# Python before 3.12 converts ints to decimal text in quadratic time, which
+# takes seconds for a result of a few hundred thousand digits. to_decimal
+# uses GMP when available, str() on 3.12+ (which is subquadratic there) and
+# otherwise splits the number in halves recursively and joins the halves
+# with the decimal module's fast multiplication, as CPython 3.12 does.
+#
+# Configuration:
+#   BIGINT_BACKEND   auto (default), gmpy2 or python
+import decimal
+import importlib.util
+import math
+import os
+import sys
+
+BACKENDS = ("auto", "gmpy2", "python")
+# Below this many bits str() is as fast as anything else
+FAST_DECIMAL_BITS = 100_000
+# Pieces of at most this many bits are converted by Decimal directly
+DECIMAL_LEAF_BITS = 128
+
+_gmpy2 = None
+
+
+def backend_name():
+    name = os.getenv("BIGINT_BACKEND", "auto").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown BIGINT_BACKEND {name!r}, expected one of {', '.join(BACKENDS)}")
+    if name == "auto":
+        return "gmpy2" if importlib.util.find_spec("gmpy2") is not None else "python"
+    return name
+
+
+def gmpy2():
+    """The gmpy2 module if it is the backend in use, else None"""
+    global _gmpy2
+    if _gmpy2 is None:
+        if backend_name() != "gmpy2":
+            _gmpy2 = False
+        else:
+            # Deferred so starting the server doesn't pay for importing GMP
+            import gmpy2 as module
+            _gmpy2 = module
+    return _gmpy2 or None
+
+
+def factorial(n):
+    gmp = gmpy2()
+    if gmp is not None and n > 1000:
+        return int(gmp.fac(n))
+    return math.factorial(n)
+
+
+def power(a, b):
+    gmp = gmpy2()
+    if gmp is not None and b > 64 and abs(a) > 1:
+        return int(gmp.mpz(a) ** b)
+    return a ** b
+
+
+def pow_mod(a, b, m):
+    gmp = gmpy2()
+    if gmp is not None and m.bit_length() > 64 and b >= 0:
+        return int(gmp.powmod(a, b, m))
+    return pow(a, b, m)
+
+
+def _int_to_decimal(value):
+    """Decimal value of a non-negative int, built from halves of its bits"""
+    D = decimal.Decimal
+    powers = {}
+
+    def power_of_two(bits):
+        result = powers.get(bits)
+        if result is None:
+            if bits <= DECIMAL_LEAF_BITS:
+                result = D(2) ** bits
+            elif bits - 1 in powers:
+                result = powers[bits - 1] * 2
+            else:
+                half = bits >> 1
+                result = power_of_two(half) * power_of_two(bits - half)
+            powers[bits] = result
+        return result
+
+    def convert(n, bits):
+        if bits <= DECIMAL_LEAF_BITS:
+            return D(n)
+        half = bits >> 1
+        high = n >> half
+        low = n - (high << half)
+        return convert(low, half) + convert(high, bits - half) * power_of_two(half)
+
+    with decimal.localcontext() as ctx:
+        ctx.prec = decimal.MAX_PREC
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        ctx.traps[decimal.Inexact] = True
+        return convert(value, value.bit_length())
+
+
+def to_decimal(value):
+    """str(value) for an int of any size, in subquadratic time"""
+    if abs(value).bit_length() <= FAST_DECIMAL_BITS or sys.version_info >= (3, 12):
+        return str(value)
+    gmp = gmpy2()
+    if gmp is not None:
+        return gmp.mpz(value).digits(10)
+    text = str(_int_to_decimal(abs(value)))
+    return "-" + text if value < 0 else text
+
+
+def log10(value):
+    """log10 of a positive int of any size, from its top bits"""
+    shift = max(value.bit_length() - 64, 0)
+    return math.log10(value >> shift) + shift * math.log10(2)
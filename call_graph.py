@@ -0,0 +1,117 @@
+# Multi-call execution for the agent loop
+#
+# The model may answer with several FUNCTION_CALL lines in one response.
+# A parameter that is exactly $1, $2, ... (1-based) is the result of that
+# earlier call in the same response; a "$5" inside text is left alone. The
+# calls form a DAG: every call waits only for the calls it references, so
+# independent calls run concurrently. A result the server stored behind a
+# result:// handle is passed on as the handle. A call with a bad reference
+# isn't run; its error goes back to the model like a tool error.
+import asyncio
+import re
+
+REFERENCE_PATTERN = re.compile(r"^\$(\d+)$")
+
+
+class PlannedCall:
+    """One FUNCTION_CALL line and the earlier calls it depends on"""
+
+    __slots__ = ("index", "func_name", "params", "deps", "error")
+
+    def __init__(self, index, func_name, params, deps, error=None):
+        self.index = index
+        self.func_name = func_name
+        self.params = params
+        self.deps = deps
+        self.error = error  # why the call can't run, e.g. a bad reference
+
+    def __repr__(self):
+        return f"PlannedCall(${self.index} {self.func_name}|{'|'.join(self.params)})"
+
+
+class CallResult:
+    """Outcome of a planned call: either a value or an error"""
+
+    __slots__ = ("call", "arguments", "value", "result_str", "error", "executed")
+
+    def __init__(self, call, arguments=None, value=None, result_str=None, error=None, executed=True):
+        self.call = call
+        self.arguments = arguments
+        self.value = value
+        self.result_str = result_str
+        self.error = error
+        self.executed = executed  # False if the call was never sent to the tool
+
+
+def parse_calls(response_text):
+    """Parse every FUNCTION_CALL line of a response into PlannedCall objects"""
+    calls = []
+    for line in response_text.split("\n"):
+        line = line.strip()
+        if not line.startswith("FUNCTION_CALL:"):
+            continue
+        _, function_info = line.split(":", 1)
+        parts = [p.strip() for p in function_info.split("|")]
+        index = len(calls) + 1
+        deps = set()
+        error = None
+        for param in parts[1:]:
+            match = REFERENCE_PATTERN.match(param)
+            if match is None:
+                continue
+            ref = int(match.group(1))
+            if ref < 1 or ref >= index:
+                error = f"Call ${index} ({parts[0]}) refers to ${ref}, only earlier calls can be referenced"
+            else:
+                deps.add(ref)
+        calls.append(PlannedCall(index, parts[0], parts[1:], sorted(deps), error))
+    return calls
+
+
+def reference_value(result_str):
+    """A result as an argument of a later call: the handle of a stored result, else its text"""
+    if result_str.startswith("result://"):
+        return result_str.split(" ", 1)[0]
+    # A single content item is formatted as "[text]"; pass the text itself
+    if result_str.startswith("[") and result_str.endswith("]") and ", " not in result_str:
+        return result_str[1:-1]
+    return result_str
+
+
+def substitute(params, results):
+    """Replace $N parameters with the results of earlier calls"""
+    substituted = []
+    for param in params:
+        match = REFERENCE_PATTERN.match(param)
+        substituted.append(reference_value(results[int(match.group(1))].result_str) if match else param)
+    return substituted
+
+
+async def execute_graph(calls, run_call):
+    """Run planned calls, independent ones concurrently.
+
+    run_call(func_name, params) must return (arguments, value, result_str).
+    Returns a list of CallResult in the order of the calls.
+    """
+    done = {call.index: asyncio.get_running_loop().create_future() for call in calls}
+
+    async def run(call):
+        results = {}
+        for dep in call.deps:
+            results[dep] = await done[dep]
+        failed = [dep for dep, res in results.items() if res.error is not None]
+        if call.error is not None:
+            outcome = CallResult(call, error=call.error, executed=False)
+        elif failed:
+            outcome = CallResult(call, error=f"skipped because ${failed[0]} failed", executed=False)
+        else:
+            try:
+                params = substitute(call.params, results)
+                arguments, value, result_str = await run_call(call.func_name, params)
+                outcome = CallResult(call, arguments, value, result_str)
+            except Exception as e:
+                outcome = CallResult(call, error=str(e))
+        done[call.index].set_result(outcome)
+        return outcome
+
+    return await asyncio.gather(*(run(call) for call in calls))
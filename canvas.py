@@ -0,0 +1,253 @@
+# Server-side slide model (scene graph) for the drawing backends
+#
+# A Document is the server's own record of one slide: shapes with stable ids
+# in z-order, a grid spatial index over their bounding boxes and the region
+# that changed since the slide was last rendered. Both backends keep one per
+# open document, so looking up, hit-testing or overlap-testing a shape never
+# asks the presentation app. Adding, restyling or removing a shape only grows
+# the dirty rectangle; canvas_raster.Rasterizer then repaints just that
+# region. SVG export needs nothing but the standard library; PNG export needs
+# Pillow (see canvas_raster.py).
+import itertools
+from collections import Counter
+from xml.sax.saxutils import escape
+
+SLIDE_WIDTH = 1920
+SLIDE_HEIGHT = 1080
+BACKGROUND = "#ffffff"
+SHAPE_FILL = "#5b9bd5"
+TEXT_COLOR = "#000000"
+FONT_SIZE = 36
+GRID_CELL = 120  # px; a 1920x1080 slide is 16x9 cells
+
+
+def union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def text_extent(text, font_size):
+    """Rough bounding box size of a line of text, for layout and dirty tracking"""
+    lines = str(text).split("\n") or [""]
+    return max(len(line) for line in lines) * font_size * 0.6, len(lines) * font_size * 1.2
+
+
+class Shape:
+    """A rectangle, or a free text item when kind == "text\""""
+
+    # Slides can hold thousands of these; keep them small
+    __slots__ = ("id", "kind", "z", "x1", "y1", "x2", "y2", "text", "style", "ref")
+
+    def __init__(self, id, kind, z, x1, y1, x2, y2, text="", style=None):
+        self.id = id
+        self.kind = kind
+        self.z = z  # creation order, used for z-order
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+        self.text = text
+        self.style = style or {}
+        self.ref = None  # backend handle, e.g. the Keynote item index
+
+    @property
+    def bbox(self):
+        return (self.x1, self.y1, self.x2, self.y2)
+
+    def color(self, key, default):
+        value = self.style.get(key)
+        if value is None:
+            return default
+        if isinstance(value, str):
+            return value
+        # 16-bit AppleScript triple from draw_ops.parse_color
+        return "#" + "".join(f"{channel // 257:02x}" for channel in value)
+
+    def to_dict(self):
+        return {"id": self.id, "kind": self.kind, "bounds": list(self.bbox), "text": self.text}
+
+
+class GridIndex:
+    """Uniform grid over the slide: each item is listed in every cell its box covers.
+
+    Slide shapes are small relative to the slide, so an insert, removal or
+    region query touches a handful of cells regardless of how many shapes
+    there are. Boxes reaching past the slide are clamped into the edge cells.
+    """
+
+    def __init__(self, width, height, cell=GRID_CELL):
+        self.cell = cell
+        self.columns = max(1, -(-width // cell))
+        self.rows = max(1, -(-height // cell))
+        self.cells = {}  # (column, row) -> {item: bbox}
+
+    def _cells(self, bbox):
+        last_column, last_row = self.columns - 1, self.rows - 1
+        c1 = min(max(int(bbox[0] // self.cell), 0), last_column)
+        c2 = min(max(int(bbox[2] // self.cell), 0), last_column)
+        r1 = min(max(int(bbox[1] // self.cell), 0), last_row)
+        r2 = min(max(int(bbox[3] // self.cell), 0), last_row)
+        return [(c, r) for c in range(c1, c2 + 1) for r in range(r1, r2 + 1)]
+
+    def insert(self, item, bbox):
+        for key in self._cells(bbox):
+            self.cells.setdefault(key, {})[item] = bbox
+
+    def remove(self, item, bbox):
+        for key in self._cells(bbox):
+            cell = self.cells.get(key)
+            if cell is not None:
+                cell.pop(item, None)
+                if not cell:
+                    del self.cells[key]
+
+    def query(self, region):
+        """Items whose box overlaps region"""
+        found = {}
+        for key in self._cells(region):
+            for item, bbox in self.cells.get(key, {}).items():
+                if item not in found and intersects(bbox, region):
+                    found[item] = bbox
+        return list(found)
+
+
+class Document:
+    """One slide: shapes by id in z-order, their spatial index and the region changed since the last render"""
+
+    def __init__(self, width=SLIDE_WIDTH, height=SLIDE_HEIGHT):
+        self.width = width
+        self.height = height
+        self.shapes = {}  # id -> Shape, in z-order
+        self.index = GridIndex(width, height)
+        self.kinds = Counter()
+        self.dirty = (0, 0, width, height)  # everything, until first rendered
+        self.version = 0
+        self._serial = itertools.count(1)
+        self._z = itertools.count()
+
+    def mark_dirty(self, bbox):
+        self.dirty = union(self.dirty, bbox)
+        self.version += 1
+
+    def new_id(self):
+        while True:
+            shape_id = f"shape-{next(self._serial)}"
+            if shape_id not in self.shapes:
+                return shape_id
+
+    def get(self, shape_id):
+        try:
+            return self.shapes[shape_id]
+        except KeyError:
+            raise ValueError(f"No shape with id {shape_id!r} on this slide") from None
+
+    def last(self):
+        """The most recently created shape, or None"""
+        return next(reversed(self.shapes.values()), None)
+
+    def _add(self, shape_id, kind, x1, y1, x2, y2, text="", style=None):
+        shape_id = shape_id or self.new_id()
+        if shape_id in self.shapes:
+            raise ValueError(f"Shape id {shape_id!r} is already used on this slide")
+        shape = Shape(shape_id, kind, next(self._z), x1, y1, x2, y2, text, style)
+        self.shapes[shape_id] = shape
+        self.index.insert(shape, shape.bbox)
+        self.kinds[kind] += 1
+        self.mark_dirty(shape.bbox)
+        return shape
+
+    def add_rectangle(self, x1, y1, x2, y2, shape_id=None):
+        return self._add(shape_id, "rectangle", min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+    def add_text_item(self, x, y, text, font_size=FONT_SIZE, shape_id=None):
+        width, height = text_extent(text, font_size)
+        return self._add(shape_id, "text", x, y, x + width, y + height, text, {"font_size": font_size})
+
+    def _resize(self, shape, x2, y2):
+        old = shape.bbox
+        self.index.remove(shape, old)
+        shape.x2, shape.y2 = x2, y2
+        self.index.insert(shape, shape.bbox)
+        return old
+
+    def set_text(self, shape, text):
+        shape.text = text
+        if shape.kind == "text":
+            width, height = text_extent(text, shape.style.get("font_size", FONT_SIZE))
+            old = self._resize(shape, shape.x1 + width, shape.y1 + height)
+            self.mark_dirty(union(old, shape.bbox))
+        else:
+            self.mark_dirty(shape.bbox)
+
+    def set_style(self, shape, **style):
+        old = shape.bbox
+        shape.style.update(style)
+        if shape.kind == "text" and "font_size" in style:
+            width, height = text_extent(shape.text, style["font_size"])
+            self._resize(shape, shape.x1 + width, shape.y1 + height)
+        self.mark_dirty(union(old, shape.bbox))
+
+    def remove(self, shape):
+        del self.shapes[shape.id]
+        self.index.remove(shape, shape.bbox)
+        self.kinds[shape.kind] -= 1
+        self.mark_dirty(shape.bbox)
+
+    def shapes_in(self, region):
+        """Shapes overlapping region, in z-order"""
+        return sorted(self.index.query(region), key=lambda shape: shape.z)
+
+    def overlapping(self, shape):
+        """Other shapes whose boxes overlap this one's"""
+        return [other for other in self.shapes_in(shape.bbox) if other is not shape]
+
+    def hit(self, x, y):
+        """The topmost shape under the point, or None"""
+        under = self.shapes_in((x, y, x + 1e-9, y + 1e-9))
+        return under[-1] if under else None
+
+    def take_dirty(self):
+        """The dirty region clipped to the slide (or None), resetting it"""
+        dirty, self.dirty = self.dirty, None
+        if dirty is None:
+            return None
+        x1, y1 = max(0, int(dirty[0])), max(0, int(dirty[1]))
+        x2, y2 = min(self.width, int(dirty[2]) + 1), min(self.height, int(dirty[3]) + 1)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return (x1, y1, x2, y2)
+
+    def to_svg(self):
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+            f'viewBox="0 0 {self.width} {self.height}">',
+            f'<rect width="100%" height="100%" fill="{BACKGROUND}"/>',
+        ]
+        for shape in self.shapes.values():
+            x1, y1, x2, y2 = shape.bbox
+            opacity = shape.style.get("opacity", 100) / 100
+            rotation = shape.style.get("rotation", 0)
+            transform = f' transform="rotate({rotation:g} {(x1 + x2) / 2:g} {(y1 + y2) / 2:g})"' if rotation else ""
+            parts.append(f'<g id="{escape(shape.id)}" opacity="{opacity:g}"{transform}>')
+            if shape.kind == "rectangle":
+                parts.append(
+                    f'<rect x="{x1:g}" y="{y1:g}" width="{x2 - x1:g}" height="{y2 - y1:g}" '
+                    f'fill="{shape.color("fill", SHAPE_FILL)}"/>'
+                )
+            if shape.text:
+                font_size = shape.style.get("font_size", FONT_SIZE)
+                if shape.kind == "rectangle":
+                    position = f'x="{(x1 + x2) / 2:g}" y="{(y1 + y2) / 2:g}" text-anchor="middle" dominant-baseline="central"'
+                else:
+                    position = f'x="{x1:g}" y="{y1:g}" dominant-baseline="hanging"'
+                parts.append(
+                    f'<text {position} font-family="Helvetica, Arial, sans-serif" font-size="{font_size:g}" '
+                    f'fill="{shape.color("text_color", TEXT_COLOR)}">{escape(shape.text)}</text>'
+                )
+            parts.append("</g>")
+        parts.append("</svg>")
+        return "\n".join(parts)
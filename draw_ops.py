@@ -0,0 +1,261 @@
+# Drawing operations for draw_batch
+#
+# A batch is a list of operations with explicit ids, validated up front and
+# compiled into a single AppleScript that runs as one transaction: the shapes
+# are created and filled in order, and if any operation fails the shapes the
+# batch already made are deleted again and the failing operation is reported.
+#
+# Operations (ids are chosen by the caller; targets may be shapes created
+# earlier in the batch or, without an "open", shapes already on the slide):
+#   {"op": "open"}                                        new document
+#   {"op": "rectangle", "id": "box", "x1": .., "y1": .., "x2": .., "y2": ..}
+#   {"op": "rectangle", "id": "box", "x": .., "y": .., "width": .., "height": ..}
+#   {"op": "rectangle", "id": "box", "width": .., "height": ..}  placed by layout.py
+#   {"op": "text", "target": "box", "text": ".."}         text inside a shape
+#   {"op": "text", "id": "label", "x": .., "y": .., "text": ".."}  free text
+#   {"op": "style", "target": "box", "font_size": 24, "text_color": "#336699",
+#    "opacity": 80, "rotation": 0}
+import re
+
+MAX_OPS = 200
+OP_KINDS = ("open", "rectangle", "text", "style")
+STYLE_KEYS = ("font_size", "text_color", "opacity", "rotation")
+
+_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+_HEX_COLOR = re.compile(r"^#?([0-9a-fA-F]{6})$")
+
+
+class DrawOp:
+    """One validated operation"""
+
+    __slots__ = ("index", "kind", "id", "target", "params")
+
+    def __init__(self, index, kind, id=None, target=None, params=None):
+        self.index = index
+        self.kind = kind
+        self.id = id
+        self.target = target
+        self.params = params or {}
+
+    def to_dict(self):
+        data = {"index": self.index, "op": self.kind}
+        if self.id is not None:
+            data["id"] = self.id
+        if self.target is not None:
+            data["target"] = self.target
+        return data
+
+
+def _number(op, index, key):
+    try:
+        return float(op[key])
+    except KeyError:
+        raise ValueError(f"op {index}: missing {key!r}") from None
+    except (TypeError, ValueError):
+        raise ValueError(f"op {index}: {key!r} must be a number, got {op[key]!r}") from None
+
+
+def parse_color(value):
+    """'#RRGGBB' to the 16-bit RGB triple AppleScript uses"""
+    match = _HEX_COLOR.match(str(value))
+    if not match:
+        raise ValueError(f"Not a #RRGGBB color: {value!r}")
+    rgb = match.group(1)
+    return tuple(int(rgb[i:i + 2], 16) * 257 for i in (0, 2, 4))
+
+
+def parse_ops(ops, known_ids=()):
+    """Validate a batch and return DrawOps; raises ValueError naming the bad op.
+
+    known_ids are the ids of shapes already on the slide; a batch that opens
+    a new document can't refer to them.
+    """
+    if not isinstance(ops, list) or not ops:
+        raise ValueError("ops must be a non-empty list of operations")
+    if len(ops) > MAX_OPS:
+        raise ValueError(f"At most {MAX_OPS} operations per batch, got {len(ops)}")
+
+    opens = any(isinstance(op, dict) and op.get("op") == "open" for op in ops)
+    ids = set() if opens else set(known_ids)
+    parsed = []
+    for index, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise ValueError(f"op {index}: expected an object, got {op!r}")
+        kind = op.get("op")
+        if kind not in OP_KINDS:
+            raise ValueError(f"op {index}: unknown op {kind!r}, expected one of {', '.join(OP_KINDS)}")
+
+        op_id = op.get("id")
+        if op_id is not None:
+            op_id = str(op_id)
+            if not _ID.match(op_id):
+                raise ValueError(f"op {index}: invalid id {op_id!r}")
+            if op_id in ids:
+                raise ValueError(f"op {index}: duplicate id {op_id!r}")
+        target = op.get("target")
+        if target is not None:
+            target = str(target)
+            if target not in ids:
+                raise ValueError(f"op {index}: unknown target {target!r}")
+
+        if kind == "open":
+            parsed.append(DrawOp(index, kind))
+            continue
+
+        if kind == "rectangle":
+            if op_id is None:
+                raise ValueError(f"op {index}: rectangle needs an id")
+            if "x1" not in op and "width" in op:
+                width, height = _number(op, index, "width"), _number(op, index, "height")
+                if width <= 0 or height <= 0:
+                    raise ValueError(f"op {index}: rectangle needs a positive width and height")
+                if "x" in op or "y" in op:
+                    x, y = _number(op, index, "x"), _number(op, index, "y")
+                    params = {"x1": x, "y1": y, "x2": x + width, "y2": y + height}
+                else:
+                    params = {"width": width, "height": height}
+            else:
+                x1, y1, x2, y2 = (_number(op, index, key) for key in ("x1", "y1", "x2", "y2"))
+                if x2 <= x1 or y2 <= y1:
+                    raise ValueError(f"op {index}: rectangle needs x2 > x1 and y2 > y1")
+                params = {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+        elif kind == "text":
+            if "text" not in op:
+                raise ValueError(f"op {index}: text needs 'text'")
+            params = {"text": str(op["text"])}
+            if target is None:
+                if op_id is None:
+                    raise ValueError(f"op {index}: free text needs an id (or a target shape)")
+                params["x"], params["y"] = _number(op, index, "x"), _number(op, index, "y")
+        else:  # style
+            if target is None:
+                raise ValueError(f"op {index}: style needs a target")
+            params = {key: op[key] for key in STYLE_KEYS if key in op}
+            if not params:
+                raise ValueError(f"op {index}: style needs one of {', '.join(STYLE_KEYS)}")
+            if "text_color" in params:
+                try:
+                    params["text_color"] = parse_color(params["text_color"])
+                except ValueError as e:
+                    raise ValueError(f"op {index}: {e}") from None
+            for key in ("font_size", "opacity", "rotation"):
+                if key in params:
+                    params[key] = _number(params, index, key)
+
+        if op_id is not None:
+            ids.add(op_id)
+        parsed.append(DrawOp(index, kind, op_id, target, params))
+    return parsed
+
+
+def applescript_string(text):
+    """Quote text as an AppleScript string literal"""
+    return '"' + str(text).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _var(shape_id, variables):
+    return variables.setdefault(shape_id, f"shape_{len(variables) + 1}")
+
+
+def _statements(op, variables):
+    """AppleScript lines (inside `tell current slide`) for one op"""
+    p = op.params
+    if op.kind == "rectangle":
+        width, height = p["x2"] - p["x1"], p["y2"] - p["y1"]
+        var = _var(op.id, variables)
+        return [
+            f"set {var} to make new shape with properties {{width:{width:g}, height:{height:g}, position:{{{p['x1']:g}, {p['y1']:g}}}}}",
+            f"set end of created to {var}",
+        ]
+    if op.kind == "text":
+        if op.target is not None:
+            return [f"set object text of {variables[op.target]} to {applescript_string(p['text'])}"]
+        var = _var(op.id, variables)
+        return [
+            f"set {var} to make new text item with properties {{object text:{applescript_string(p['text'])}}}",
+            f"set position of {var} to {{{p['x']:g}, {p['y']:g}}}",
+            f"set end of created to {var}",
+        ]
+    # style
+    var = variables[op.target]
+    lines = []
+    if "font_size" in p:
+        lines.append(f"set size of object text of {var} to {p['font_size']:g}")
+    if "text_color" in p:
+        r, g, b = p["text_color"]
+        lines.append(f"set color of object text of {var} to {{{r}, {g}, {b}}}")
+    if "opacity" in p:
+        lines.append(f"set opacity of {var} to {p['opacity']:g}")
+    if "rotation" in p:
+        lines.append(f"set rotation of {var} to {p['rotation']:g}")
+    return lines
+
+
+def compile_applescript(ops, references=None):
+    """One script for the whole batch.
+
+    references maps ids of shapes already on the slide to AppleScript
+    references such as "shape 3". The script returns
+    "ok<TAB>shape count<TAB>text item count", or "failed<TAB>index<TAB>message"
+    after deleting the shapes it created, so a failed batch leaves the slide
+    as it was.
+    """
+    variables = dict(references or {})
+    opens = any(op.kind == "open" for op in ops)
+    body = []
+    for op in ops:
+        if op.kind == "open":
+            continue
+        body.append(f"set current_op to {op.index}")
+        body.extend(_statements(op, variables))
+
+    indent = " " * 16
+    lines = [
+        'tell application "Keynote"',
+        "    activate",
+        "    set doc to make new document" if opens else "    set doc to front document",
+        "    set created to {}",
+        "    set current_op to -1",
+        "    tell doc",
+        "        tell current slide",
+        "            try",
+        *(indent + line for line in body),
+        "            on error error_message",
+        "                repeat with created_shape in created",
+        "                    try",
+        "                        delete created_shape",
+        "                    end try",
+        "                end repeat",
+        '                return "failed" & tab & current_op & tab & error_message',
+        "            end try",
+        '            return "ok" & tab & (count of shapes) & tab & (count of text items)',
+        "        end tell",
+        "    end tell",
+        "end tell",
+    ]
+    return "\n".join(lines)
+
+
+def collect_results(ops, reply):
+    """Per-op results from the script's reply"""
+    failed_index, message = None, None
+    if reply and str(reply).startswith("failed\t"):
+        _, index, message = str(reply).split("\t", 2)
+        failed_index = int(index)
+
+    results = []
+    for op in ops:
+        result = op.to_dict()
+        if failed_index is None or op.kind == "open":
+            result["status"] = "ok"
+            if op.kind == "rectangle":
+                result["bounds"] = [op.params[key] for key in ("x1", "y1", "x2", "y2")]
+        elif op.index < failed_index:
+            result["status"] = "rolled_back"
+        elif op.index == failed_index:
+            result["status"] = "error"
+            result["error"] = message
+        else:
+            result["status"] = "skipped"
+        results.append(result)
+    return {"ok": failed_index is None, "results": results}
@@ -0,0 +1,262 @@
+# Backends for the drawing tools
+#
+# The drawing tools talk to a DrawingBackend instead of Keynote directly:
+#   keynote  AppleScript through the automation bridge (macOS, or a stub)
+#   canvas   headless in-memory slides rendered with Pillow or exported as SVG
+# DRAWING_BACKEND picks one explicitly; "auto" (the default) uses Keynote
+# when an automation interpreter is available and the canvas otherwise.
+#
+# Every backend keeps a canvas.Document per open document, so shape ids,
+# overlap checks and layout are answered from memory; the Keynote backend
+# only talks to Keynote to draw.
+import os
+
+import canvas
+import layout
+from automation_bridge import get_bridge, interpreter_command, shutdown as close_bridge
+from draw_ops import applescript_string, compile_applescript
+
+BACKENDS = ("auto", "keynote", "canvas")
+
+
+class DrawingBackend:
+    """What the drawing tools need from a presentation app"""
+
+    name = "base"
+
+    def __init__(self, max_documents=16):
+        self.max_documents = max_documents
+        self.documents = []
+
+    @property
+    def document(self):
+        if not self.documents:
+            raise RuntimeError("No document is open; open one first")
+        return self.documents[-1]
+
+    def shape_ids(self):
+        """Ids of the shapes on the current slide (none if nothing is open)"""
+        return list(self.documents[-1].shapes) if self.documents else []
+
+    def _new_document(self):
+        self.documents.append(canvas.Document())
+        while len(self.documents) > self.max_documents:
+            self._forget(self.documents.pop(0))
+
+    def _forget(self, document):
+        pass
+
+    def _shape(self, shape_id=None):
+        document = self.document
+        if shape_id:
+            return document.get(shape_id)
+        shape = document.last()
+        if shape is None:
+            raise RuntimeError("The slide has no shape to add text to")
+        return shape
+
+    def _layout(self, ops):
+        """Give rectangles that only have a size a free spot on the slide"""
+        pending = [op for op in ops if op.kind == "rectangle" and "x1" not in op.params]
+        if not pending:
+            return
+        fixed = [tuple(op.params[key] for key in ("x1", "y1", "x2", "y2"))
+                 for op in ops if op.kind == "rectangle" and "x1" in op.params]
+        sizes = [(op.params["width"], op.params["height"]) for op in pending]
+        boxes = layout.place(self.document, sizes, obstacles=fixed)
+        for op, (x1, y1, x2, y2) in zip(pending, boxes):
+            op.params.update(x1=x1, y1=y1, x2=x2, y2=y2)
+
+    def _apply(self, ops):
+        """Apply ops to the model; on error undo them and return the failure reply"""
+        document = self.document
+        created = []
+        for op in ops:
+            try:
+                p = op.params
+                if op.kind == "rectangle":
+                    created.append(document.add_rectangle(p["x1"], p["y1"], p["x2"], p["y2"], shape_id=op.id))
+                elif op.kind == "text" and op.target is not None:
+                    document.set_text(document.get(op.target), p["text"])
+                elif op.kind == "text":
+                    created.append(document.add_text_item(p["x"], p["y"], p["text"], shape_id=op.id))
+                elif op.kind == "style":
+                    document.set_style(document.get(op.target), **p)
+            except Exception as e:
+                for shape in created:
+                    document.remove(shape)
+                return f"failed\t{op.index}\t{e}", []
+        return "ok", created
+
+    async def open_document(self):
+        raise NotImplementedError
+
+    async def add_rectangle(self, x1, y1, x2, y2):
+        """Draw a rectangle and return its canvas.Shape"""
+        raise NotImplementedError
+
+    async def add_text(self, text, shape_id=None):
+        """Set the text of a shape (the most recently created one by default); returns the shape"""
+        raise NotImplementedError
+
+    async def run_batch(self, ops):
+        """Apply validated DrawOps as one transaction; returns the draw_ops reply string"""
+        raise NotImplementedError
+
+    async def export(self, fmt="png"):
+        """The current slide as png/jpeg/webp bytes or SVG text"""
+        if fmt == "svg":
+            return self.document.to_svg()
+        raise NotImplementedError(f"The {self.name} backend can't render slides")
+
+    async def close(self):
+        pass
+
+
+def _count(reply, position, fallback):
+    """An item count from a script reply ("ok<TAB>shapes<TAB>text items" or a bare number)"""
+    try:
+        return int(str(reply).split("\t")[position])
+    except (IndexError, ValueError):
+        return fallback
+
+
+class KeynoteBackend(DrawingBackend):
+    name = "keynote"
+
+    async def open_document(self):
+        # Use a very simple AppleScript approach to avoid syntax errors;
+        # the bridge returns once the document exists
+        await get_bridge().run("""
+        tell application "Keynote"
+            activate
+            make new document
+        end tell
+        """)
+        self._new_document()
+
+    async def add_rectangle(self, x1, y1, x2, y2):
+        document = self.document
+        # Keynote positions shapes by their top-left corner; the reply is the
+        # new shape's index, which later scripts use to address it
+        reply = await get_bridge().run(f"""
+        tell application "Keynote"
+            activate
+            tell front document
+                tell current slide
+                    make new shape with properties {{width:{x2 - x1}, height:{y2 - y1}, position:{{{x1}, {y1}}}}}
+                    return count of shapes
+                end tell
+            end tell
+        end tell
+        """)
+        shape = document.add_rectangle(x1, y1, x2, y2)
+        shape.ref = f"shape {_count(reply, 0, document.kinds['rectangle'])}"
+        return shape
+
+    async def add_text(self, text, shape_id=None):
+        shape = self._shape(shape_id)
+        await get_bridge().run(f"""
+        tell application "Keynote"
+            activate
+            tell front document
+                tell current slide
+                    set object text of {shape.ref} to {applescript_string(text)}
+                end tell
+            end tell
+        end tell
+        """)
+        self.document.set_text(shape, text)
+        return shape
+
+    async def run_batch(self, ops):
+        if any(op.kind == "open" for op in ops):
+            self._new_document()  # the script makes the document before its transaction starts
+        document = self.document
+        self._layout(ops)
+        references = {shape_id: shape.ref for shape_id, shape in document.shapes.items()}
+        reply = await get_bridge().run(compile_applescript(ops, references))
+        if str(reply).startswith("failed\t"):
+            return reply
+        _, created = self._apply(ops)
+        # Shapes and text items are appended, so the batch's are the last ones of each kind
+        counts = {"rectangle": _count(reply, 1, document.kinds["rectangle"]),
+                  "text": _count(reply, 2, document.kinds["text"])}
+        for shape in reversed(created):
+            shape.ref = f"{'shape' if shape.kind == 'rectangle' else 'text item'} {counts[shape.kind]}"
+            counts[shape.kind] -= 1
+        return reply
+
+    async def close(self):
+        await close_bridge()
+
+
+class CanvasBackend(DrawingBackend):
+    """In-memory slides; every open_document starts a new one"""
+
+    name = "canvas"
+
+    def __init__(self, max_documents=16):
+        super().__init__(max_documents)
+        self._rasterizers = {}  # document -> Rasterizer
+
+    def _forget(self, document):
+        self._rasterizers.pop(document, None)
+
+    async def open_document(self):
+        self._new_document()
+
+    async def add_rectangle(self, x1, y1, x2, y2):
+        return self.document.add_rectangle(x1, y1, x2, y2)
+
+    async def add_text(self, text, shape_id=None):
+        shape = self._shape(shape_id)
+        self.document.set_text(shape, text)
+        return shape
+
+    async def run_batch(self, ops):
+        if any(op.kind == "open" for op in ops):
+            self._new_document()
+        self._layout(ops)
+        reply, _ = self._apply(ops)
+        return reply
+
+    def rasterizer(self, document):
+        # Deferred so the canvas (and SVG export) works without Pillow
+        import canvas_raster
+        rasterizer = self._rasterizers.get(document)
+        if rasterizer is None:
+            rasterizer = self._rasterizers[document] = canvas_raster.Rasterizer(document)
+        return rasterizer
+
+    async def export(self, fmt="png"):
+        if fmt == "svg":
+            return self.document.to_svg()
+        return self.rasterizer(self.document).encode(fmt)
+
+
+_backend = None
+
+
+def backend_name():
+    name = os.getenv("DRAWING_BACKEND", "auto").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DRAWING_BACKEND {name!r}, expected one of {', '.join(BACKENDS)}")
+    if name == "auto":
+        return "keynote" if interpreter_command() is not None else "canvas"
+    return name
+
+
+def get_backend():
+    """The process-wide backend, created on first use"""
+    global _backend
+    if _backend is None:
+        _backend = KeynoteBackend() if backend_name() == "keynote" else CanvasBackend()
+    return _backend
+
+
+async def shutdown():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
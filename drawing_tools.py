@@ -0,0 +1,138 @@
+# Drawing tools
+#
+# open_keynote, add_rectangle_to_keynote and add_text_to_keynote keep their
+# names for the agent, but draw through a drawing_backends.DrawingBackend:
+# Keynote via the automation bridge on macOS (or a stub interpreter), or the
+# headless canvas everywhere else. The backend keeps a model of each slide,
+# so shapes have stable ids the agent can target, and draw_batch can place
+# boxes given only their size. export_slide returns the canvas as an image.
+# Each tool returns when the backend has done the work.
+import importlib.util
+
+from mcp.server.fastmcp import Image
+
+from automation_bridge import AutomationError
+from draw_ops import collect_results, parse_ops
+from drawing_backends import get_backend, shutdown
+
+
+def _app():
+    return "Keynote" if get_backend().name == "keynote" else "Canvas"
+
+
+async def open_keynote() -> dict:
+    """Opens a presentation software with a blank slide, perfect for starting a visual presentation"""
+    try:
+        await get_backend().open_document()
+        
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"{_app()} opened with a new document"
+                }
+            ]
+        }
+    except Exception as e:
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Error opening {_app()}: {str(e)}"
+                }
+            ]
+        }
+
+async def add_rectangle_to_keynote(x1: int, y1: int, x2: int, y2: int) -> dict:
+    """Creates a visual container (rectangle) on the current presentation slide at specified coordinates (x1,y1,x2,y2) - useful for framing content"""
+    try:
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError("x2 must be greater than x1 and y2 greater than y1")
+        
+        backend = get_backend()
+        shape = await backend.add_rectangle(x1, y1, x2, y2)
+        
+        message = f"Rectangle {shape.id} added to {_app()} from ({x1},{y1}) to ({x2},{y2})"
+        overlaps = backend.document.overlapping(shape)
+        if overlaps:
+            message += f"; it overlaps {', '.join(other.id for other in overlaps)}"
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": message
+                }
+            ]
+        }
+    except Exception as e:
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Error adding rectangle to {_app()}: {str(e)}"
+                }
+            ]
+        }
+
+async def add_text_to_keynote(text: str, shape_id: str = "") -> dict:
+    """Adds text to a shape in the presentation, by the id add_rectangle_to_keynote returned or the most recently created shape if no id is given - ideal for displaying results with explanations"""
+    try:
+        shape = await get_backend().add_text(text, shape_id or None)
+        
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Text '{text}' added to shape {shape.id} in {_app()}"
+                }
+            ]
+        }
+    except Exception as e:
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Error adding text to {_app()} shape: {str(e)}"
+                }
+            ]
+        }
+
+
+async def draw_batch(ops: list[dict]) -> dict:
+    """Draws a whole slide in one call: a list of operations with explicit ids, e.g. [{"op": "open"}, {"op": "rectangle", "id": "box", "x1": 100, "y1": 100, "x2": 500, "y2": 300}, {"op": "text", "target": "box", "text": "42"}, {"op": "style", "target": "box", "font_size": 36}]. A rectangle may also be given "x", "y", "width" and "height"; one given only "width" and "height" is placed automatically where it overlaps nothing; targets can also be ids of shapes already on the slide. Runs as one transaction and returns a result per operation with each rectangle's bounds"""
+    backend = get_backend()
+    try:
+        parsed = parse_ops(ops, backend.shape_ids())
+    except ValueError as e:
+        return {"ok": False, "error": str(e), "results": []}
+    try:
+        reply = await backend.run_batch(parsed)
+    except (AutomationError, RuntimeError, ValueError) as e:
+        return {"ok": False, "error": str(e), "results": []}
+    return collect_results(parsed, reply)
+
+
+async def export_slide(format: str = "png") -> Image:
+    """Renders the current slide as an image (png, jpeg or webp); only changed regions are re-rendered"""
+    fmt = format.lower()
+    if fmt not in ("png", "jpeg", "webp"):
+        raise ValueError(f"Unsupported format {format!r}, expected png, jpeg or webp")
+    return Image(data=await get_backend().export(fmt), format=fmt)
+
+async def export_slide_svg() -> str:
+    """Returns the current slide as an SVG document"""
+    return await get_backend().export("svg")
+
+
+TOOLS = [open_keynote, add_rectangle_to_keynote, add_text_to_keynote, draw_batch]
+
+
+
+def register(mcp):
+    for tool in TOOLS:
+        mcp.tool()(tool)
+    # Every backend can describe its slide model as SVG; only the canvas
+    # renders images, and that needs Pillow
+    mcp.tool()(export_slide_svg)
+    if get_backend().name == "canvas" and importlib.util.find_spec("PIL") is not None:
+        mcp.tool()(export_slide)
@@ -0,0 +1,83 @@
+# Email tools
+#
+# smtplib and email.mime are only imported (by mailer.py) when the first
+# email is sent or its status is requested.
+import asyncio
+
+from result_store import handled
+
+_mailer = None
+
+
+def get_mailer():
+    """The shared Mailer, created on first use"""
+    global _mailer
+    if _mailer is None:
+        from mailer import Mailer
+        _mailer = Mailer.from_env()
+    return _mailer
+
+
+async def shutdown():
+    """Give queued email a chance to go out before the server exits"""
+    if _mailer is not None:
+        await _mailer.close()
+
+
+async def send_email_with_result(result: str, subject: str = "Calculation Result") -> dict:
+    """Sends an email containing the final calculation result or answer - perfect for sharing results with others after completing calculations or visualizations"""
+    try:
+        # Check that credentials are configured before accepting the message
+        settings = get_mailer().settings
+        if settings.missing():
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"Error: Email credentials not found in .env file. Please make sure GMAIL_EMAIL, GMAIL_APP_PASSWORD, and RECIPIENT_EMAIL are set (missing: {', '.join(settings.missing())})."
+                    }
+                ]
+            }
+        
+        # Queue the message; a background worker delivers it over a pooled connection
+        delivery_id = await get_mailer().submit(result, subject)
+        
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Email with subject '{subject}' and result '{result}' accepted for delivery to {settings.recipient} (delivery id: {delivery_id})"
+                }
+            ]
+        }
+    except asyncio.QueueFull as e:
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Error sending email: {str(e)}. Try again shortly."
+                }
+            ]
+        }
+    except Exception as e:
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Error sending email: {str(e)}"
+                }
+            ]
+        }
+
+def email_delivery_status(delivery_id: str = "") -> dict:
+    """Check whether queued emails were delivered; pass a delivery id or leave empty for a summary"""
+    return get_mailer().status(delivery_id or None)
+
+
+TOOLS = [send_email_with_result, email_delivery_status]
+
+
+def register(mcp):
+    # A result:// handle can be emailed in full; the reply stays as it is
+    for tool in TOOLS:
+        mcp.tool()(handled(tool, package_results=False))
@@ -0,0 +1,249 @@
+# Safe arithmetic expression evaluator
+#
+# Lets the agent compute something like "log(7!) + 2^10 % 7" with one tool
+# call instead of one LLM iteration per operation. The expression is parsed
+# with ast, checked against a whitelist of nodes and functions, constant
+# folded and compiled into a tree of closures. Compiled expressions are
+# cached by their source text.
+#
+# "a^b mod m" and "n! mod m" (or remainder(power(a, b), m)) are compiled to
+# modular.pow_mod / factorial_mod, so the power or factorial is never built.
+import ast
+import functools
+import math
+import operator
+import re
+
+import fibonacci as fib
+import modular
+
+MAX_EXPRESSION_LENGTH = 2000
+MAX_FACTORIAL = 100_000
+MAX_RESULT_BITS = 10_000_000
+
+
+def _factorial(a):
+    if a != int(a) or a < 0:
+        raise ValueError("factorial is only defined for non-negative integers")
+    if a > MAX_FACTORIAL:
+        raise ValueError(f"factorial argument too large (limit {MAX_FACTORIAL})")
+    return math.factorial(int(a))
+
+
+def _power(a, b):
+    # Refuse results with more than MAX_RESULT_BITS bits before computing them
+    if isinstance(a, int) and isinstance(b, int) and b > 0 and abs(a) > 1:
+        if abs(a).bit_length() * b > MAX_RESULT_BITS:
+            raise ValueError("power result too large")
+    return a ** b
+
+
+def _log(a, base=None):
+    return math.log(a) if base is None else math.log(a, base)
+
+
+def _fibonacci_numbers(n):
+    return fib.fibonacci_range(0, n) if n > 0 else []
+
+
+# Same operations the math tools in example2.py wrap
+FUNCTIONS = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": operator.truediv,
+    "power": _power,
+    "sqrt": lambda a: a ** 0.5,
+    "cbrt": lambda a: a ** (1/3),
+    "factorial": _factorial,
+    "log": _log,
+    "exp": math.exp,
+    "remainder": operator.mod,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "radians": math.radians,
+    "degrees": math.degrees,
+    "fibonacci": fib.fibonacci_nth,
+    "fibonacci_numbers": _fibonacci_numbers,
+    "pow_mod": modular.pow_mod,
+    "factorial_mod": modular.factorial_mod,
+    "binomial_mod": modular.binomial_mod,
+    "mod_inverse": modular.mod_inverse,
+    "comb": math.comb,
+    "sum": sum,
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+}
+
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+
+UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# "7!" -> "factorial(7)", "(2+3)!" -> "factorial((2+3))", "abs(-3)!" ->
+# "factorial(abs(-3))"; only plain numbers, names, calls and parenthesized
+# groups without nesting are supported before "!". A call is matched as one
+# unit, so its name is never taken on its own.
+_FACTORIAL_PATTERN = re.compile(r"(?<![\w)])([A-Za-z_]\w*\s*\([^()]*\)|\d+(?:\.\d+)?|[A-Za-z_]\w*|\([^()]*\))\s*!(?!=)")
+
+
+def preprocess(source):
+    """Accept the notation people write in queries: n!, ^ for powers and mod"""
+    source = _FACTORIAL_PATTERN.sub(r"factorial(\1)", source)
+    source = re.sub(r"\bmod\b", "%", source)
+    return source.replace("^", "**")
+
+
+class Compiled:
+    """A compiled expression; call it with a mapping of variable values"""
+
+    __slots__ = ("source", "_fn", "constant", "variables")
+
+    def __init__(self, source, fn, constant, variables):
+        self.source = source
+        self._fn = fn
+        self.constant = constant
+        self.variables = variables
+
+    def __call__(self, variables=None):
+        return self._fn(variables or {})
+
+
+def _const(value):
+    return (lambda env: value), True
+
+
+def _is_call(node, name):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name and not node.keywords
+
+
+def _modular_operands(node):
+    """(modular function, operand nodes) if node is "a^b mod m" or "n! mod m" in any spelling, else None"""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod):
+        value, modulus = node.left, node.right
+    elif _is_call(node, "remainder") and len(node.args) == 2:
+        value, modulus = node.args
+    else:
+        return None
+    if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Pow):
+        return _pow_mod, [value.left, value.right, modulus]
+    if _is_call(value, "power") and len(value.args) == 2:
+        return _pow_mod, [*value.args, modulus]
+    if _is_call(value, "factorial") and len(value.args) == 1:
+        return _factorial_mod, [value.args[0], modulus]
+    return None
+
+
+def _pow_mod(a, b, m):
+    if all(isinstance(x, int) for x in (a, b, m)) and b >= 0 and m > 0:
+        return modular.pow_mod(a, b, m)
+    return _power(a, b) % m
+
+
+def _factorial_mod(n, m):
+    if isinstance(n, int) and isinstance(m, int) and m > 0:
+        if n < 0:
+            raise ValueError("factorial is only defined for non-negative integers")
+        return modular.factorial_mod(n, m)
+    return _factorial(n) % m
+
+
+def _compile_node(node, names):
+    """Return (fn(env), is_constant) for a whitelisted node, folding constants"""
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+        return _const(node.value)
+
+    if isinstance(node, ast.Name):
+        if node.id in CONSTANTS:
+            return _const(CONSTANTS[node.id])
+        names.add(node.id)
+        name = node.id
+
+        def lookup(env):
+            try:
+                return env[name]
+            except KeyError:
+                raise ValueError(f"Unknown name: {name}") from None
+        return lookup, False
+
+    modular_operands = _modular_operands(node)
+    if modular_operands is not None:
+        op, operand_nodes = modular_operands
+        operands = [_compile_node(operand, names) for operand in operand_nodes]
+        if all(const for _, const in operands):
+            return _const(op(*(fn({}) for fn, _ in operands)))
+        fns = [fn for fn, _ in operands]
+        return (lambda env: op(*(fn(env) for fn in fns))), False
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BIN_OPS:
+        op = BIN_OPS[type(node.op)]
+        left, left_const = _compile_node(node.left, names)
+        right, right_const = _compile_node(node.right, names)
+        if left_const and right_const:
+            return _const(op(left({}), right({})))
+        return (lambda env: op(left(env), right(env))), False
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPS:
+        op = UNARY_OPS[type(node.op)]
+        operand, operand_const = _compile_node(node.operand, names)
+        if operand_const:
+            return _const(op(operand({})))
+        return (lambda env: op(operand(env))), False
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile_node(item, names) for item in node.elts]
+        if all(const for _, const in items):
+            return _const([fn({}) for fn, _ in items])
+        fns = [fn for fn, _ in items]
+        return (lambda env: [fn(env) for fn in fns]), False
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            name = getattr(node.func, "id", ast.dump(node.func))
+            raise ValueError(f"Function not allowed: {name}. Allowed: {', '.join(sorted(FUNCTIONS))}")
+        if node.keywords:
+            raise ValueError("Keyword arguments are not supported")
+        func = FUNCTIONS[node.func.id]
+        args = [_compile_node(arg, names) for arg in node.args]
+        if all(const for _, const in args):
+            return _const(func(*(fn({}) for fn, _ in args)))
+        fns = [fn for fn, _ in args]
+        return (lambda env: func(*(fn(env) for fn in fns))), False
+
+    raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+
+
+@functools.lru_cache(maxsize=512)
+def compile_expression(source):
+    """Parse, validate, constant fold and compile an expression (cached by source)"""
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(preprocess(source.strip()), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: {e.msg}") from None
+    names = set()
+    fn, constant = _compile_node(tree.body, names)
+    return Compiled(source, fn, constant, frozenset(names))
+
+
+def evaluate(source, variables=None):
+    """Evaluate an arithmetic expression in one shot"""
+    return compile_expression(source)(variables)
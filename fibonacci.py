@@ -0,0 +1,127 @@
+# Fibonacci engine
+#
+# fibonacci_nth uses fast doubling, so F(n) costs O(log n) big-int
+# multiplications instead of n additions. fibonacci_range continues from
+# cached (F(k), F(k+1)) checkpoints, so consecutive windows and pages never
+# recompute the numbers before them.
+import threading
+from collections import OrderedDict
+
+MAX_PAGE_SIZE = 1000
+# Walking forward from a checkpoint is cheaper than fast doubling for short gaps
+MAX_WALK = 4096
+
+
+def fib_pair(n):
+    """Return (F(n), F(n+1)) using fast doubling"""
+    if n < 0:
+        raise ValueError("Fibonacci index must be non-negative")
+    a, b = 0, 1  # F(0), F(1)
+    for bit in bin(n)[2:]:
+        # F(2k) = F(k) * (2F(k+1) - F(k)), F(2k+1) = F(k)^2 + F(k+1)^2
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        if bit == "1":
+            a, b = d, c + d
+        else:
+            a, b = c, d
+    return a, b
+
+
+def fibonacci_nth(n):
+    """Return F(n) with F(0) = 0, F(1) = 1"""
+    return fib_pair(n)[0]
+
+
+class _Checkpoints:
+    """Small LRU of (F(k), F(k+1)) pairs left behind by earlier windows"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._pairs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def nearest(self, n):
+        """Return (k, pair) for the closest checkpoint k <= n, or (None, None)"""
+        with self._lock:
+            best = None
+            for k in self._pairs:
+                if k <= n and (best is None or k > best):
+                    best = k
+            if best is None:
+                return None, None
+            self._pairs.move_to_end(best)
+            return best, self._pairs[best]
+
+    def add(self, k, pair):
+        with self._lock:
+            self._pairs[k] = pair
+            self._pairs.move_to_end(k)
+            while len(self._pairs) > self.max_entries:
+                self._pairs.popitem(last=False)
+
+
+checkpoints = _Checkpoints()
+
+
+def _pair_at(n):
+    """(F(n), F(n+1)) from the nearest checkpoint, falling back to fast doubling"""
+    k, pair = checkpoints.nearest(n)
+    if k is None or n - k > MAX_WALK:
+        return fib_pair(n)
+    a, b = pair
+    for _ in range(n - k):
+        a, b = b, a + b
+    return a, b
+
+
+def iter_fibonacci(start, count):
+    """Yield F(start), ..., F(start + count - 1) and checkpoint where it stopped"""
+    if start < 0 or count < 0:
+        raise ValueError("start and count must be non-negative")
+    if count == 0:
+        return
+    a, b = _pair_at(start)
+    for _ in range(count):
+        yield a
+        a, b = b, a + b
+    checkpoints.add(start + count, (a, b))
+
+
+def fibonacci_range(start, count):
+    """Return the list [F(start), ..., F(start + count - 1)]"""
+    return list(iter_fibonacci(start, count))
+
+
+def encode_cursor(index):
+    return f"fib:{index}"
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    prefix, _, index = cursor.partition(":")
+    if prefix != "fib" or not index.isdigit():
+        raise ValueError(f"Invalid Fibonacci cursor: {cursor!r}")
+    return int(index)
+
+
+def fibonacci_page(cursor="", page_size=100, limit=None):
+    """Return one page of the sequence and the cursor of the next page.
+
+    limit optionally caps the sequence length (e.g. the n of "first n numbers");
+    next_cursor is None once it is reached.
+    """
+    start = decode_cursor(cursor)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if limit is not None:
+        page_size = max(0, min(page_size, limit - start))
+    values = fibonacci_range(start, page_size)
+    end = start + len(values)
+    has_more = limit is None or end < limit
+    return {
+        "start": start,
+        "count": len(values),
+        "values": values,
+        "next_cursor": encode_cursor(end) if has_more else None,
+    }
@@ -0,0 +1,63 @@
+# Image tools
+#
+# Pillow (and the process pool used for batches) is only imported when a
+# thumbnail is first requested. The tools are not registered when Pillow is
+# not installed.
+#
+# MCP tool results can't be streamed, so create_thumbnails reports each image
+# as it finishes through progress notifications (with the path and whether
+# it worked) and returns all the thumbnails together at the end.
+import asyncio
+import importlib.util
+import sys
+
+from mcp.server.fastmcp import Image, Context
+
+
+def _thumbnails():
+    # Deferred so starting the server doesn't pay for importing Pillow
+    import thumbnails
+    return thumbnails
+
+
+def create_thumbnail(image_path: str) -> Image:
+    """Create a thumbnail from an image"""
+    data = _thumbnails().get_thumbnail(image_path, (100, 100), "png")
+    return Image(data=data, format="png")
+
+async def create_thumbnails(paths: list[str], ctx: Context, size: int = 100, format: str = "png") -> list:
+    """Create thumbnails for many images at once (png, jpeg or webp), processed in parallel; progress is reported per image and the thumbnails are returned together"""
+    fmt = _thumbnails().normalize_format(format)
+    results = []
+    done = 0
+    async for path, data, error in _thumbnails().iter_thumbnails(paths, (size, size), fmt):
+        done += 1
+        # Tell the client about each thumbnail as soon as it finishes
+        status = "ready" if data is not None else f"error: {error}"
+        await ctx.report_progress(done, len(paths), message=f"{path}: {status}")
+        if data is None:
+            await ctx.warning(f"Thumbnail failed for {path}: {error}")
+            results.append(f"{path}: error: {error}")
+        else:
+            await ctx.info(f"Thumbnail ready for {path}")
+            results.append(path)
+            results.append(Image(data=data, format=fmt))
+    return results
+
+
+async def shutdown():
+    """Stop the thumbnail worker processes, if a batch ever started them"""
+    thumbnails = sys.modules.get("thumbnails")
+    if thumbnails is not None:
+        # Waiting for the worker processes blocks, so keep it off the event loop
+        await asyncio.to_thread(thumbnails.shutdown)
+
+
+TOOLS = [create_thumbnail, create_thumbnails]
+
+
+def register(mcp):
+    if importlib.util.find_spec("PIL") is None:
+        return
+    for tool in TOOLS:
+        mcp.tool()(tool)
@@ -0,0 +1,57 @@
+# Automatic layout for boxes on a slide
+#
+# place() finds positions for N boxes of given sizes that overlap neither the
+# shapes already on the slide nor each other, before anything is drawn. It is
+# a bottom-left heuristic: candidate corners are the slide's top-left margin
+# and the right and bottom edges of every box seen so far (never inside the
+# margin, even next to a shape that is), each box goes to
+# the topmost, then leftmost, candidate where it fits, and collisions are
+# checked against the document's spatial index plus a scratch index of the
+# boxes placed in this call.
+import canvas
+
+MARGIN = 40
+GAP = 20
+
+
+def place(document, sizes, margin=MARGIN, gap=GAP, obstacles=()):
+    """Bounding boxes for boxes of the given (width, height) sizes; raises ValueError if one doesn't fit
+
+    obstacles are further bounding boxes to keep clear of, such as shapes
+    with explicit coordinates that are about to be drawn in the same batch.
+    """
+    placed = canvas.GridIndex(document.width, document.height)
+    right, bottom = document.width - margin, document.height - margin
+    candidates = {(margin, margin)}
+    for shape in document.shapes.values():
+        candidates.update(_corners(shape.bbox, margin, gap))
+    for item, bbox in enumerate(obstacles):
+        placed.insert(("obstacle", item), bbox)
+        candidates.update(_corners(bbox, margin, gap))
+
+    boxes = []
+    for width, height in sizes:
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Box sizes must be positive, got {width}x{height}")
+        for x, y in sorted(candidates, key=lambda corner: (corner[1], corner[0])):
+            box = (x, y, x + width, y + height)
+            if box[2] > right or box[3] > bottom:
+                continue
+            # Keep `gap` clear around the box; shapes exactly `gap` away just touch the padding
+            pad = gap - 1e-6
+            padded = (box[0] - pad, box[1] - pad, box[2] + pad, box[3] + pad)
+            if document.index.query(padded) or placed.query(padded):
+                continue
+            break
+        else:
+            raise ValueError(f"No room left on the slide for a {width:g}x{height:g} box")
+        placed.insert(len(boxes), box)
+        boxes.append(box)
+        candidates.update(_corners(box, margin, gap))
+    return boxes
+
+
+def _corners(bbox, margin, gap):
+    x1, y1, x2, y2 = bbox
+    x1, y1 = max(x1, margin), max(y1, margin)
+    return ((max(x2 + gap, margin), y1), (x1, max(y2 + gap, margin)), (margin, max(y2 + gap, margin)))
@@ -0,0 +1,137 @@
+# Persistent cache of LLM decisions
+#
+# The agent sends byte-for-byte identical prompts whenever a known query is
+# re-run (examples, regression queries, CI). LLMCache stores the response text
+# in SQLite keyed by a hash of model + prompt so those calls skip the model.
+#
+# Modes (LLM_CACHE_MODE):
+#   off        - never touch the cache (default)
+#   readwrite  - serve hits from the cache, call the model and store on a miss
+#   record     - always call the model and store (refreshes recordings)
+#   replay     - only serve from the cache, a miss is an error (no network)
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+MODES = ("off", "readwrite", "record", "replay")
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a prompt has no recorded response"""
+
+
+class CachedResponse:
+    """Stand-in for a model response served from the cache"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def prompt_key(model, prompt):
+    """Stable cache key for a model + prompt pair"""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed response cache with TTL and size limits"""
+
+    def __init__(self, path=".llm_cache.sqlite3", mode="off", ttl=0, max_entries=10_000, max_bytes=64 * 1024 * 1024):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}, expected one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3"),
+            mode=os.getenv("LLM_CACHE_MODE", "off"),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "0")),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT,"
+                " size INTEGER, created REAL, last_used REAL)"
+            )
+        return self._db
+
+    def get(self, model, prompt):
+        """Return the cached response text, or None on a miss"""
+        if self.mode not in ("readwrite", "replay"):
+            return None
+        key = prompt_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                if self.mode == "replay":
+                    raise CacheMiss(f"No recorded response for prompt {key[:12]} (LLM_CACHE_MODE=replay)")
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, prompt, response_text):
+        if self.mode not in ("readwrite", "record"):
+            return
+        key = prompt_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response_text, len(response_text.encode("utf-8")), now, now),
+            )
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db):
+        """Drop expired entries, then least recently used ones until within limits"""
+        if self.ttl:
+            db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        while count > self.max_entries or size > self.max_bytes:
+            row = db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            count -= 1
+            size -= row[1]
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
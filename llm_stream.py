@@ -0,0 +1,168 @@
+# Streaming LLM decisions with early stop, hedging and retries
+#
+# The agent only needs the decision lines of a response, so the streamed
+# text is scanned as it arrives and the stream is closed as soon as the
+# decision is complete. Everything is native asyncio: a timeout cancels the
+# task consuming the stream, which closes the HTTP response, instead of
+# abandoning an executor thread that keeps waiting for the full response.
+#
+# Early-stop modes:
+#   decision  stop at a complete FINAL_ANSWER line, or at the first line that
+#             can't be a FUNCTION_CALL once calls have been seen, so several
+#             calls in one response are still executed together (default)
+#   first     stop at the first complete FUNCTION_CALL or FINAL_ANSWER line
+#   off       read the whole stream
+import asyncio
+import inspect
+import random
+import time
+
+from tracing import metrics
+
+EARLY_STOP_MODES = ("decision", "first", "off")
+
+
+class StreamedResponse:
+    """The decision text, plus how the stream was read"""
+
+    __slots__ = ("text", "chunks", "stopped_early", "first_chunk_s", "total_s")
+
+    def __init__(self, text, chunks, stopped_early, first_chunk_s, total_s):
+        self.text = text
+        self.chunks = chunks
+        self.stopped_early = stopped_early
+        self.first_chunk_s = first_chunk_s
+        self.total_s = total_s
+
+
+def _final_answer_complete(line):
+    _, _, answer = line.partition(":")
+    answer = answer.strip()
+    return answer.startswith("[") and "]" in answer
+
+
+class DecisionScanner:
+    """Accumulates streamed text and reports when the decision is complete"""
+
+    def __init__(self, mode="decision"):
+        if mode not in EARLY_STOP_MODES:
+            raise ValueError(f"Unknown early-stop mode {mode!r}, expected one of {', '.join(EARLY_STOP_MODES)}")
+        self.mode = mode
+        self.lines = []  # complete decision lines
+        self._partial = ""
+        self._calls = 0
+
+    @property
+    def text(self):
+        return "\n".join(self.lines + ([self._partial] if self._partial.strip() else []))
+
+    def feed(self, chunk):
+        """Add a chunk; True once the rest of the stream is no longer needed"""
+        if self.mode == "off":
+            self._partial += chunk
+            return False
+        self._partial += chunk
+        *complete, self._partial = self._partial.split("\n")
+        for line in complete:
+            if self._take(line.strip()):
+                self._partial = ""
+                return True
+        partial = self._partial.strip()
+        # A FINAL_ANSWER is done when its bracket closes, even without a newline
+        if partial.startswith("FINAL_ANSWER:") and _final_answer_complete(partial):
+            self.lines.append(partial)
+            self._partial = ""
+            return True
+        # After the calls, a line that can't become another call ends the decision
+        if self._calls and self.mode == "decision" and partial and not (
+            partial.startswith("FUNCTION_CALL:") or "FUNCTION_CALL:".startswith(partial)
+        ):
+            self._partial = ""
+            return True
+        return False
+
+    def _take(self, line):
+        if line.startswith("FUNCTION_CALL:"):
+            self.lines.append(line)
+            self._calls += 1
+            return self.mode == "first"
+        if line.startswith("FINAL_ANSWER:"):
+            self.lines.append(line)
+            return True
+        if line and self._calls:
+            return True  # something other than another call follows the calls
+        if line:
+            self.lines.append(line)
+        return False
+
+
+async def stream_decision(open_stream, early_stop="decision"):
+    """Consume a stream of chunks with .text until the decision is complete.
+
+    open_stream() returns an async iterator of chunks (or an awaitable of one,
+    as google-genai's generate_content_stream does).
+    """
+    scanner = DecisionScanner(early_stop)
+    start = time.perf_counter()
+    first_chunk_s = None
+    chunks = 0
+    stopped_early = False
+    stream = open_stream()
+    if inspect.isawaitable(stream):
+        stream = await stream
+    try:
+        async for chunk in stream:
+            chunks += 1
+            if first_chunk_s is None:
+                first_chunk_s = time.perf_counter() - start
+            if scanner.feed(getattr(chunk, "text", None) or ""):
+                stopped_early = True
+                break
+    finally:
+        # Closing the iterator releases the connection, also on cancellation
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    total_s = time.perf_counter() - start
+    if first_chunk_s is not None:
+        metrics.observe("llm_first_chunk_seconds", first_chunk_s)
+    if stopped_early:
+        metrics.inc("llm_early_stops_total")
+    return StreamedResponse(scanner.text, chunks, stopped_early, first_chunk_s, total_s)
+
+
+async def hedged(attempt, hedge_after=None):
+    """Await attempt(); if it hasn't finished after hedge_after seconds, race a second one"""
+    if not hedge_after:
+        return await attempt()
+    first = asyncio.ensure_future(attempt())
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_after)
+        if not done:
+            metrics.inc("llm_hedges_total")
+            pending.add(asyncio.ensure_future(attempt()))
+        error = None
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def with_retries(attempt, retries=0, base_delay=0.5, max_delay=8.0, hedge_after=None):
+    """Run a (hedged) attempt, retrying failures with full-jitter exponential backoff"""
+    for try_number in range(retries + 1):
+        try:
+            return await hedged(attempt, hedge_after)
+        except Exception:
+            if try_number == retries:
+                raise
+            metrics.inc("llm_retries_total")
+            await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** try_number)))
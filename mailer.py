@@ -0,0 +1,282 @@
+# Queued SMTP delivery for the email tool
+#
+# send_email_with_result used to open a new SMTP_SSL connection, do the TLS
+# handshake and login and send the message synchronously inside the tool,
+# blocking the server's event loop for the whole exchange. Mailer accepts the
+# message into a bounded queue and returns immediately; background workers
+# deliver it over pooled, authenticated connections that are kept alive and
+# re-established when the server drops them. Messages submitted within
+# EMAIL_DIGEST_WINDOW seconds of each other can be coalesced into one digest.
+#
+# For local testing point SMTP_HOST/SMTP_PORT at a stand-in such as
+# `python -m aiosmtpd -n -l localhost:8025` with SMTP_SECURITY=none.
+import asyncio
+import itertools
+import os
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+RESULT_TEMPLATE = """
+        <html>
+        <body>
+            <h2>Calculation Result</h2>
+            <p>The AI agent has completed a calculation with the following result:</p>
+            {blocks}
+            <p>This email was automatically generated by the AI agent.</p>
+        </body>
+        </html>
+        """
+
+BLOCK_TEMPLATE = """<div style="background-color: #f0f0f0; padding: 15px; border-radius: 5px; font-family: monospace;">
+                {result}
+            </div>"""
+
+
+class SMTPSettings:
+    """Connection and addressing settings, read from the environment"""
+
+    def __init__(self, host, port, security, username, password, sender, recipient):
+        self.host = host
+        self.port = port
+        self.security = security  # "ssl", "starttls" or "none"
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.recipient = recipient
+
+    @classmethod
+    def from_env(cls):
+        security = os.getenv("SMTP_SECURITY", "ssl").lower()
+        default_port = {"ssl": "465", "starttls": "587"}.get(security, "25")
+        return cls(
+            host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.getenv("SMTP_PORT", default_port)),
+            security=security,
+            username=os.getenv("GMAIL_EMAIL"),
+            password=os.getenv("GMAIL_APP_PASSWORD"),
+            sender=os.getenv("GMAIL_EMAIL"),
+            recipient=os.getenv("RECIPIENT_EMAIL"),
+        )
+
+    def missing(self):
+        """Names of required settings that are not configured"""
+        missing = []
+        if not self.sender:
+            missing.append("GMAIL_EMAIL")
+        if not self.password and self.security != "none":
+            missing.append("GMAIL_APP_PASSWORD")
+        if not self.recipient:
+            missing.append("RECIPIENT_EMAIL")
+        return missing
+
+
+class SMTPConnectionPool:
+    """Reusable authenticated SMTP connections (blocking, used from worker threads)"""
+
+    def __init__(self, settings, size=2, keepalive=30, timeout=30):
+        self.settings = settings
+        self.size = size
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self._idle = []  # (connection, last_used)
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    def _connect(self):
+        s = self.settings
+        if s.security == "ssl":
+            conn = smtplib.SMTP_SSL(s.host, s.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(s.host, s.port, timeout=self.timeout)
+            if s.security == "starttls":
+                conn.starttls()
+        if s.password:
+            conn.login(s.username, s.password)
+        self.connects += 1
+        return conn
+
+    def acquire(self):
+        """Return a live connection, probing idle ones with NOOP after keepalive seconds"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.keepalive:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._close(conn)
+        return self._connect()
+
+    def release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    def discard(self, conn):
+        self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+    def send(self, message):
+        """Send a message, reconnecting once if a pooled connection went stale"""
+        for attempt in (1, 2):
+            conn = self.acquire()
+            try:
+                conn.sendmail(self.settings.sender, [self.settings.recipient], message.as_string())
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.discard(conn)
+                if attempt == 2:
+                    raise
+                continue
+            except Exception:
+                self.discard(conn)
+                raise
+            self.release(conn)
+            return
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+def build_message(settings, subject, results):
+    """Build the HTML email for one result or a digest of several"""
+    message = MIMEMultipart()
+    message["From"] = settings.sender
+    message["To"] = settings.recipient
+    message["Subject"] = subject
+    blocks = "\n            ".join(BLOCK_TEMPLATE.format(result=result) for result in results)
+    message.attach(MIMEText(RESULT_TEMPLATE.format(blocks=blocks), "html"))
+    return message
+
+
+class QueueFull(asyncio.QueueFull):
+    """The send queue is at capacity"""
+
+
+class Mailer:
+    """Bounded send queue with background delivery workers"""
+
+    def __init__(self, settings, queue_size=100, workers=1, digest_window=0.0, pool_size=2, max_status=1000):
+        self.settings = settings
+        self.pool = SMTPConnectionPool(settings, size=pool_size)
+        self.queue_size = queue_size
+        self.workers = workers
+        self.digest_window = digest_window
+        self.max_status = max_status
+        self.statuses = {}
+        self._queue = None
+        self._tasks = []
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            SMTPSettings.from_env(),
+            queue_size=int(os.getenv("EMAIL_QUEUE_SIZE", "100")),
+            workers=int(os.getenv("EMAIL_WORKERS", "1")),
+            digest_window=float(os.getenv("EMAIL_DIGEST_WINDOW", "0")),
+            pool_size=int(os.getenv("EMAIL_POOL_SIZE", "2")),
+        )
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self._tasks:
+            self._tasks = [asyncio.get_running_loop().create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, result, subject="Calculation Result"):
+        """Accept a message for delivery and return its delivery id"""
+        self._start()
+        delivery_id = f"mail-{next(self._ids)}"
+        try:
+            self._queue.put_nowait((delivery_id, result, subject))
+        except asyncio.QueueFull:
+            raise QueueFull(f"Email queue is full ({self.queue_size} messages pending)") from None
+        self.statuses[delivery_id] = {"status": "queued", "subject": subject, "queued_at": time.time()}
+        while len(self.statuses) > self.max_status:
+            self.statuses.pop(next(iter(self.statuses)))
+        return delivery_id
+
+    async def _next_batch(self):
+        """Take one message, plus everything else that arrives within the digest window"""
+        batch = [await self._queue.get()]
+        if self.digest_window > 0:
+            deadline = time.monotonic() + self.digest_window
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            ids = [delivery_id for delivery_id, _, _ in batch]
+            if len(batch) == 1:
+                subject = batch[0][2]
+            else:
+                subject = f"Calculation Results ({len(batch)} results)"
+            for delivery_id in ids:
+                self._update(delivery_id, status="sending")
+            try:
+                # A result that can't be encoded fails its batch, not the worker
+                message = build_message(self.settings, subject, [result for _, result, _ in batch])
+                await asyncio.to_thread(self.pool.send, message)
+            except Exception as e:
+                for delivery_id in ids:
+                    self._update(delivery_id, status="failed", error=str(e))
+            else:
+                for delivery_id in ids:
+                    self._update(delivery_id, status="sent", sent_at=time.time(), digest_size=len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _update(self, delivery_id, **fields):
+        if delivery_id in self.statuses:
+            self.statuses[delivery_id].update(fields)
+
+    def status(self, delivery_id=None):
+        if delivery_id:
+            return self.statuses.get(delivery_id, {"status": "unknown"})
+        counts = {}
+        for entry in self.statuses.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "counts": counts,
+            "connections_opened": self.pool.connects,
+            "recent": dict(list(self.statuses.items())[-10:]),
+        }
+
+    async def close(self, timeout=10):
+        """Wait (up to timeout seconds) for queued mail, then stop the workers"""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await asyncio.to_thread(self.pool.close)
@@ -0,0 +1,316 @@
+# Math tools
+#
+# Pure Python except for the batch tools, which need NumPy. NumPy is only
+# imported the first time a batch tool runs, and the batch tools are not
+# registered at all when it is not installed.
+#
+# Tools whose cost grows without bound in their arguments (big factorials,
+# powers, Fibonacci numbers, whole expressions) are marked @heavy and run in
+# tool_pool's worker processes within CPU and memory budgets, so one huge
+# call can't stall the server for everyone else.
+#
+# The prime tools share one cached sieve (see primes.py), so questions like
+# "the sum of the first 20 primes" are a single call. The modular tools
+# (see modular.py) answer "... mod m" without building the number first,
+# and big powers and factorials use GMP when gmpy2 is installed (bigint.py).
+import importlib.util
+import math
+import sys
+
+import bigint
+import expression_eval
+import fibonacci as fib
+import modular
+import primes
+from result_store import handled
+from tool_cache import pure, cache as tool_cache
+from tool_pool import heavy, shutdown as close_pool
+
+
+# Largest x for which exp(x) is still a finite float
+MAX_EXP_ARG = math.log(sys.float_info.max)
+
+
+async def shutdown():
+    """Stop the worker processes of the heavy tools"""
+    await close_pool()
+
+
+def _batch_math():
+    # Deferred so starting the server doesn't pay for importing NumPy
+    import batch_math
+    return batch_math
+
+
+def logsumexp(values):
+    """Numerically stable log(sum(exp(values)))"""
+    values = [float(v) for v in values]
+    if not values:
+        return -math.inf
+    m = max(values)
+    return m + math.log(math.fsum(math.exp(v - m) for v in values))
+
+
+def exponential_sum(values):
+    """sum(exp(values)) computed through logsumexp so no term overflows on its own"""
+    lse = logsumexp(values)
+    if lse > MAX_EXP_ARG:
+        raise ValueError(f"Sum of exponentials is e^{lse:.6f}, too large for a float; use the log variant")
+    return math.exp(lse)
+
+
+# DEFINE TOOLS
+
+#addition tool
+@pure
+def add(a: int, b: int) -> int:
+    """Add two numbers"""
+    return int(a + b)
+
+@pure
+def add_list(l: list) -> int:
+    """Add all numbers in a list"""
+    return sum(l)
+
+# subtraction tool
+@pure
+def subtract(a: int, b: int) -> int:
+    """Subtract two numbers"""
+    return int(a - b)
+
+# multiplication tool
+@pure
+def multiply(a: int, b: int) -> int:
+    """Multiply two numbers"""
+    return int(a * b)
+
+#  division tool
+@pure
+def divide(a: int, b: int) -> float:
+    """Divide two numbers"""
+    return float(a / b)
+
+# power tool
+@heavy
+@pure
+def power(a: int, b: int) -> int:
+    """Power of two numbers"""
+    return int(bigint.power(a, b))
+
+# square root tool
+@pure
+def sqrt(a: int) -> float:
+    """Square root of a number"""
+    return float(a ** 0.5)
+
+# cube root tool
+@pure
+def cbrt(a: int) -> float:
+    """Cube root of a number"""
+    return float(a ** (1/3))
+
+# factorial tool
+@heavy
+@pure
+def factorial(a: int) -> int:
+    """factorial of a number"""
+    return int(bigint.factorial(a))
+
+# log tool
+@pure
+def log(a: int) -> float:
+    """log of a number"""
+    return float(math.log(a))
+
+# remainder tool
+@pure
+def remainder(a: int, b: int) -> int:
+    """remainder of two numbers divison"""
+    return int(a % b)
+
+# sin tool
+@pure
+def sin(a: int) -> float:
+    """sin of a number"""
+    return float(math.sin(a))
+
+# cos tool
+@pure
+def cos(a: int) -> float:
+    """cos of a number"""
+    return float(math.cos(a))
+
+# tan tool
+@pure
+def tan(a: int) -> float:
+    """tan of a number"""
+    return float(math.tan(a))
+
+# expression tool
+@heavy
+def evaluate_expression(expr: str) -> int | float | list:
+    """Evaluate a whole arithmetic expression in one call, e.g. log(7!) + 2^10 mod 7. Supports + - * / // % ^ ! and the functions factorial, log, sqrt, cbrt, exp, sin, cos, tan, radians, power, remainder, fibonacci, fibonacci_numbers, sum, abs, min, max"""
+    return expression_eval.evaluate(expr)
+
+# batch tools, one vectorized pass over a whole list of values
+@pure
+def sin_batch(values: list[float]) -> list[float]:
+    """sin of every number in a list"""
+    return _batch_math().apply_elementwise("sin", values)
+
+@pure
+def cos_batch(values: list[float]) -> list[float]:
+    """cos of every number in a list"""
+    return _batch_math().apply_elementwise("cos", values)
+
+@pure
+def tan_batch(values: list[float]) -> list[float]:
+    """tan of every number in a list"""
+    return _batch_math().apply_elementwise("tan", values)
+
+@pure
+def power_batch(bases: list[int], exponent: int) -> list[int]:
+    """Raise every number in a list to the same power"""
+    return _batch_math().power_batch(bases, exponent)
+
+@pure
+def apply_elementwise(op: str, values: list[float]) -> list[float]:
+    """Apply one operation (sin, cos, tan, log, sqrt, cbrt or exp) to every number in a list"""
+    return _batch_math().apply_elementwise(op, values)
+
+# mine tool
+@pure
+def mine(a: int, b: int) -> int:
+    """special mining tool"""
+    return int(a - b - b)
+
+@pure
+def strings_to_chars_to_int(string: str) -> list[int]:
+    """Return the ASCII values of the characters in a word"""
+    return [int(ord(char)) for char in string]
+
+@heavy
+@pure
+def int_list_to_exponential_sum(int_list: list) -> float:
+    """Return sum of exponentials of numbers in a list"""
+    return exponential_sum(int_list)
+
+@pure
+def int_list_to_log_exponential_sum(int_list: list) -> float:
+    """Return the natural log of the sum of exponentials of numbers in a list (works for very large numbers)"""
+    return logsumexp(int_list)
+
+@heavy
+@pure
+def fibonacci_numbers(n: int) -> list:
+    """Return the first n Fibonacci Numbers"""
+    if n <= 0:
+        return []
+    return fib.fibonacci_range(0, n)
+
+@heavy
+@pure
+def fibonacci_nth(n: int) -> int:
+    """Return only the n-th Fibonacci number (F(0) = 0, F(1) = 1), fast even for huge n"""
+    return fib.fibonacci_nth(n)
+
+@heavy
+@pure
+def fibonacci_range(start: int, count: int) -> list:
+    """Return count consecutive Fibonacci numbers starting at index start, without computing the ones before it"""
+    return fib.fibonacci_range(start, count)
+
+@heavy
+@pure
+def fibonacci_page(cursor: str = "", page_size: int = 100) -> dict:
+    """Return one page of the Fibonacci sequence; pass the returned next_cursor to get the following page"""
+    return fib.fibonacci_page(cursor, page_size)
+
+# prime tools
+@pure
+def nth_prime(n: int) -> int:
+    """Return the n-th prime number (the 1st is 2)"""
+    return primes.nth_prime(n)
+
+@pure
+def primes_first_n(n: int) -> list:
+    """Return the first n prime numbers"""
+    return primes.primes_first_n(n)
+
+@pure
+def prime_sum(n: int) -> int:
+    """Return the sum of the first n prime numbers"""
+    return primes.prime_sum(n)
+
+@pure
+def is_prime(n: int) -> bool:
+    """Check whether a number is prime, fast even for very large numbers"""
+    return primes.is_prime(n)
+
+@heavy
+@pure
+def prime_factors(n: int) -> list:
+    """Return the prime factors of a positive number in ascending order, repeated by multiplicity"""
+    return primes.prime_factors(n)
+
+# modular tools
+@pure
+def pow_mod(a: int, b: int, m: int) -> int:
+    """Return a^b mod m without computing a^b first - use it instead of power then remainder"""
+    return modular.pow_mod(a, b, m)
+
+@heavy
+@pure
+def factorial_mod(n: int, m: int) -> int:
+    """Return n! mod m without computing n! first"""
+    return modular.factorial_mod(n, m)
+
+@heavy
+@pure
+def binomial_mod(n: int, k: int, m: int) -> int:
+    """Return the binomial coefficient C(n, k) mod m, fast for huge n when m is prime or squarefree"""
+    return modular.binomial_mod(n, k, m)
+
+@pure
+def mod_inverse(a: int, m: int) -> int:
+    """Return the x with a * x = 1 mod m"""
+    return modular.mod_inverse(a, m)
+
+# cache admin tool
+def tool_cache_stats(flush: bool = False) -> dict:
+    """Inspect the result cache of the pure math tools (hits, misses, size), optionally flushing it"""
+    stats = tool_cache.stats()
+    if flush:
+        tool_cache.clear()
+        stats["flushed"] = True
+    return stats
+
+
+# Registered on every platform
+TOOLS = [
+    add, add_list, subtract, multiply, divide, power, sqrt, cbrt, factorial, log,
+    remainder, sin, cos, tan, evaluate_expression, mine, strings_to_chars_to_int,
+    int_list_to_exponential_sum, int_list_to_log_exponential_sum, fibonacci_numbers,
+    fibonacci_nth, fibonacci_range, fibonacci_page, nth_prime, primes_first_n, prime_sum,
+    is_prime, prime_factors, pow_mod, factorial_mod, binomial_mod, mod_inverse, tool_cache_stats,
+]
+
+# Registered only when NumPy is installed
+NUMPY_TOOLS = [
+    sin_batch, cos_batch, tan_batch, power_batch, apply_elementwise,
+]
+
+
+def register(mcp):
+    from mcp.types import ToolAnnotations
+
+    # Every math tool but the cache report is a pure function of its
+    # arguments, so the agent may run it speculatively (see speculation.py)
+    read_only = ToolAnnotations(readOnlyHint=True)
+    # Big numbers come back as result:// handles and are accepted as
+    # arguments (see result_store.py)
+    for tool in TOOLS:
+        mcp.tool(annotations=None if tool is tool_cache_stats else read_only)(handled(tool))
+    if importlib.util.find_spec("numpy") is not None:
+        for tool in NUMPY_TOOLS:
+            mcp.tool(annotations=read_only)(handled(tool))
@@ -0,0 +1,115 @@
+# Modular arithmetic
+#
+# Answers "... mod m" without building the number before the mod:
+# 2^100000 mod 7 is 17 modular squarings instead of a 30103-digit power
+# sent to remainder, and 10^6! mod p never materializes 10^6!. Binomials
+# modulo a prime use Lucas' theorem and modulo a squarefree number the
+# Chinese remainder theorem over its prime factors; other moduli fall back
+# to the exact binomial when that is small enough to build.
+import math
+
+import bigint
+import primes
+
+# Consecutive factors multiplied together before reducing mod m
+CHUNK = 64
+# Exact binomials (in bits, roughly k * log2(n)) cheaper than any modular
+# method, and the largest built for a modulus with a repeated prime factor
+SMALL_BINOMIAL_BITS = 100_000
+MAX_EXACT_BINOMIAL_BITS = 10_000_000
+
+
+def _check_modulus(m):
+    if m < 1:
+        raise ValueError(f"The modulus must be a positive integer, got {m}")
+
+
+def product_mod(start, stop, m):
+    """start * (start + 1) * ... * (stop - 1) mod m"""
+    result = 1 % m
+    for lo in range(start, stop, CHUNK):
+        result = result * math.prod(range(lo, min(lo + CHUNK, stop))) % m
+        if not result:
+            break
+    return result
+
+
+def mod_inverse(a, m):
+    """x with a * x = 1 (mod m)"""
+    _check_modulus(m)
+    try:
+        return pow(a, -1, m)
+    except ValueError:
+        raise ValueError(f"{a} has no inverse modulo {m} (they share the factor {math.gcd(a, m)})") from None
+
+
+def pow_mod(a, b, m):
+    """a^b mod m; a negative b needs a invertible mod m"""
+    _check_modulus(m)
+    if b < 0:
+        return bigint.pow_mod(mod_inverse(a, m), -b, m)
+    return bigint.pow_mod(a, b, m)
+
+
+def factorial_mod(n, m):
+    """n! mod m"""
+    _check_modulus(m)
+    if n < 0:
+        raise ValueError("factorial is only defined for non-negative integers")
+    if n >= m:
+        return 0  # m is one of the factors
+    # Wilson's theorem: (p-1)! = -1 (mod p), so near p divide down from it
+    if m - 1 - n < n and primes.is_prime(m):
+        return -mod_inverse(product_mod(n + 1, m, m), m) % m
+    return product_mod(2, n + 1, m)
+
+
+def _binomial_small(n, k, p):
+    """C(n, k) mod a prime p, for n < p"""
+    if k > n:
+        return 0
+    k = min(k, n - k)
+    return product_mod(n - k + 1, n + 1, p) * mod_inverse(product_mod(2, k + 1, p), p) % p
+
+
+def _binomial_lucas(n, k, p):
+    """C(n, k) mod a prime p by Lucas' theorem: the product over the base-p digits"""
+    result = 1
+    while k and result:
+        n, n_digit = divmod(n, p)
+        k, k_digit = divmod(k, p)
+        result = result * _binomial_small(n_digit, k_digit, p) % p
+    return result
+
+
+def _crt(residues, moduli):
+    """x mod prod(moduli) with x = residues[i] (mod moduli[i]), for pairwise coprime moduli"""
+    x, modulus = 0, 1
+    for r, m in zip(residues, moduli):
+        x += (r - x) * mod_inverse(modulus, m) % m * modulus
+        modulus *= m
+    return x % modulus
+
+
+def binomial_mod(n, k, m):
+    """C(n, k) mod m"""
+    _check_modulus(m)
+    if n < 0 or k < 0:
+        raise ValueError("binomial coefficients need non-negative n and k")
+    if k > n or m == 1:
+        return 0
+    k = min(k, n - k)
+    bits = k * n.bit_length()
+    if bits <= SMALL_BINOMIAL_BITS:
+        return math.comb(n, k) % m
+    if primes.is_prime(m):
+        return _binomial_lucas(n, k, m)
+    factors = primes.prime_factors(m)
+    if len(set(factors)) == len(factors):
+        return _crt([_binomial_lucas(n, k, p) for p in factors], factors)
+    if bits <= MAX_EXACT_BINOMIAL_BITS:
+        return math.comb(n, k) % m
+    raise ValueError(
+        f"C({n}, {k}) is too large to compute exactly and {m} has a repeated prime factor; "
+        "use a prime or squarefree modulus"
+    )
@@ -0,0 +1,403 @@
+# Prime number engine
+#
+# One process-wide Sieve of Eratosthenes answers nth_prime, primes_first_n
+# and prime_sum. It keeps a flag per odd number in a bytearray, so a sieve
+# up to 10^8 is 50 MB, and grows on demand: each extension sieves only the
+# new range, one segment at a time, using the primes the sieve already has.
+# Per-block prime counts and sums make the n-th prime or the sum of the
+# first n primes a lookup plus a scan of a single block.
+#
+# With PRIME_SIEVE_FILE set the sieve is saved there whenever it grows and
+# memory-mapped read-only on the next start, so a restarted server (or
+# several servers) shares the work instead of sieving again.
+#
+# Numbers past the sieve are tested with Miller-Rabin, which is exact with
+# 13 fixed bases below 3.3 * 10^24, and Baillie-PSW above that; they are
+# factored with Pollard's rho (Brent's variant).
+#
+# Configuration:
+#   PRIME_SIEVE_FILE    where to persist the sieve (off by default)
+#   PRIME_SIEVE_LIMIT   largest number the sieve may cover (10^8)
+import itertools
+import math
+import mmap
+import os
+import random
+import struct
+import threading
+from array import array
+
+BLOCK = 1 << 16  # flags per block, i.e. 131072 numbers
+SEGMENT = 16 * BLOCK  # flags sieved at a time while growing
+DEFAULT_LIMIT = 10 ** 8
+MAGIC = b"PRIMESV1"
+HEADER = struct.Struct("<8sQQ")  # magic, flag count, block size
+
+# Miller-Rabin with these bases is deterministic below MR_DETERMINISTIC_LIMIT
+MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+MR_DETERMINISTIC_LIMIT = 3317044064679887385961981
+TRIAL_DIVISION_LIMIT = 10 ** 4
+
+
+def max_limit():
+    return int(os.getenv("PRIME_SIEVE_LIMIT", str(DEFAULT_LIMIT)))
+
+
+def nth_prime_bound(n):
+    """An upper bound on the n-th prime (Rosser's theorem for n >= 6)"""
+    if n < 6:
+        return 13
+    log_n = math.log(n)
+    return int(n * (log_n + math.log(log_n))) + 1
+
+
+class Sieve:
+    """Primality flags for the odd numbers below limit: flags[i] is 1 when 2i+1 is prime"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.flags = bytearray()
+        self.block_counts = array("Q")  # odd primes in each block
+        self.block_sums = array("Q")  # their sum
+        self._map = None
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                self._load(path)
+            except (OSError, ValueError, EOFError, struct.error):
+                self.flags, self.block_counts, self.block_sums = bytearray(), array("Q"), array("Q")
+
+    @property
+    def limit(self):
+        """Every number below this is covered"""
+        return 2 * len(self.flags)
+
+    # Growing
+
+    def ensure(self, limit):
+        """Grow the sieve until it covers every number below limit"""
+        if limit <= self.limit:
+            return
+        with self._lock:
+            if limit <= self.limit:
+                return
+            if limit > max_limit():
+                raise ValueError(f"That needs primes up to {limit:,}, past PRIME_SIEVE_LIMIT ({max_limit():,})")
+            # At least double, so a run of growing queries sieves O(limit) in total
+            target = min(max(limit, 2 * self.limit), max_limit() + 2 * BLOCK)
+            self._grow(-(-target // (2 * BLOCK)) * BLOCK)
+            if self.path:
+                self._save(self.path)
+
+    def _grow(self, size):
+        if isinstance(self.flags, memoryview):
+            flags = bytearray(self.flags)  # copy out of the read-only mapping
+            self.flags.release()
+            self._map.close()
+            self.flags, self._map = flags, None
+        if not self.flags:
+            self.flags = self._small_sieve(BLOCK)
+            self._count_blocks(0)
+        # Primes up to sqrt of the new limit must be known first
+        root = math.isqrt(2 * size) + 1
+        if root >= self.limit:
+            self._grow(-(-(root // 2 + 1) // BLOCK) * BLOCK)
+        base = list(itertools.compress(range(1, root + 1, 2), self.flags[:root // 2 + 1]))
+        first_block = len(self.block_counts)
+        for start in range(len(self.flags), size, SEGMENT):
+            self.flags += self._segment(start, min(start + SEGMENT, size), base)
+        self._count_blocks(first_block)
+
+    @staticmethod
+    def _small_sieve(size):
+        flags = bytearray([1]) * size
+        flags[0] = 0  # 1 is not prime
+        for i in range(1, (math.isqrt(2 * size) + 1) // 2 + 1):
+            if flags[i]:
+                p = 2 * i + 1
+                first = p * p // 2
+                flags[first::p] = bytes(len(range(first, size, p)))
+        return flags
+
+    @staticmethod
+    def _segment(lo, hi, base):
+        """Flags lo..hi (the odd numbers 2lo+1 .. 2hi-1), crossed off by the base primes"""
+        size = hi - lo
+        segment = bytearray([1]) * size
+        low_number = 2 * lo + 1
+        for p in base:
+            square = p * p
+            if square >= 2 * hi:
+                break
+            # First odd multiple of p in the segment, at least p^2
+            first = max(square, -(-low_number // p) * p)
+            if first % 2 == 0:
+                first += p
+            start = (first - low_number) // 2
+            segment[start::p] = bytes(len(range(start, size, p)))
+        return segment
+
+    def _count_blocks(self, first_block):
+        del self.block_counts[first_block:]
+        del self.block_sums[first_block:]
+        for block in range(first_block, len(self.flags) // BLOCK):
+            lo = block * BLOCK
+            primes = itertools.compress(range(2 * lo + 1, 2 * (lo + BLOCK), 2), self.flags[lo:lo + BLOCK])
+            self.block_counts.append(self.flags.count(1, lo, lo + BLOCK))
+            self.block_sums.append(sum(primes))
+
+    # Persistence
+
+    def _save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(HEADER.pack(MAGIC, len(self.flags), BLOCK))
+                self.block_counts.tofile(f)
+                self.block_sums.tofile(f)
+                f.write(self.flags)
+            os.replace(tmp, path)
+        except OSError:
+            # Persistence is an optimization; the sieve in memory is still good
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            magic, size, block = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or block != BLOCK or size % BLOCK:
+                raise ValueError(f"{path} is not a sieve file of this version")
+            blocks = size // BLOCK
+            counts, sums = array("Q"), array("Q")
+            counts.fromfile(f, blocks)
+            sums.fromfile(f, blocks)
+            offset = f.tell()
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mapped) != offset + size:
+            mapped.close()
+            raise ValueError(f"{path} is truncated")
+        self._map = mapped
+        self.flags = memoryview(mapped)[offset:]
+        self.block_counts, self.block_sums = counts, sums
+
+    # Queries
+
+    def is_prime(self, n):
+        """Lookup for a number the sieve covers"""
+        if n == 2:
+            return True
+        return n > 2 and n % 2 == 1 and self.flags[n // 2] == 1
+
+    def _odd_primes_upto_index(self, k):
+        """Block index and the count and sum of the odd primes in the blocks before it, for the k-th odd prime"""
+        count = total = 0
+        for block, block_count in enumerate(self.block_counts):
+            if count + block_count >= k:
+                return block, count, total
+            count += block_count
+            total += self.block_sums[block]
+        raise ValueError("The sieve doesn't reach that far")
+
+    def _first_odd_primes(self, k):
+        """The odd primes 3, 5, ... up to the k-th, as (primes of the last partial block, count and sum before it)"""
+        self.ensure(nth_prime_bound(k + 1))
+        block, count, total = self._odd_primes_upto_index(k)
+        lo = block * BLOCK
+        odd = itertools.compress(range(2 * lo + 1, 2 * (lo + BLOCK), 2), self.flags[lo:lo + BLOCK])
+        return list(itertools.islice(odd, k - count)), count, total
+
+    def nth_prime(self, n):
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        if n == 1:
+            return 2
+        primes, _, _ = self._first_odd_primes(n - 1)
+        return primes[-1]
+
+    def primes_first_n(self, n):
+        if n < 1:
+            return []
+        if n == 1:
+            return [2]
+        self.ensure(nth_prime_bound(n))
+        size = nth_prime_bound(n) // 2 + 1
+        odd = itertools.compress(range(1, 2 * size, 2), self.flags[:size])
+        return [2, *itertools.islice(odd, n - 1)]
+
+    def prime_sum(self, n):
+        if n < 1:
+            return 0
+        if n == 1:
+            return 2
+        primes, _, total = self._first_odd_primes(n - 1)
+        return 2 + total + sum(primes)
+
+    def small_primes(self, bound):
+        """Primes below bound (bound must be within the sieve)"""
+        self.ensure(bound)
+        size = bound // 2
+        return [2, *itertools.compress(range(3, 2 * size, 2), self.flags[1:size])] if bound > 2 else []
+
+
+_sieve = None
+_sieve_lock = threading.Lock()
+
+
+def get_sieve():
+    """The process-wide sieve, loaded from PRIME_SIEVE_FILE on first use"""
+    global _sieve
+    if _sieve is None:
+        with _sieve_lock:
+            if _sieve is None:
+                _sieve = Sieve(os.getenv("PRIME_SIEVE_FILE") or None)
+    return _sieve
+
+
+def nth_prime(n):
+    return get_sieve().nth_prime(n)
+
+
+def primes_first_n(n):
+    return get_sieve().primes_first_n(n)
+
+
+def prime_sum(n):
+    return get_sieve().prime_sum(n)
+
+
+def _strong_probable_prime(n, base):
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    x = pow(base, d, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
+
+
+def _jacobi(a, n):
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def _strong_lucas_probable_prime(n):
+    """Strong Lucas test with Selfridge's parameters, for odd n that isn't a square"""
+    d = 5
+    while True:
+        jacobi = _jacobi(d, n)
+        if jacobi == -1:
+            break
+        if jacobi == 0 and abs(d) != n:
+            return False
+        d = -d - 2 if d > 0 else -d + 2
+    p, q = 1, (1 - d) // 4
+    k, s = n + 1, 0
+    while k % 2 == 0:
+        k //= 2
+        s += 1
+
+    def half(x):
+        return (x + n) // 2 % n if x % 2 else x // 2 % n
+
+    # U_k, V_k and Q^k by the binary expansion of k
+    u, v, qk = 1, p, q % n
+    for bit in bin(k)[3:]:
+        u, v, qk = u * v % n, (v * v - 2 * qk) % n, qk * qk % n
+        if bit == "1":
+            u, v, qk = half(p * u + v), half(d * u + p * v), qk * q % n
+    if u == 0 or v == 0:
+        return True
+    for _ in range(s - 1):
+        v, qk = (v * v - 2 * qk) % n, qk * qk % n
+        if v == 0:
+            return True
+    return False
+
+
+def is_prime(n):
+    """Primality by sieve lookup, then Miller-Rabin (exact below 3.3 * 10^24), then Baillie-PSW"""
+    if n < 2:
+        return False
+    sieve = get_sieve()
+    if n < sieve.limit:
+        return sieve.is_prime(n)
+    for p in MR_BASES:
+        if n % p == 0:
+            return n == p
+    if n < MR_DETERMINISTIC_LIMIT:
+        return all(_strong_probable_prime(n, base) for base in MR_BASES)
+    # No composite is known to pass both of these
+    if not _strong_probable_prime(n, 2) or math.isqrt(n) ** 2 == n:
+        return False
+    return _strong_lucas_probable_prime(n)
+
+
+def _pollard_brent(n):
+    """A non-trivial factor of the odd composite n"""
+    while True:
+        y, c, m = random.randrange(1, n), random.randrange(1, n), 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            # The batch overshot; step back one at a time
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+def prime_factors(n):
+    """Prime factors of n in ascending order, with multiplicity"""
+    if n < 1:
+        raise ValueError("Only positive integers have a prime factorization")
+    factors = []
+    for p in get_sieve().small_primes(TRIAL_DIVISION_LIMIT):
+        if p * p > n:
+            break
+        while n % p == 0:
+            factors.append(p)
+            n //= p
+    pending = [n] if n > 1 else []
+    while pending:
+        m = pending.pop()
+        if is_prime(m):
+            factors.append(m)
+            continue
+        root = math.isqrt(m)
+        if root * root == m:
+            pending += [root, root]
+            continue
+        d = _pollard_brent(m)
+        pending += [d, m // d]
+    return sorted(factors)
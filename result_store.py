@@ -0,0 +1,288 @@
+# Result handles for large tool outputs
+#
+# factorial(5000) has 16326 digits, and the client used to put every digit
+# into each later prompt. Results whose text would exceed
+# RESULT_HANDLE_MIN_CHARS are kept here instead, in a size-bounded LRU, and
+# the tool returns a handle plus a compact summary:
+#   {"handle": "result://3f2a...", "summary": {"type": "int", "digits": 16326,
+#    "head": "42285779266...", "tail": "...00000000", "sha256": "..."}}
+# The full value is readable as the resource result://{id}, and the tools
+# that opt in with handled() (the math tools) accept a handle wherever they
+# take a value, so big numbers go from one tool to the next without passing
+# through the LLM. Tools whose output is the point (SVG, images) don't opt
+# in; tools like email only resolve handles in their arguments. Summaries of big ints are
+# computed from their top bits and a modulus rather than from their decimal
+# text, so they cost almost nothing even for a million digits. When the full
+# text is needed, bigint.to_decimal builds it in subquadratic time.
+#
+# Configuration:
+#   RESULT_HANDLE_MIN_CHARS   results at least this long as text become
+#                             handles (1000); 0 disables handles
+#   RESULT_STORE_MAX_BYTES    memory budget of the store (256 MB)
+import decimal
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import typing
+from collections import OrderedDict
+
+import bigint
+from tool_cache import estimate_size
+from tracing import metrics
+
+SCHEME = "result://"
+HANDLE_PATTERN = r"^result://[0-9a-f]{24}$"
+HEAD_DIGITS = 12
+HEAD_CHARS = 60
+HEAD_ITEMS = 5
+# Below this size str(int) is cheap (and within Python's default 4300-digit limit)
+EXACT_DIGITS_BITS = 13_000
+
+
+def is_handle(value):
+    return isinstance(value, str) and value.startswith(SCHEME)
+
+
+def text_size(value):
+    """Length of the value's JSON/decimal text, estimated without building it"""
+    if isinstance(value, bool) or value is None:
+        return 5
+    if isinstance(value, int):
+        return int(abs(value).bit_length() * 0.30103) + 2
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return 2 + sum(text_size(item) + 2 for item in value)
+    return len(repr(value))
+
+
+def int_digits(value, head=HEAD_DIGITS):
+    """(digit count, first `head` digits) of a non-negative int"""
+    if value.bit_length() <= EXACT_DIGITS_BITS:
+        text = str(value)
+        return len(text), text[:head]
+    # value lies in [top * 2^shift, (top + 1) * 2^shift); if both ends agree
+    # on the digit count and the leading digits, so does value
+    for top_bits in (128, 1024):
+        shift = value.bit_length() - top_bits
+        top = value >> shift
+        with decimal.localcontext() as ctx:
+            ctx.prec = head + top_bits // 3
+            ctx.Emax = decimal.MAX_EMAX
+            scale = decimal.Decimal(2) ** shift
+            ends = []
+            for bound in (top, top + 1):
+                _, digits, exponent = (decimal.Decimal(bound) * scale).as_tuple()
+                ends.append((len(digits) + exponent, "".join(map(str, digits[:head]))))
+        if ends[0] == ends[1]:
+            return ends[0]
+    # value sits right on a boundary like 10^k - 1
+    text = bigint.to_decimal(value)
+    return len(text), text[:head]
+
+
+def _item(value):
+    """A list item as it appears in a summary: big ints shortened"""
+    if isinstance(value, int) and not isinstance(value, bool) and abs(value).bit_length() > 100:
+        return summarize(value)
+    if isinstance(value, str) and len(value) > HEAD_CHARS:
+        return value[:HEAD_CHARS] + "..."
+    return value
+
+
+def fingerprint(value):
+    """sha256 of the value's canonical bytes"""
+    digest = hashlib.sha256()
+    if isinstance(value, int) and not isinstance(value, bool):
+        digest.update(b"int:")
+        digest.update(value.to_bytes((value.bit_length() + 8) // 8 or 1, "big", signed=True))
+    elif isinstance(value, str):
+        digest.update(b"str:")
+        digest.update(value.encode("utf-8"))
+    else:
+        digest.update(b"json:")
+        digest.update(json.dumps(value, default=repr, separators=(",", ":")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def summarize(value):
+    """Compact description of a stored value"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        digits, head = int_digits(abs(value))
+        tail = str(abs(value) % 10 ** HEAD_DIGITS).zfill(min(HEAD_DIGITS, digits))
+        summary = {"type": "int", "digits": digits, "head": head, "tail": tail}
+        if value < 0:
+            summary["sign"] = "-"
+        return summary
+    if isinstance(value, str):
+        return {"type": "str", "length": len(value), "head": value[:HEAD_CHARS], "tail": value[-HEAD_CHARS:]}
+    if isinstance(value, (list, tuple)):
+        return {
+            "type": "list",
+            "length": len(value),
+            "head": [_item(item) for item in value[:HEAD_ITEMS]],
+            "tail": [_item(item) for item in value[-HEAD_ITEMS:]] if len(value) > HEAD_ITEMS else [],
+        }
+    return {"type": type(value).__name__}
+
+
+class ResultStore:
+    """Large tool results by id, evicted least recently used first"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_entries=10_000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> (value, size, summary)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+
+    def put(self, value):
+        """Store value; returns (handle, summary). Equal values share one handle."""
+        digest = fingerprint(value)
+        result_id = digest[:24]
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is not None:
+                self._entries.move_to_end(result_id)
+                return SCHEME + result_id, entry[2]
+        summary = summarize(value)
+        summary["sha256"] = digest
+        size = estimate_size(value)
+        with self._lock:
+            if result_id not in self._entries:
+                self._entries[result_id] = (value, size, summary)
+                self.bytes += size
+            while len(self._entries) > 1 and (self.bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return SCHEME + result_id, summary
+
+    def get(self, handle):
+        """The value behind a handle (or bare id); ValueError if unknown or evicted"""
+        result_id = handle[len(SCHEME):] if is_handle(handle) else handle
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                raise ValueError(f"Unknown or expired result handle {handle!r}")
+            self._entries.move_to_end(result_id)
+            return entry[0]
+
+    def resolve(self, value):
+        """value with any handles in it (top level or list items) replaced by their values"""
+        if is_handle(value):
+            return self.get(value)
+        if isinstance(value, list) and any(is_handle(item) for item in value):
+            return [self.get(item) if is_handle(item) else item for item in value]
+        return value
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+store = ResultStore(max_bytes=int(os.getenv("RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024))))
+
+
+def min_chars():
+    return int(os.getenv("RESULT_HANDLE_MIN_CHARS", "1000"))
+
+
+def package(tool, value, threshold):
+    """The tool's result, or a handle and summary if the value is big"""
+    if threshold <= 0 or isinstance(value, bool) or not isinstance(value, (int, str, list, tuple)):
+        return value
+    if text_size(value) < threshold:
+        return value
+    handle, summary = store.put(value)
+    metrics.inc("result_handles_total", tool=tool)
+    return {"handle": handle, "summary": summary}
+
+
+def _can_return(annotation, kinds=(int, str, list, tuple)):
+    """Whether a return annotation admits a value package() would turn into a handle"""
+    if annotation in kinds:
+        return True
+    origin = typing.get_origin(annotation)
+    if origin in kinds:
+        return True
+    return any(_can_return(arg, kinds) for arg in typing.get_args(annotation) if origin is not None)
+
+
+def _handle_signature(fn, handle_type, package_results=True):
+    """fn's signature with handles allowed for every non-string parameter and dict allowed as the result"""
+    signature = inspect.signature(fn)
+    parameters = [
+        p.replace(annotation=typing.Union[p.annotation, handle_type])
+        if p.annotation not in (inspect.Parameter.empty, str) else p
+        for p in signature.parameters.values()
+    ]
+    returns = signature.return_annotation
+    if package_results and returns is not inspect.Signature.empty and _can_return(returns):
+        returns = typing.Union[returns, dict]
+    return signature.replace(parameters=parameters, return_annotation=returns)
+
+
+def as_text(value):
+    """A resolved value for a string parameter: ints as decimal, lists as JSON"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return bigint.to_decimal(value)
+    return json.dumps(value, default=str)
+
+
+def handled_tool(fn, handle_type, package_results=True):
+    """Wrap a tool so handles in its arguments are resolved and big results become handles"""
+    name = fn.__name__
+    threshold = min_chars() if package_results else 0
+    signature = inspect.signature(fn)
+    text_params = {p.name for p in signature.parameters.values() if p.annotation is str}
+
+    def resolve(args, kwargs):
+        bound = signature.bind(*args, **kwargs)
+        for key, value in bound.arguments.items():
+            if is_handle(value) or isinstance(value, list):
+                value = store.resolve(value)
+                bound.arguments[key] = as_text(value) if key in text_params else value
+        return bound.args, bound.kwargs
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            args, kwargs = resolve(args, kwargs)
+            return package(name, await fn(*args, **kwargs), threshold)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            args, kwargs = resolve(args, kwargs)
+            return package(name, fn(*args, **kwargs), threshold)
+    wrapper.__signature__ = _handle_signature(fn, handle_type, package_results)
+    return wrapper
+
+
+def handled(fn, package_results=True):
+    """Opt a tool into result handles before registering it.
+
+    With package_results=False only handles in its arguments are resolved;
+    the result and return type are left as they are.
+    """
+    if min_chars() <= 0:
+        return fn
+    # pydantic comes with mcp; the pattern keeps plain strings like "5"
+    # converting to ints as before
+    from pydantic import StringConstraints
+    handle_type = typing.Annotated[str, StringConstraints(pattern=HANDLE_PATTERN)]
+    return handled_tool(fn, handle_type, package_results)
+
+
+def read_result(id: str) -> str:
+    """The full value behind a result handle, as text"""
+    return as_text(store.get(id))
+
+
+def register(mcp):
+    mcp.resource(SCHEME + "{id}")(read_result)
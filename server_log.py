@@ -0,0 +1,157 @@
+# Logging for the MCP server
+#
+# With the stdio transport stdout is the JSON-RPC channel, so the server must
+# never print to it. Records are put on a queue by a QueueHandler (cheap, no
+# I/O in the caller) and a QueueListener thread formats them and writes them
+# to stderr or a rotating file.
+#
+# Configuration:
+#   SERVER_LOG_LEVEL        minimum level (INFO)
+#   SERVER_LOG_FILE         write to this rotating file instead of stderr
+#   SERVER_LOG_MAX_BYTES    rotate after this many bytes (10 MB)
+#   SERVER_LOG_BACKUPS      rotated files to keep (3)
+#   SERVER_LOG_FORMAT       json (one object per line, default) or text
+#   SERVER_LOG_TOOL_CALLS   1 to log every tool call with its arguments and
+#                           duration; when off, tools are registered unwrapped
+#                           and per-call logging costs nothing
+import atexit
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+logger = logging.getLogger("paint_mcp")
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+MAX_ARGUMENT_CHARS = 200
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including the fields passed through extra="""
+
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update((key, value) for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=repr)
+
+
+def setup(stream=None):
+    """Attach the queue handler and start the writer thread (once per process)"""
+    global _listener
+    if _listener is not None:
+        return logger
+    path = os.getenv("SERVER_LOG_FILE")
+    if path:
+        handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=int(os.getenv("SERVER_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("SERVER_LOG_BACKUPS", "3")),
+            encoding="utf-8",
+        )
+    else:
+        handler = logging.StreamHandler(stream or sys.stderr)
+    if os.getenv("SERVER_LOG_FORMAT", "json") == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(os.getenv("SERVER_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+    return logger
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def tool_calls_enabled():
+    return os.getenv("SERVER_LOG_TOOL_CALLS", "0") not in ("0", "", "false")
+
+
+def _summarize(arguments):
+    summary = {}
+    for name, value in arguments.items():
+        if name == "ctx":
+            continue  # the MCP request context, not an argument
+        text = repr(value)
+        summary[name] = text if len(text) <= MAX_ARGUMENT_CHARS else text[:MAX_ARGUMENT_CHARS] + "..."
+    return summary
+
+
+def logged_tool(fn):
+    """Wrap a tool so each call is logged with its arguments, duration and outcome"""
+    name = fn.__name__
+    tool_logger = logger.getChild("tools")
+
+    def record(start, kwargs, error=None):
+        if not tool_logger.isEnabledFor(logging.WARNING if error else logging.INFO):
+            return
+        fields = {"tool": name, "arguments": _summarize(kwargs), "duration_ms": round((time.perf_counter() - start) * 1e3, 3)}
+        if error is None:
+            tool_logger.info("tool call", extra=fields)
+        else:
+            tool_logger.warning("tool call failed: %s", error, extra=fields)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                record(start, kwargs, e)
+                raise
+            record(start, kwargs)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                record(start, kwargs, e)
+                raise
+            record(start, kwargs)
+            return result
+    return wrapper
+
+
+def instrument(mcp):
+    """Log every tool registered from now on, if SERVER_LOG_TOOL_CALLS is set"""
+    if not tool_calls_enabled():
+        return mcp
+    register = mcp.tool
+
+    @functools.wraps(register)
+    def tool(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda fn: decorator(logged_tool(fn))
+
+    mcp.tool = tool
+    return mcp
@@ -0,0 +1,208 @@
+# Speculative tool execution for the agent loop
+#
+# While the model decides on the next step, the agent can already run the
+# step it is most likely to choose. TransitionTable counts, per tool, which
+# call followed it in past runs: the next tool and, for every argument,
+# whether it was the previous result ("$prev") or a literal. The counts come
+# from the agent.transition spans of earlier traces (TRACE_FILE) and grow as
+# the agent runs. Before each LLM request the Speculator starts the likely
+# call when the prediction is confident enough; when the model's actual
+# choice is the same call with the same arguments the result is used as is,
+# otherwise it is discarded.
+#
+# Only tools the server marks read-only (the MCP readOnlyHint annotation)
+# are ever run speculatively, so a wrong guess can't send an email or draw
+# on a slide.
+#
+# Configuration:
+#   AGENT_SPECULATION            0 disables speculation (on by default)
+#   SPECULATION_TRACES           span file to learn from (default TRACE_FILE)
+#   SPECULATION_MIN_PROBABILITY  minimum share of past transitions (0.6)
+#   SPECULATION_MIN_COUNT        minimum number of past transitions (3)
+import asyncio
+import json
+import os
+import sys
+
+import tracing
+from call_graph import reference_value
+
+PREV = "$prev"
+START = "<start>"
+
+
+def make_template(tool, arguments, previous_result):
+    """Describe a call's arguments as $prev or literals, relative to the previous result"""
+    template = {}
+    for name, value in arguments.items():
+        if previous_result is not None:
+            try:
+                if tool.convert(name, reference_value(previous_result)) == value:
+                    template[name] = PREV
+                    continue
+            except (TypeError, ValueError):
+                pass
+        template[name] = value
+    return template
+
+
+class TransitionTable:
+    """Counts of (next tool, argument template) after each tool"""
+
+    def __init__(self):
+        self.counts = {}  # previous tool -> {json key of (tool, template): count}
+
+    @classmethod
+    def from_traces(cls, path):
+        """Learn from the agent.transition spans of a trace file"""
+        table = cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("name") != "agent.transition" or record.get("status") != "ok":
+                        continue
+                    table.record(record.get("previous"), record["tool"], json.loads(record.get("template") or "{}"))
+        except OSError:
+            pass
+        return table
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("SPECULATION_TRACES") or os.getenv("TRACE_FILE")
+        return cls.from_traces(path) if path else cls()
+
+    def record(self, previous, tool, template):
+        key = json.dumps([tool, template], sort_keys=True, default=str)
+        followers = self.counts.setdefault(previous or START, {})
+        followers[key] = followers.get(key, 0) + 1
+
+    def observe(self, previous, tool, template):
+        """Record a transition the agent just made, and trace it for later runs"""
+        self.record(previous, tool, template)
+        with tracing.span("agent.transition", previous=previous or START, tool=tool,
+                          template=json.dumps(template, sort_keys=True, default=str)):
+            pass
+
+    def predict(self, previous, min_probability=0.6, min_count=3):
+        """(tool, template, probability) of the most likely next call, or None"""
+        followers = self.counts.get(previous or START)
+        if not followers:
+            return None
+        key, count = max(followers.items(), key=lambda item: item[1])
+        probability = count / sum(followers.values())
+        if count < min_count or probability < min_probability:
+            return None
+        tool, template = json.loads(key)
+        return tool, template, probability
+
+    def rows(self):
+        for previous, followers in self.counts.items():
+            total = sum(followers.values())
+            for key, count in sorted(followers.items(), key=lambda item: -item[1]):
+                tool, template = json.loads(key)
+                yield previous, tool, template, count, count / total
+
+
+class Speculation:
+    """One speculatively started call"""
+
+    def __init__(self, tool, arguments, task):
+        self.tool = tool
+        self.arguments = arguments
+        self.task = task
+        self.claimed = False
+
+    def matches(self, tool, arguments):
+        return not self.claimed and tool == self.tool and arguments == self.arguments
+
+    def discard(self):
+        if not self.claimed:
+            if self.task.done():
+                self.task.exception()  # retrieved, so a failed guess isn't logged
+            else:
+                self.task.cancel()
+        outcome = "hit" if self.claimed else "miss"
+        tracing.metrics.inc("speculation_total", tool=self.tool, outcome=outcome)
+
+
+class Speculator:
+    """Starts the predicted next call of one agent run and hands its result over on a hit"""
+
+    def __init__(self, table, catalog, call, min_probability=0.6, min_count=3):
+        self.table = table
+        self.catalog = catalog
+        self.call = call  # async call(name, arguments) -> tool result
+        self.min_probability = min_probability
+        self.min_count = min_count
+        self.current = None
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, table, catalog, call):
+        return cls(
+            table, catalog, call,
+            min_probability=float(os.getenv("SPECULATION_MIN_PROBABILITY", "0.6")),
+            min_count=int(os.getenv("SPECULATION_MIN_COUNT", "3")),
+        )
+
+    def start(self, previous_tool, previous_result):
+        """Start the likely next call after previous_tool, if it is confident and read-only"""
+        self.finish()
+        prediction = self.table.predict(previous_tool, self.min_probability, self.min_count)
+        if prediction is None:
+            return None
+        name, template, probability = prediction
+        try:
+            tool = self.catalog.get(name)
+        except ValueError:
+            return None
+        if not tool.read_only:
+            return None
+        if PREV in template.values() and previous_result is None:
+            return None
+        try:
+            arguments = {
+                key: tool.convert(key, reference_value(previous_result)) if value == PREV else value
+                for key, value in template.items()
+            }
+        except (TypeError, ValueError):
+            return None
+        with tracing.span("speculation.start", tool=name, probability=round(probability, 3)):
+            task = asyncio.get_running_loop().create_task(self.call(name, arguments))
+        self.current = Speculation(name, arguments, task)
+        return self.current
+
+    async def claim(self, tool, arguments):
+        """The speculative result if it is exactly this call, else None"""
+        speculation = self.current
+        if speculation is None or not speculation.matches(tool, arguments):
+            return None
+        speculation.claimed = True
+        try:
+            return await speculation.task
+        except Exception:
+            return None  # run it for real instead
+
+    def finish(self):
+        """Account for the current speculation and drop it if nobody used it"""
+        speculation, self.current = self.current, None
+        if speculation is None:
+            return
+        if speculation.claimed:
+            self.hits += 1
+        else:
+            self.misses += 1
+        speculation.discard()
+
+
+if __name__ == "__main__":
+    table = TransitionTable.from_traces(sys.argv[1] if len(sys.argv) > 1 else os.getenv("TRACE_FILE", "trace.jsonl"))
+    print(f"{'after':<32}{'next call':<60}{'count':>7}{'share':>8}")
+    for previous, tool, template, count, share in table.rows():
+        call = f"{tool}({', '.join(f'{k}={v}' for k, v in template.items())})"
+        print(f"{previous:<32}{call[:58]:<60}{count:>7}{share:>8.0%}")
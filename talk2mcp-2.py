@@ -1,190 +1,107 @@
 import os
+import sys
+import json
+import argparse
+from contextlib import AsyncExitStack, asynccontextmanager, redirect_stdout
 from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 import asyncio
-from google import genai
+import time
 from concurrent.futures import TimeoutError
 from functools import partial
+import tracing
+from agent_context import ConversationContext, estimate_tokens
+from call_graph import parse_calls, execute_graph
+from llm_cache import LLMCache, CachedResponse
+from llm_stream import stream_decision, with_retries
+from tool_catalog import ToolCatalog
+from agent_metrics import RunMetrics
+from speculation import TransitionTable, Speculator, make_template
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Access your API key and initialize Gemini client correctly
+# Spans go to TRACE_FILE, metrics are served on AGENT_METRICS_PORT (both optional)
+tracing.setup("agent")
+
+# Optional persistent cache of LLM responses (see llm_cache.py for the modes)
+llm_cache = LLMCache.from_env()
+
+# Access your API key; the Gemini client is created on first use so cache
+# replays and scripted benchmark runs don't need google-genai or a network
+model_name = "gemini-2.0-flash"
 api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+client = None
+
+# Streaming generation: stop reading once the decision lines are complete
+# (see llm_stream.py for the early-stop modes); optionally race a second
+# request when the first is slow and retry failures with jittered backoff
+llm_streaming = os.getenv("LLM_STREAMING", "1") != "0"
+llm_early_stop = os.getenv("LLM_EARLY_STOP", "decision")
+llm_retries = int(os.getenv("LLM_RETRIES", "0"))
+llm_hedge_after = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # seconds, 0 disables hedging
+
+def get_client():
+    """Return the Gemini client, creating it on first use"""
+    global client
+    if client is None:
+        from google import genai
+        client = genai.Client(api_key=api_key)
+    return client
+
+# How to reach the tools: "stdio" spawns example2.py as a separate process,
+# "inprocess" imports its FastMCP server and talks to it over memory streams
+TRANSPORTS = ("stdio", "inprocess")
+default_transport = os.getenv("MCP_TRANSPORT", "stdio")
 
-# Global variables for the agent's state
+# Agent settings
 max_iterations = 10  # Default of 10 iterations
-last_response = None
-iteration = 0
-iteration_response = []
+context_max_tokens = int(os.getenv("AGENT_CONTEXT_TOKENS", "4000"))  # Prompt budget per iteration
 
-async def generate_with_timeout(client, prompt, timeout=10):
-    """Generate content with a timeout"""
-    print("Starting LLM generation...")
-    try:
-        # Convert the synchronous generate_content call to run in a thread
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(
-                None, 
-                lambda: client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=prompt
-                )
-            ),
-            timeout=timeout
-        )
-        print("LLM generation completed")
-        return response
-    except TimeoutError:
-        print("LLM generation timed out!")
-        raise
-    except Exception as e:
-        print(f"Error in LLM generation: {e}")
-        raise
+# While the LLM decides, run the read-only call it most likely makes next,
+# learned from earlier runs' traces (see speculation.py)
+speculation_enabled = os.getenv("AGENT_SPECULATION", "1") != "0"
+speculation_table = TransitionTable.from_env()
 
-def reset_state():
-    """Reset all global variables to their initial state"""
-    global last_response, iteration, iteration_response
-    last_response = None
-    iteration = 0
-    iteration_response = []
+EXAMPLE_QUERIES = [
+    "Find the ASCII values of characters in HELLO and then return sum of exponentials of those values.",
+    "Calculate the fibonacci sequence for n=10 and create a visualization of the result.",
+    "Calculate 24 factorial and find a way to display the answer visually.",
+    "What is the sine of 45 degrees? Create a visual presentation.",
+    "Find the remainder when 2^10 is divided by 7 and create a nice visualization.",
+    "Calculate the factorial of 10 and display it visually in a small centered element.",
+    "Calculate the sum of the first 20 prime numbers and email me the result.",
+    "Compute 15! and create a visualization, then share the result via email.",
+    "Calculate the sum of squares for the first 10 Fibonacci numbers and visualize it.",
+    "Calculate the product of the first 5 cube roots and email the result.",
+    "Compute the logarithm of the factorial of 7 and create a presentation.",
+    "Calculate the tangent of 30 degrees, square it, and visualize the result.",
+]
 
-async def main():
-    reset_state()  # Reset at the start of main
-    print("Starting AI Agent...")
-    print("This agent can solve mathematical problems, create visual presentations, and share results via email.")
-    print("It analyzes and selects from available tools to accomplish each task.")
-    print("For visualization, it will identify appropriate tools for each step of the process.")
-    print("For sharing results, it can send emails with calculation outcomes when requested.")
-    
-    print("\nExample queries you can try:")
-    print("1. Find the ASCII values of characters in HELLO and then return sum of exponentials of those values.")
-    print("2. Calculate the fibonacci sequence for n=10 and create a visualization of the result.")
-    print("3. Calculate 24 factorial and find a way to display the answer visually.")
-    print("4. What is the sine of 45 degrees? Create a visual presentation.")
-    print("5. Find the remainder when 2^10 is divided by 7 and create a nice visualization.")
-    print("6. Calculate the factorial of 10 and display it visually in a small centered element.")
-    print("7. Calculate the sum of the first 20 prime numbers and email me the result.")
-    print("8. Compute 15! and create a visualization, then share the result via email.")
-    print("9. Calculate the sum of squares for the first 10 Fibonacci numbers and visualize it.")
-    print("10. Calculate the product of the first 5 cube roots and email the result.")
-    print("11. Compute the logarithm of the factorial of 7 and create a presentation.")
-    print("12. Calculate the tangent of 30 degrees, square it, and visualize the result.")
-    print("\nHow the agent works:")
-    print("1. It analyzes your query to understand what you're asking")
-    print("2. It examines all available tools to identify the most appropriate ones")
-    print("3. For each step, it selects and executes a specific tool")
-    print("4. For visualization tasks, it will:")
-    print("   - Select tools for mathematical calculations first")
-    print("   - Identify and select a tool to open a presentation application")
-    print("   - Find appropriate tools to create visual elements")
-    print("   - Select tools to add content to the visualization")
-    print("5. For email tasks, it will:")
-    print("   - Complete all calculations and/or visualizations first")
-    print("   - Format the results in a clear, readable manner")
-    print("   - Send an email containing the results to the configured recipient")
-    print(f"The agent will perform up to {max_iterations} iterations to complete the task.")
-    print("You can include preferences in your query (e.g., 'small', 'centered', 'detailed').")
-    print("\nNote: To use email functionality, make sure to configure GMAIL_EMAIL, GMAIL_APP_PASSWORD,")
-    print("and RECIPIENT_EMAIL in your .env file with valid credentials.")
-    
-    try:
-        # Create a single MCP server connection
-        print("\nConnecting to MCP server...")
-        server_params = StdioServerParameters(
-            command="python3",
-            args=["example2.py"]
-        )
+DEFAULT_QUERY = "Find the remainder when 2^10 is divided by 7 and send an email with the result"
 
-        async with stdio_client(server_params) as (read, write):
-            print("Connection established, creating session...")
-            async with ClientSession(read, write) as session:
-                print("Session created, initializing...")
-                await session.initialize()
-                
-                # Get available tools
-                print("Requesting tool list...")
-                tools_result = await session.list_tools()
-                tools = tools_result.tools
-                print(f"Successfully retrieved {len(tools)} tools")
-
-                # Create system prompt with available tools
-                print("Creating system prompt...")
-                print(f"Number of tools: {len(tools)}")
-                
-                try:
-                    # First, let's inspect what a tool object looks like
-                    # if tools:
-                    #     print(f"First tool properties: {dir(tools[0])}")
-                    #     print(f"First tool example: {tools[0]}")
-                    
-                    tools_description = []
-                    for i, tool in enumerate(tools):
-                        try:
-                            # Get tool properties
-                            params = tool.inputSchema
-                            desc = getattr(tool, 'description', 'No description available')
-                            name = getattr(tool, 'name', f'tool_{i}')
-                            
-                            # Format the input schema in a more readable way
-                            if 'properties' in params:
-                                param_details = []
-                                for param_name, param_info in params['properties'].items():
-                                    param_type = param_info.get('type', 'unknown')
-                                    param_desc = ""
-                                    
-                                    # Add parameter descriptions for visualization tools
-                                    if name == "add_rectangle_to_keynote":
-                                        if param_name in ["x1", "y1"]:
-                                            param_desc = " (top-left corner)"
-                                        elif param_name in ["x2", "y2"]:
-                                            param_desc = " (bottom-right corner)"
-                                    elif name == "add_text_to_keynote" and param_name == "text":
-                                        param_desc = " (content to display)"
-                                    elif name == "send_email_with_result":
-                                        if param_name == "result":
-                                            param_desc = " (the final answer or calculation result to share)"
-                                        elif param_name == "subject":
-                                            param_desc = " (optional email subject line)"
-                                    param_details.append(f"{param_name}: {param_type}{param_desc}")
-                                params_str = ', '.join(param_details)
-                            else:
-                                params_str = 'no parameters'
-
-                            tool_desc = f"{i+1}. {name}({params_str}) - {desc}"
-                            tools_description.append(tool_desc)
-                            print(f"Added description for tool: {tool_desc}")
-                        except Exception as e:
-                            print(f"Error processing tool {i}: {e}")
-                            tools_description.append(f"{i+1}. Error processing tool")
-                    
-                    tools_description = "\n".join(tools_description)
-                    print("Successfully created tools description")
-                except Exception as e:
-                    print(f"Error creating tools description: {e}")
-                    tools_description = "Error loading tools"
-                
-                print("Created system prompt...")
-                
-                system_prompt = f"""You are a versatile agent solving problems and creating visualizations. You have access to various mathematical tools and visualization applications through available functions.
+SYSTEM_PROMPT_TEMPLATE = """You are a versatile agent solving problems and creating visualizations. You have access to various mathematical tools and visualization applications through available functions.
 
 Available tools:
 {tools_description}
 
-You must respond with EXACTLY ONE line in one of these formats (no additional text):
-1. For function calls:
+You must respond in one of these formats (no additional text):
+1. For function calls, one or more lines:
    FUNCTION_CALL: function_name|param1|param2|...
+   Calls are numbered 1, 2, 3, ... in the order they appear. A parameter that is
+   just $1, $2, ... is the result of that earlier call in the same response
+   Independent calls are executed in parallel, so put all calls you can already make in one response.
    
-2. For final answers:
+2. For final answers, a single line:
    FINAL_ANSWER: [number]
 
 Important:
 - When a function returns multiple values, you need to process all of them
 - Only give FINAL_ANSWER when you have completed all necessary calculations
 - For complex mathematical operations, consider whether multiple steps or tools are needed
+- A calculation made of several arithmetic steps can often be done in one call with evaluate_expression
+- Very large results come back as a result:// handle with a summary (digit count, first and last digits); pass the handle (or $N) as a parameter instead of copying digits
 - Be careful to choose appropriate tools based on their descriptions, not just their names
 - The int_list_to_exponential_sum tool specifically calculates sum of e^x for each number, not other operations
 - When visualizing results, explore the available tools to find those that can:
@@ -206,6 +123,9 @@ Examples:
 - FUNCTION_CALL: add|5|3
 - FUNCTION_CALL: strings_to_chars_to_int|INDIA
 - FUNCTION_CALL: send_email_with_result|The factorial of 10 is 3628800|Factorial Calculation Result
+- FUNCTION_CALL: factorial|5
+  FUNCTION_CALL: power|2|10
+  FUNCTION_CALL: add|$1|$2
 - FINAL_ANSWER: [42]
 
 Query Analysis:
@@ -220,223 +140,519 @@ Query Analysis:
 - Pay attention to specific requirements in the query like size, position, or style preferences
 
 DO NOT include any explanations or additional text.
-Your entire response should be a single line starting with either FUNCTION_CALL: or FINAL_ANSWER:"""
-
-                # Get user query
-                print("\nEnter your query (or use default if empty):")
-                user_query = input().strip()
-                query = user_query if user_query else "Find the remainder when 2^10 is divided by 7 and send an email with the result"
-                print(f"\nProcessing query: {query}")
-                print("Starting the agent's decision-making process...")
-                
-                # Use global iteration variables
-                global iteration, last_response
-                
-                while iteration < max_iterations:
-                    print(f"\n--- Iteration {iteration + 1} ---")
-                    if last_response is None:
-                        current_query = query
-                        print("Agent is deciding which tool to use for the initial task...")
-                    else:
-                        current_query = current_query + "\n\n" + " ".join(iteration_response)
-                        current_query = current_query + "  What should I do next?"
-                        print("Agent is deciding which tool to select next based on previous results...")
-
-                    # Get model's response with timeout
-                    print("Preparing to generate decision...")
-                    prompt = f"{system_prompt}\n\nQuery: {current_query}"
-                    try:
-                        response = await generate_with_timeout(client, prompt)
-                        response_text = response.text.strip()
-                        print(f"Agent's decision: {response_text}")
-                        
-                        # Find the FUNCTION_CALL line in the response
-                        for line in response_text.split('\n'):
-                            line = line.strip()
-                            if line.startswith("FUNCTION_CALL:"):
-                                response_text = line
-                                break
-                        
-                    except Exception as e:
-                        print(f"Failed to get agent's decision: {e}")
-                        break
-
-
-                    if response_text.startswith("FUNCTION_CALL:"):
-                        _, function_info = response_text.split(":", 1)
-                        parts = [p.strip() for p in function_info.split("|")]
-                        func_name, params = parts[0], parts[1:]
-                        
-                        print(f"\nDEBUG: Tool chosen by agent: {func_name}")
-                        print(f"DEBUG: Parameters for execution: {params}")
-                        
-                        try:
-                            # Find the matching tool to get its input schema
-                            tool = next((t for t in tools if t.name == func_name), None)
-                            if not tool:
-                                print(f"DEBUG: Available tools that could have been chosen: {[t.name for t in tools]}")
-                                raise ValueError(f"Unknown tool: {func_name}")
-
-                            print(f"DEBUG: Preparing to execute tool: {tool.name}")
-                            print(f"DEBUG: Tool schema for parameter validation: {tool.inputSchema}")
-
-                            # Prepare arguments according to the tool's input schema
-                            arguments = {}
-                            schema_properties = tool.inputSchema.get('properties', {})
-                            print(f"DEBUG: Schema properties: {schema_properties}")
-
-                            for param_name, param_info in schema_properties.items():
-                                if not params:  # Check if we have enough parameters
-                                    raise ValueError(f"Not enough parameters provided for {func_name}")
-                                    
-                                value = params.pop(0)  # Get and remove the first parameter
-                                param_type = param_info.get('type', 'string')
-                                
-                                print(f"DEBUG: Converting parameter {param_name} with value {value} to type {param_type}")
-                                
-                                # Convert the value to the correct type based on the schema
-                                if param_type == 'integer':
-                                    arguments[param_name] = int(value)
-                                elif param_type == 'number':
-                                    arguments[param_name] = float(value)
-                                elif param_type == 'array':
-                                    # Handle array input
-                                    if isinstance(value, str):
-                                        value = value.strip('[]').split(',')
-                                    arguments[param_name] = [int(x.strip()) for x in value]
-                                else:
-                                    arguments[param_name] = str(value)
-
-                            print(f"DEBUG: Final arguments: {arguments}")
-                            print(f"DEBUG: Executing tool now: {func_name}")
-                            
-                            result = await session.call_tool(func_name, arguments=arguments)
-                            print(f"DEBUG: Execution completed, processing result...")
-                            
-                            # Get the full result content
-                            if hasattr(result, 'content'):
-                                print(f"DEBUG: Result has content attribute")
-                                # Handle multiple content items
-                                if isinstance(result.content, list):
-                                    iteration_result = [
-                                        item.text if hasattr(item, 'text') else str(item)
-                                        for item in result.content
-                                    ]
-                                else:
-                                    iteration_result = str(result.content)
-                            else:
-                                print(f"DEBUG: Result has no content attribute")
-                                iteration_result = str(result)
-                                
-                            print(f"DEBUG: Final iteration result: {iteration_result}")
-                            
-                            # Format the response based on result type
-                            if isinstance(iteration_result, list):
-                                result_str = f"[{', '.join(iteration_result)}]"
-                            else:
-                                result_str = str(iteration_result)
-                            
-                            # Provide more context when visualization functions are called
-                            if func_name == "open_keynote":
-                                print(f"\n=== In Iteration {iteration + 1} ===")
-                                print(f"Agent selected and executed: {func_name}")
-                                print("Result: Presentation application opened")
-                                
-                                iteration_response.append(
-                                    f"In iteration {iteration + 1}, I analyzed the available tools and selected '{func_name}' to begin visualization. "
-                                    f"After executing this tool, the result was: {result_str}. "
-                                    f"I'll now examine the remaining tools to find one suitable for creating a visual element."
-                                )
-                            elif func_name == "add_rectangle_to_keynote":
-                                # Calculate rectangle size and position
-                                x1 = arguments.get('x1', 0)
-                                y1 = arguments.get('y1', 0)
-                                x2 = arguments.get('x2', 0)
-                                y2 = arguments.get('y2', 0)
-                                width = x2 - x1
-                                height = y2 - y1
-                                center_x = x1 + width/2
-                                center_y = y1 + height/2
-                                
-                                print(f"\n=== In Iteration {iteration + 1} ===")
-                                print(f"Agent selected and executed: {func_name}")
-                                print("Result: Visual container created")
-                                print(f"   Size: {width}x{height} pixels")
-                                print(f"   Position: centered at ({center_x}, {center_y})")
-                                
-                                iteration_response.append(
-                                    f"In iteration {iteration + 1}, after reviewing the available tools, I selected '{func_name}' to create a visual container. "
-                                    f"I configured a shape with dimensions {width}x{height} at position ({center_x}, {center_y}). "
-                                    f"After execution, the result was: {result_str}. "
-                                    f"Next, I'll review the available tools to find one that can add textual content."
-                                )
-                            elif func_name == "add_text_to_keynote":
-                                print(f"\n=== In Iteration {iteration + 1} ===")
-                                print(f"Agent selected and executed: {func_name}")
-                                print("Result: Text added to the visual element")
-                                print(f"   Text: '{arguments.get('text', '')}'")
-                                print("\n=== Visualization Process Complete ===")
-                                
-                                iteration_response.append(
-                                    f"In iteration {iteration + 1}, I analyzed the remaining tools and selected '{func_name}' to add content. "
-                                    f"I applied the text '{arguments.get('text', 'unknown')}' to display the result. "
-                                    f"After execution, the result was: {result_str}. "
-                                    f"With this step complete, the visualization now contains all the necessary information."
-                                )
-                            elif func_name == "send_email_with_result":
-                                print(f"\n=== In Iteration {iteration + 1} ===")
-                                print(f"Agent selected and executed: {func_name}")
-                                print("Result: Email sent with calculation result")
-                                print(f"   Result shared: '{arguments.get('result', '')}'")
-                                print(f"   Subject: '{arguments.get('subject', 'Calculation Result')}'")
-                                print("\n=== Sharing Process Complete ===")
-                                
-                                iteration_response.append(
-                                    f"In iteration {iteration + 1}, I analyzed the available tools and selected '{func_name}' to share the result. "
-                                    f"I sent an email containing the result '{arguments.get('result', 'unknown')}' with subject '{arguments.get('subject', 'Calculation Result')}'. "
-                                    f"After execution, the result was: {result_str}. "
-                                    f"With this step complete, the results have been successfully shared via email."
-                                )
-                            else:
-                                # Default response for other function calls
-                                print(f"\n=== In Iteration {iteration + 1} ===")
-                                print(f"Agent selected and executed: {func_name}")
-                                print(f"Parameters used: {arguments}")
-                                print(f"Result: Operation completed")
-                                
-                                iteration_response.append(
-                                    f"In iteration {iteration + 1}, I selected the '{func_name}' tool with parameters {arguments}. "
-                                    f"After execution, the result was: {result_str}."
-                                )
-                            
-                            last_response = iteration_result
-
-                        except Exception as e:
-                            print(f"DEBUG: Error details: {str(e)}")
-                            print(f"DEBUG: Error type: {type(e)}")
-                            import traceback
-                            traceback.print_exc()
-                            iteration_response.append(f"Error in iteration {iteration + 1}: {str(e)}")
-                            break
-
-                    elif response_text.startswith("FINAL_ANSWER:"):
-                        # Extract the final answer
-                        _, answer = response_text.split(":", 1)
-                        print(f"\n=== In Iteration {iteration + 1} ===")
-                        print("Agent decided to provide a final answer")
-                        print(f"Result: {answer}")
-                        break
-                    
-                    iteration += 1
+Your entire response should be either FUNCTION_CALL: lines or a single FINAL_ANSWER: line"""
+
+async def generate_with_timeout(client, prompt, timeout=10):
+    """Generate content with a timeout; a timed-out request is cancelled, not left running"""
+    print("Starting LLM generation...")
+    try:
+        # A cache hit skips the model entirely
+        cached = llm_cache.get(model_name, prompt)
+        tracing.metrics.inc("llm_cache_lookups_total", result="miss" if cached is None else "hit")
+        if cached is not None:
+            print("LLM response served from cache")
+            return CachedResponse(cached)
+
+        # Native async client: wait_for cancels the request itself on timeout
+        client = client or get_client()
+
+        async def attempt():
+            if llm_streaming:
+                request = stream_decision(
+                    lambda: client.aio.models.generate_content_stream(model=model_name, contents=prompt),
+                    llm_early_stop
+                )
+            else:
+                request = client.aio.models.generate_content(model=model_name, contents=prompt)
+            return await asyncio.wait_for(request, timeout=timeout)
+
+        response = await with_retries(attempt, retries=llm_retries, hedge_after=llm_hedge_after)
+        if getattr(response, "stopped_early", False):
+            print(f"LLM generation completed (stopped early after {response.chunks} chunks)")
+        else:
+            print("LLM generation completed")
+        llm_cache.put(model_name, prompt, response.text)
+        return response
+    except (TimeoutError, asyncio.TimeoutError):
+        print("LLM generation timed out!")
+        raise
+    except Exception as e:
+        print(f"Error in LLM generation: {e}")
+        raise
+
+class AgentState:
+    """Everything one query's agent loop keeps between iterations"""
+
+    def __init__(self, query):
+        self.query = query
+        self.iteration = 0
+        self.last_response = None
+        self.context = ConversationContext(query, max_tokens=context_max_tokens)
+        self.metrics = RunMetrics(query)
+        self.last_tool = None  # the previous call, for speculation
+        self.last_result_str = None
+
+async def call_tool(session, name, arguments):
+    """session.call_tool, with the current trace ids sent along in the request's _meta"""
+    params = types.CallToolRequestParams.model_validate(
+        {"name": name, "arguments": arguments, "_meta": tracing.outgoing_meta()}
+    )
+    request = types.ClientRequest(types.CallToolRequest(method="tools/call", params=params))
+    return await session.send_request(request, types.CallToolResult)
+
+def result_handle(iteration_result):
+    """The {"handle", "summary"} object of a result the server kept as a result:// handle, or None"""
+    text = iteration_result[0] if isinstance(iteration_result, list) and len(iteration_result) == 1 else iteration_result
+    if not isinstance(text, str) or '"result://' not in text[:200]:
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, dict) and str(data.get("handle", "")).startswith("result://"):
+        return data
+    return None
+
+async def execute_tool(session, catalog, func_name, params, metrics=None, speculation=None):
+    """Coerce params to the tool's input schema, call the tool and format its result"""
+    with tracing.span("tool.dispatch", tool=func_name):
+        print(f"\nDEBUG: Tool chosen by agent: {func_name}")
+        print(f"DEBUG: Parameters for execution: {params}")
+        
+        # Look up the tool and convert the parameters with its precompiled coercer
+        with tracing.span("tool.coerce", tool=func_name):
+            tool = catalog.get(func_name)
+            arguments = tool.coerce(params)
+
+        print(f"DEBUG: Final arguments: {arguments}")
+        print(f"DEBUG: Executing tool now: {func_name}")
+
+        call_start = time.perf_counter()
+        with tracing.span("tool.call", tool=func_name) as call_span:
+            # A matching speculative call may already have the result
+            result = await speculation.claim(func_name, arguments) if speculation is not None else None
+            speculated = result is not None
+            call_span.set(speculated=speculated)
+            if not speculated:
+                result = await call_tool(session, func_name, arguments)
+        format_start = time.perf_counter()
+        print(f"DEBUG: Execution completed, processing result...")
+
+        # Get the full result content
+        if hasattr(result, 'content'):
+            print(f"DEBUG: Result has content attribute")
+            # Handle multiple content items
+            if isinstance(result.content, list):
+                iteration_result = [
+                    item.text if hasattr(item, 'text') else str(item)
+                    for item in result.content
+                ]
+            else:
+                iteration_result = str(result.content)
+        else:
+            print(f"DEBUG: Result has no content attribute")
+            iteration_result = str(result)
+
+        print(f"DEBUG: Final iteration result: {iteration_result}")
+
+        # Format the response based on result type; a stored result is
+        # recorded as its handle and summary, never as the full value
+        handle = result_handle(iteration_result)
+        if handle is not None:
+            result_str = f"{handle['handle']} {json.dumps(handle['summary'], separators=(',', ':'))}"
+        elif isinstance(iteration_result, list):
+            result_str = f"[{', '.join(iteration_result)}]"
+        else:
+            result_str = str(iteration_result)
+    
+        if metrics is not None:
+            metrics.record_tool_call(func_name, format_start - call_start, time.perf_counter() - format_start, len(result_str),
+                                     speculated=speculated)
+        tracing.metrics.observe("tool_result_bytes", len(result_str), tool=func_name)
+        tracing.metrics.observe("tool_round_trip_seconds", format_start - call_start, tool=func_name)
+        return arguments, iteration_result, result_str
+
+def describe_turn(step, func_name, arguments, result_str):
+    """Print the outcome of a tool call and return the text recorded in the context"""
+    # Provide more context when visualization functions are called
+    if func_name == "open_keynote":
+        print(f"\n=== In Iteration {step} ===")
+        print(f"Agent selected and executed: {func_name}")
+        print("Result: Presentation application opened")
+
+        return (
+            f"In iteration {step}, I analyzed the available tools and selected '{func_name}' to begin visualization. "
+            f"After executing this tool, the result was: {result_str}. "
+            f"I'll now examine the remaining tools to find one suitable for creating a visual element."
+        )
+    elif func_name == "add_rectangle_to_keynote":
+        # Calculate rectangle size and position
+        x1 = arguments.get('x1', 0)
+        y1 = arguments.get('y1', 0)
+        x2 = arguments.get('x2', 0)
+        y2 = arguments.get('y2', 0)
+        width = x2 - x1
+        height = y2 - y1
+        center_x = x1 + width/2
+        center_y = y1 + height/2
+
+        print(f"\n=== In Iteration {step} ===")
+        print(f"Agent selected and executed: {func_name}")
+        print("Result: Visual container created")
+        print(f"   Size: {width}x{height} pixels")
+        print(f"   Position: centered at ({center_x}, {center_y})")
+
+        return (
+            f"In iteration {step}, after reviewing the available tools, I selected '{func_name}' to create a visual container. "
+            f"I configured a shape with dimensions {width}x{height} at position ({center_x}, {center_y}). "
+            f"After execution, the result was: {result_str}. "
+            f"Next, I'll review the available tools to find one that can add textual content."
+        )
+    elif func_name == "add_text_to_keynote":
+        print(f"\n=== In Iteration {step} ===")
+        print(f"Agent selected and executed: {func_name}")
+        print("Result: Text added to the visual element")
+        print(f"   Text: '{arguments.get('text', '')}'")
+        print("\n=== Visualization Process Complete ===")
+
+        return (
+            f"In iteration {step}, I analyzed the remaining tools and selected '{func_name}' to add content. "
+            f"I applied the text '{arguments.get('text', 'unknown')}' to display the result. "
+            f"After execution, the result was: {result_str}. "
+            f"With this step complete, the visualization now contains all the necessary information."
+        )
+    elif func_name == "send_email_with_result":
+        print(f"\n=== In Iteration {step} ===")
+        print(f"Agent selected and executed: {func_name}")
+        print("Result: Email sent with calculation result")
+        print(f"   Result shared: '{arguments.get('result', '')}'")
+        print(f"   Subject: '{arguments.get('subject', 'Calculation Result')}'")
+        print("\n=== Sharing Process Complete ===")
+
+        return (
+            f"In iteration {step}, I analyzed the available tools and selected '{func_name}' to share the result. "
+            f"I sent an email containing the result '{arguments.get('result', 'unknown')}' with subject '{arguments.get('subject', 'Calculation Result')}'. "
+            f"After execution, the result was: {result_str}. "
+            f"With this step complete, the results have been successfully shared via email."
+        )
+    else:
+        # Default response for other function calls
+        print(f"\n=== In Iteration {step} ===")
+        print(f"Agent selected and executed: {func_name}")
+        print(f"Parameters used: {arguments}")
+        print(f"Result: Operation completed")
+
+        return (
+            f"In iteration {step}, I selected the '{func_name}' tool with parameters {arguments}. "
+            f"After execution, the result was: {result_str}."
+        )
+
+async def prepare_session(session):
+    """List the server's tools and build the catalog and system prompt for them"""
+    # Get available tools
+    print("Requesting tool list...")
+    tools_result = await session.list_tools()
+    tools = tools_result.tools
+    print(f"Successfully retrieved {len(tools)} tools")
+
+    # Compile the tool catalog (reused while the tool schemas are unchanged)
+    catalog = ToolCatalog.from_tools(tools)
+    print(f"Tool catalog ready ({len(catalog)} tools, schema hash {catalog.schema_hash[:12]})")
+
+    system_prompt = catalog.render_system_prompt(SYSTEM_PROMPT_TEMPLATE)
+    print("Created system prompt...")
+    return catalog, system_prompt
+
+async def run_agent(session, catalog, system_prompt, query, generate=None):
+    """Run the agent loop for one query and return its RunMetrics.
+
+    generate(prompt) must return an object with a .text attribute; it defaults
+    to Gemini through generate_with_timeout. All state lives in an AgentState,
+    so several queries can run concurrently.
+    """
+    if generate is None:
+        generate = partial(generate_with_timeout, None)
+    state = AgentState(query)
+    speculator = Speculator.from_env(speculation_table, catalog, partial(call_tool, session)) if speculation_enabled else None
+    print(f"\nProcessing query: {query}")
+    print("Starting the agent's decision-making process...")
+    with tracing.span("agent.run", query=query) as run_span:
+        try:
+            await _agent_loop(state, session, catalog, system_prompt, generate, speculator)
+        finally:
+            if speculator is not None:
+                speculator.finish()
+        run_span.set(iterations=len(state.metrics.iterations), agent_error=state.metrics.error)
+        if speculator is not None:
+            run_span.set(speculation_hits=speculator.hits, speculation_misses=speculator.misses)
+    return state.metrics.finish()
+
+async def _agent_loop(state, session, catalog, system_prompt, generate, speculator=None):
+    metrics = state.metrics
+    context = state.context
+    while state.iteration < max_iterations:
+        print(f"\n--- Iteration {state.iteration + 1} ---")
+        iteration_metrics = metrics.start_iteration(state.iteration + 1)
+        if state.last_response is None:
+            print("Agent is deciding which tool to use for the initial task...")
+        else:
+            print("Agent is deciding which tool to select next based on previous results...")
+
+        # Get model's response with timeout
+        print("Preparing to generate decision...")
+        build_start = time.perf_counter()
+        prompt = context.render(system_prompt)
+        iteration_metrics.prompt_build_s = time.perf_counter() - build_start
+        iteration_metrics.prompt_bytes = len(prompt.encode("utf-8"))
+        print(context.report())
+        prompt_tokens = estimate_tokens(prompt)
+        tracing.metrics.observe("llm_prompt_bytes", iteration_metrics.prompt_bytes)
+        tracing.metrics.observe("llm_prompt_tokens", prompt_tokens)
+        if speculator is not None:
+            speculator.start(state.last_tool, state.last_result_str)
+        try:
+            llm_start = time.perf_counter()
+            with tracing.span("llm.generate", model=model_name, iteration=state.iteration + 1,
+                              prompt_bytes=iteration_metrics.prompt_bytes, prompt_tokens=prompt_tokens):
+                response = await generate(prompt)
+            iteration_metrics.llm_s = time.perf_counter() - llm_start
+            response_text = response.text.strip()
+            print(f"Agent's decision: {response_text}")
+
+            # Collect every FUNCTION_CALL line in the response
+            calls = parse_calls(response_text)
+
+        except Exception as e:
+            print(f"Failed to get agent's decision: {e}")
+            metrics.error = f"LLM error: {e}"
+            break
+
+
+        if calls:
+            print(f"\nDEBUG: Calls chosen by agent: {calls}")
+
+            # Independent calls run concurrently, $N references wait for call N
+            dispatch_start = time.perf_counter()
+            outcomes = await execute_graph(calls, partial(execute_tool, session, catalog, metrics=metrics, speculation=speculator))
+            iteration_metrics.dispatch_s = time.perf_counter() - dispatch_start
+            if speculator is not None:
+                speculator.finish()
+
+            format_start = time.perf_counter()
+            failed = False
+            for outcome in outcomes:
+                step = f"{state.iteration + 1}" if len(calls) == 1 else f"{state.iteration + 1} (call ${outcome.call.index})"
+                if outcome.error is not None:
+                    print(f"DEBUG: Error details: {outcome.error}")
+                    context.add_turn(state.iteration + 1, f"Error in iteration {step}: {outcome.error}")
+                    # A call that was never sent (bad $N reference) is the
+                    # model's to fix on the next iteration; a failed tool ends the run
+                    if outcome.executed:
+                        metrics.error = f"Tool error: {outcome.error}"
+                        failed = True
+                    continue
+
+                context.add_turn(
+                    state.iteration + 1,
+                    describe_turn(step, outcome.call.func_name, outcome.arguments, outcome.result_str),
+                    outcome.call.func_name, outcome.arguments, outcome.result_str
+                )
+                state.last_response = outcome.value
+
+                # Learn which call followed which, for later speculation
+                name = outcome.call.func_name
+                speculation_table.observe(
+                    state.last_tool, name, make_template(catalog.get(name), outcome.arguments, state.last_result_str)
+                )
+                state.last_tool, state.last_result_str = name, outcome.result_str
+            iteration_metrics.turn_format_s = time.perf_counter() - format_start
+
+            if failed:
+                break
+
+        else:
+            # Find the FINAL_ANSWER line in the response
+            response_text = next(
+                (line.strip() for line in response_text.split('\n') if line.strip().startswith("FINAL_ANSWER:")),
+                response_text
+            )
+            if response_text.startswith("FINAL_ANSWER:"):
+                # Extract the final answer
+                _, answer = response_text.split(":", 1)
+                print(f"\n=== In Iteration {state.iteration + 1} ===")
+                print("Agent decided to provide a final answer")
+                print(f"Result: {answer}")
+                metrics.final_answer = answer.strip()
+                break
+
+        state.iteration += 1
+
+@asynccontextmanager
+async def open_session(transport="stdio", command="python3", server_script="example2.py"):
+    """Yield an initialized ClientSession connected to the example2 tools.
+
+    stdio keeps the server isolated in its own process; inprocess skips the
+    subprocess, the pipe and the JSON round trip through another interpreter,
+    which dominates the cost of cheap tools like the math ones.
+    """
+    if transport == "inprocess":
+        from mcp.shared.memory import create_connected_server_and_client_session
+        import example2
+        async with create_connected_server_and_client_session(example2.mcp._mcp_server) as session:
+            yield session
+    elif transport == "stdio":
+        server_params = StdioServerParameters(
+            command=command,
+            args=[server_script]
+        )
+        async with stdio_client(server_params) as (read, write):
+            print("Connection established, creating session...")
+            async with ClientSession(read, write) as session:
+                print("Session created, initializing...")
+                await session.initialize()
+                yield session
+    else:
+        raise ValueError(f"Unknown transport {transport!r}, expected one of {', '.join(TRANSPORTS)}")
+
+def parse_query_line(line, number):
+    """(id, query) for one batch input line: plain text, or JSON with a query and optional id"""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        item = json.loads(line)
+        return item.get("id", number), item["query"]
+    return number, line
+
+async def run_batch(source, output, transport=default_transport, sessions=2, concurrency=8, llm_concurrency=4):
+    """Run the queries read from source concurrently and write one JSON line per finished query.
+
+    Up to `concurrency` queries are in flight, spread over `sessions` warm MCP
+    sessions (server processes for stdio), and at most `llm_concurrency` of
+    them wait on the model at a time. Results are written in completion order.
+    """
+    llm_slots = asyncio.Semaphore(llm_concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    totals = {"queries": 0, "errors": 0}
+
+    async def generate(prompt):
+        async with llm_slots:
+            return await generate_with_timeout(None, prompt)
+
+    async def produce():
+        number = 0
+        while line := await asyncio.to_thread(source.readline):
+            item = parse_query_line(line, number + 1)
+            if item is not None:
+                number += 1
+                await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work(session, catalog, system_prompt):
+        while (item := await queue.get()) is not None:
+            query_id, query = item
+            try:
+                metrics = await run_agent(session, catalog, system_prompt, query, generate)
+                record = {
+                    "id": query_id,
+                    "query": query,
+                    "final_answer": metrics.final_answer,
+                    "error": metrics.error,
+                    "iterations": len(metrics.iterations),
+                    "total_s": round(metrics.total_s, 3),
+                }
+            except Exception as e:
+                record = {"id": query_id, "query": query, "final_answer": None, "error": f"{type(e).__name__}: {e}"}
+            totals["queries"] += 1
+            totals["errors"] += record["error"] is not None
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+    start = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        pool = []
+        for _ in range(sessions):
+            session = await stack.enter_async_context(open_session(transport))
+            pool.append((session, *await prepare_session(session)))
+        await asyncio.gather(produce(), *(work(*pool[i % len(pool)]) for i in range(concurrency)))
+    totals["elapsed_s"] = time.perf_counter() - start
+    return totals
+
+async def batch_main(args):
+    """--batch: results go to --output or stdout, everything else is printed to stderr"""
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        with redirect_stdout(sys.stderr):
+            totals = await run_batch(source, output, args.transport, args.sessions, args.concurrency, args.llm_concurrency)
+        print(f"Batch finished: {totals['queries']} queries, {totals['errors']} with errors, "
+              f"{totals['elapsed_s']:.1f}s", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+async def main(transport=default_transport):
+    print("Starting AI Agent...")
+    print("This agent can solve mathematical problems, create visual presentations, and share results via email.")
+    print("It analyzes and selects from available tools to accomplish each task.")
+    print("For visualization, it will identify appropriate tools for each step of the process.")
+    print("For sharing results, it can send emails with calculation outcomes when requested.")
+    
+    print("\nExample queries you can try:")
+    for i, example in enumerate(EXAMPLE_QUERIES, 1):
+        print(f"{i}. {example}")
+    print("\nHow the agent works:")
+    print("1. It analyzes your query to understand what you're asking")
+    print("2. It examines all available tools to identify the most appropriate ones")
+    print("3. For each step, it selects and executes a specific tool")
+    print("4. For visualization tasks, it will:")
+    print("   - Select tools for mathematical calculations first")
+    print("   - Identify and select a tool to open a presentation application")
+    print("   - Find appropriate tools to create visual elements")
+    print("   - Select tools to add content to the visualization")
+    print("5. For email tasks, it will:")
+    print("   - Complete all calculations and/or visualizations first")
+    print("   - Format the results in a clear, readable manner")
+    print("   - Send an email containing the results to the configured recipient")
+    print(f"The agent will perform up to {max_iterations} iterations to complete the task.")
+    print("You can include preferences in your query (e.g., 'small', 'centered', 'detailed').")
+    print("\nNote: To use email functionality, make sure to configure GMAIL_EMAIL, GMAIL_APP_PASSWORD,")
+    print("and RECIPIENT_EMAIL in your .env file with valid credentials.")
+    
+    try:
+        # Create a single MCP server connection
+        print(f"\nConnecting to MCP server ({transport})...")
+        async with open_session(transport) as session:
+            catalog, system_prompt = await prepare_session(session)
+
+            # Get user query
+            print("\nEnter your query (or use default if empty):")
+            user_query = input().strip()
+            query = user_query if user_query else DEFAULT_QUERY
+            await run_agent(session, catalog, system_prompt, query)
 
     except Exception as e:
         print(f"Error in main execution: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        reset_state()  # Reset at the end of main
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="MCP agent")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=default_transport,
+                        help="stdio runs example2.py as a subprocess, inprocess imports it (default: $MCP_TRANSPORT or stdio)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run the queries in FILE (one per line, or JSON lines with a \"query\" key; - for stdin) and write JSONL results")
+    parser.add_argument("--output", help="batch mode: write results here instead of stdout")
+    parser.add_argument("--sessions", type=int, default=2, help="batch mode: warm MCP sessions to share")
+    parser.add_argument("--concurrency", type=int, default=8, help="batch mode: queries in flight")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="batch mode: concurrent LLM requests")
+    args = parser.parse_args()
+    if args.batch:
+        asyncio.run(batch_main(args))
+    else:
+        asyncio.run(main(args.transport))
     
     
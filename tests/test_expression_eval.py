@@ -0,0 +1,13 @@
+# Query notation accepted by expression_eval.preprocess
+from expression_eval import evaluate, preprocess
+
+
+def test_factorial_of_number_and_group():
+    assert evaluate("5!") == 120
+    assert evaluate("(2+1)!") == 6
+
+
+def test_factorial_of_call():
+    assert preprocess("factorial(3)!") == "factorial(factorial(3))"
+    assert evaluate("factorial(3)!") == 720
+    assert evaluate("abs(-3)!") == 6
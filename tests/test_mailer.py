@@ -0,0 +1,29 @@
+# Delivery worker behaviour of mailer.Mailer, with the SMTP pool stubbed out
+import asyncio
+
+from mailer import Mailer, SMTPSettings
+
+
+class Unprintable:
+    def __format__(self, spec):
+        raise ValueError("cannot format")
+
+
+def test_unbuildable_message_fails_only_its_delivery(monkeypatch):
+    settings = SMTPSettings("localhost", 25, "none", None, None, "a@example.com", "b@example.com")
+    mailer = Mailer(settings)
+    sent = []
+    monkeypatch.setattr(mailer.pool, "send", sent.append)
+
+    async def run():
+        bad = await mailer.submit(Unprintable())
+        good = await mailer.submit("42")
+        await asyncio.wait_for(mailer._queue.join(), 5)
+        await mailer.close()
+        return bad, good
+
+    bad, good = asyncio.run(run())
+    assert mailer.status(bad)["status"] == "failed"
+    assert "cannot format" in mailer.status(bad)["error"]
+    assert mailer.status(good)["status"] == "sent"
+    assert len(sent) == 1
@@ -0,0 +1,75 @@
+# Argument coercion in tool_catalog.py, checked against real FastMCP schemas
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("mcp")
+from mcp.server.fastmcp import FastMCP  # noqa: E402
+from mcp.shared.memory import create_connected_server_and_client_session  # noqa: E402
+
+import drawing_backends  # noqa: E402
+import drawing_tools  # noqa: E402
+from result_store import handled  # noqa: E402
+from tool_catalog import ToolCatalog  # noqa: E402
+
+
+def scale(values: list[float], factor: float = 2.0) -> list[float]:
+    """Multiplies every value by factor"""
+    return [value * factor for value in values]
+
+
+def greet(name: str = "world") -> str:
+    """Greets name"""
+    return f"hello {name}"
+
+
+def call_through_catalog(mcp, name, values):
+    """Coerce string parameters with the catalog built from list_tools, then call the tool"""
+    async def run():
+        async with create_connected_server_and_client_session(mcp._mcp_server) as session:
+            catalog = ToolCatalog.from_tools((await session.list_tools()).tools)
+            arguments = catalog.get(name).coerce(values)
+            result = await session.call_tool(name, arguments)
+            assert not result.isError, result.content
+            return result
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def canvas_backend(monkeypatch):
+    monkeypatch.setenv("DRAWING_BACKEND", "canvas")
+    monkeypatch.setattr(drawing_backends, "_backend", None)
+    yield
+    asyncio.run(drawing_backends.shutdown())
+
+
+def test_draw_batch_ops_are_decoded_as_objects(canvas_backend):
+    mcp = FastMCP("test")
+    drawing_tools.register(mcp)
+    ops = [
+        {"op": "open"},
+        {"op": "rectangle", "id": "box", "x1": 100, "y1": 100, "x2": 500, "y2": 300},
+        {"op": "text", "target": "box", "text": "42"},
+        {"op": "style", "target": "box", "font_size": 36},
+    ]
+    result = json.loads(call_through_catalog(mcp, "draw_batch", [json.dumps(ops)]).content[0].text)
+    assert result["ok"], result
+    assert [r["status"] for r in result["results"]] == ["ok"] * 4
+    assert result["results"][1]["bounds"] == [100, 100, 500, 300]
+
+
+def test_float_list_on_handled_tool():
+    # handled() turns the schema into anyOf [array of numbers, handle string]
+    mcp = FastMCP("test")
+    mcp.tool()(handled(scale))
+    result = call_through_catalog(mcp, "scale", ["[0.5, 1.5]"])
+    assert result.structuredContent["result"] == [1.0, 3.0]
+
+
+def test_all_optional_parameters_can_be_left_out():
+    # A schema whose parameters all have defaults has no "required" key
+    mcp = FastMCP("test")
+    mcp.tool()(greet)
+    result = call_through_catalog(mcp, "greet", [])
+    assert result.content[0].text == "hello world"
@@ -0,0 +1,192 @@
+# Thumbnail pipeline
+#
+# Thumbnails are encoded as real PNG/JPEG/WebP files, JPEGs are decoded in
+# draft mode at a reduced scale, and results are cached in memory and on disk
+# keyed by path + mtime + file size + target size + format, so unchanged
+# images are never decoded twice. iter_thumbnails fans a batch out over a
+# process pool and yields each thumbnail as soon as it is ready.
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image as PILImage
+
+FORMATS = {"png": "PNG", "jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP"}
+
+
+def normalize_format(fmt):
+    fmt = fmt.lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported thumbnail format {fmt!r}, expected png, jpeg or webp")
+    return "jpeg" if fmt == "jpg" else fmt
+
+
+def make_thumbnail(path, size=(100, 100), fmt="png", quality=85):
+    """Decode an image (at reduced scale when possible) and encode its thumbnail"""
+    fmt = normalize_format(fmt)
+    with PILImage.open(path) as img:
+        # JPEG can decode directly at 1/2, 1/4 or 1/8 scale
+        if img.format == "JPEG":
+            img.draft("RGB", size)
+        img.thumbnail(size)
+        if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        buf = io.BytesIO()
+        if fmt == "png":
+            img.save(buf, format="PNG", optimize=True)
+        else:
+            img.save(buf, format=FORMATS[fmt], quality=quality)
+        return buf.getvalue()
+
+
+def cache_key(path, size, fmt):
+    """Key that changes whenever the file or the requested thumbnail changes"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    raw = f"{path}|{st.st_mtime_ns}|{st.st_size}|{size[0]}x{size[1]}|{fmt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ThumbnailCache:
+    """Two-level cache: a byte-bounded in-memory LRU in front of a disk directory"""
+
+    def __init__(self, directory=None, max_memory_bytes=32 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.directory:
+            try:
+                with open(os.path.join(self.directory, key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                self.hits += 1
+                return data
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        self._remember(key, data)
+        if self.directory:
+            tmp = os.path.join(self.directory, f".{key}.{os.getpid()}.tmp")
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, os.path.join(self.directory, key))
+            except OSError:
+                # The disk cache is best-effort; the thumbnail is still in memory
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._memory:
+                self._bytes -= len(self._memory.pop(key))
+            self._memory[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+cache = ThumbnailCache(
+    directory=os.getenv("THUMBNAIL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "paint-mcp", "thumbnails")),
+    max_memory_bytes=int(os.getenv("THUMBNAIL_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024))),
+)
+
+
+def get_thumbnail(path, size=(100, 100), fmt="png"):
+    """Return encoded thumbnail bytes, from the cache when the file is unchanged"""
+    fmt = normalize_format(fmt)
+    key = cache_key(path, size, fmt)
+    data = cache.get(key)
+    if data is None:
+        data = make_thumbnail(path, size, fmt)
+        cache.put(key, data)
+    return data
+
+
+def _render(path, size, fmt):
+    """Process pool entry point: returns (data, error) instead of raising"""
+    try:
+        return make_thumbnail(path, size, fmt), None
+    except Exception as e:
+        return None, str(e)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.getenv("THUMBNAIL_WORKERS", "0")) or None
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def shutdown():
+    """Stop the worker processes; the next batch starts new ones"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+async def iter_thumbnails(paths, size=(100, 100), fmt="png"):
+    """Yield (path, data, error) for every path, in completion order.
+
+    Cached thumbnails are yielded immediately; the rest are rendered in a
+    process pool and cached as they come back.
+    """
+    fmt = normalize_format(fmt)
+    loop = asyncio.get_running_loop()
+    pending = {}
+    for path in paths:
+        try:
+            key = cache_key(path, size, fmt)
+        except OSError as e:
+            yield path, None, str(e)
+            continue
+        data = cache.get(key)
+        if data is not None:
+            yield path, data, None
+            continue
+        future = loop.run_in_executor(get_pool(), _render, path, size, fmt)
+        pending[future] = (path, key)
+
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            path, key = pending.pop(future)
+            try:
+                data, error = future.result()
+            except Exception as e:  # e.g. a worker process died
+                data, error = None, str(e)
+            if data is not None:
+                cache.put(key, data)
+            yield path, data, error
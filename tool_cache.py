@@ -0,0 +1,144 @@
+# Memoization for pure tools
+#
+# Math tools like add, factorial or fibonacci_numbers always return the same
+# result for the same arguments, and the agent often calls them again with
+# identical parameters. Marking a tool with @pure caches its results in a
+# size-bounded LRU shared by all pure tools of the server.
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from tracing import metrics
+
+
+def normalize(value):
+    """Turn an argument into a hashable, canonical cache key component"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    return value
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a cached result in bytes"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return 28 + (value.bit_length() + 7) // 8
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """LRU cache bounded by the total estimated size of its entries"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=100_000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (True, value) on a hit and (False, None) on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        # A single result larger than a quarter of the cache would flush everything else
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self._entries and (self.bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        per_tool = {}
+        for key in list(self._entries):
+            per_tool[key[0]] = per_tool.get(key[0], 0) + 1
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries_per_tool": per_tool,
+        }
+
+
+# Shared by every tool decorated with @pure
+cache = ResultCache(max_bytes=int(os.getenv("TOOL_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+
+
+def lookup(name, args, kwargs):
+    """(True, value) if a pure tool's result for these arguments is cached, else (False, None)"""
+    try:
+        hit, value = cache.get((name, normalize(args), normalize(kwargs)))
+    except TypeError:  # unhashable argument, skip the cache
+        return False, None
+    metrics.inc("tool_cache_lookups_total", tool=name, result="hit" if hit else "miss")
+    if hit:
+        return True, list(value) if isinstance(value, list) else value
+    return False, None
+
+
+def store(name, args, kwargs, value):
+    try:
+        cache.put((name, normalize(args), normalize(kwargs)), list(value) if isinstance(value, list) else value)
+    except TypeError:
+        pass
+
+
+def pure(fn):
+    """Mark a tool as a pure function and memoize its results.
+
+    Use below @mcp.tool() so the cached wrapper is what gets registered.
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        hit, value = lookup(name, args, kwargs)
+        if hit:
+            return value
+        value = fn(*args, **kwargs)
+        store(name, args, kwargs, value)
+        return value
+
+    wrapper.is_pure = True
+    return wrapper
@@ -0,0 +1,253 @@
+# Compiled tool catalog for the agent client
+#
+# Built once from session.list_tools(): tools are indexed by name, every tool
+# gets an argument coercer compiled from its JSON schema, and the rendered
+# system prompt is cached on disk keyed by a hash of the tool schemas and the
+# prompt template. As long as the server's tools don't change, dispatch is a
+# dict lookup plus a list of precompiled converters, and the prompt is read
+# back instead of being rebuilt.
+import hashlib
+import json
+import os
+
+# Large results come back as a handle like result://3f2a..., which any
+# parameter accepts in place of a value
+HANDLE_PREFIX = "result://"
+
+# Extra hints shown to the model next to specific parameters
+PARAM_HINTS = {
+    ("add_rectangle_to_keynote", "x1"): " (top-left corner)",
+    ("add_rectangle_to_keynote", "y1"): " (top-left corner)",
+    ("add_rectangle_to_keynote", "x2"): " (bottom-right corner)",
+    ("add_rectangle_to_keynote", "y2"): " (bottom-right corner)",
+    ("add_text_to_keynote", "text"): " (content to display)",
+    ("add_text_to_keynote", "shape_id"): " (id returned by add_rectangle_to_keynote; empty for the most recent shape)",
+    ("send_email_with_result", "result"): " (the final answer or calculation result to share)",
+    ("send_email_with_result", "subject"): " (optional email subject line)",
+    ("pow_mod", "m"): " (modulus)",
+    ("factorial_mod", "m"): " (modulus)",
+    ("binomial_mod", "m"): " (modulus)",
+    ("mod_inverse", "m"): " (modulus)",
+}
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "1", "yes", "y"):
+        return True
+    if text in ("false", "0", "no", "n", ""):
+        return False
+    raise ValueError(f"Not a boolean: {value!r}")
+
+
+def _is_handle(option):
+    return option.get("pattern", "").startswith("^" + HANDLE_PREFIX)
+
+
+def _options(info):
+    return info.get("anyOf") or info.get("oneOf") or []
+
+
+def _value_schema(info):
+    """The schema of a parameter's value, looking through anyOf/oneOf, Optional and result-handle wrappers"""
+    if "type" in info:
+        return info
+    for option in _options(info):
+        if option.get("type") != "null" and not _is_handle(option):
+            return _value_schema(option)
+    return {}
+
+
+def _schema_type(info):
+    """JSON schema type of a parameter"""
+    return _value_schema(info).get("type", "string")
+
+
+def _to_json(value, expected):
+    """Decode a JSON array or object given as text; anything else is returned unchanged"""
+    if isinstance(value, str) and value.strip()[:1] in ("[", "{"):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(decoded, expected):
+            return decoded
+    return value
+
+
+def _to_object(value):
+    value = _to_json(value, dict)
+    if not isinstance(value, dict):
+        raise ValueError(f"Not a JSON object: {value!r}")
+    return value
+
+
+def _scalar_converter(schema_type):
+    if schema_type == "integer":
+        return int
+    if schema_type == "number":
+        return float
+    if schema_type == "boolean":
+        return _to_bool
+    if schema_type == "object":
+        return _to_object
+    return str
+
+
+def _accepts_handle(info):
+    return any(_is_handle(option) for option in _options(info))
+
+
+def _passing_handles(convert):
+    """Wrap a converter so result handles are sent on unchanged"""
+    def convert_or_handle(value):
+        if isinstance(value, str) and value.strip().startswith(HANDLE_PREFIX):
+            return value.strip()
+        return convert(value)
+    return convert_or_handle
+
+
+def compile_converter(info):
+    """Build the converter for one parameter from its JSON schema"""
+    schema_type = _schema_type(info)
+    if schema_type != "array":
+        convert = _scalar_converter(schema_type)
+        return _passing_handles(convert) if _accepts_handle(info) else convert
+
+    # Items default to integers, like the original int-list tools expect
+    items = _value_schema(info).get("items")
+    item_type = _schema_type(items) if items else "integer"
+    convert_item = _scalar_converter(item_type)
+
+    def convert_array(value):
+        # JSON first, so lists of objects or quoted strings survive; "1, 2, 3" still works
+        value = _to_json(value, list)
+        if isinstance(value, str):
+            value = value.strip("[]").split(",")
+        return [convert_item(x.strip()) if isinstance(x, str) else convert_item(x) for x in value if str(x).strip()]
+    return _passing_handles(convert_array) if _accepts_handle(info) else convert_array
+
+
+class CompiledTool:
+    """A tool with its argument coercer compiled once from the input schema"""
+
+    __slots__ = ("name", "description", "input_schema", "params", "converters", "required", "read_only")
+
+    def __init__(self, tool):
+        self.name = tool.name
+        self.description = getattr(tool, "description", None) or "No description available"
+        self.input_schema = tool.inputSchema
+        properties = self.input_schema.get("properties", {})
+        self.required = set(self.input_schema.get("required", ()))
+        self.params = [(name, compile_converter(info)) for name, info in properties.items()]
+        self.converters = dict(self.params)
+        # Only tools the server declares free of side effects may be run speculatively
+        annotations = getattr(tool, "annotations", None)
+        self.read_only = bool(annotations and getattr(annotations, "readOnlyHint", False))
+
+    def convert(self, name, value):
+        """Convert one parameter given as text"""
+        try:
+            return self.converters[name](value)
+        except KeyError:
+            raise ValueError(f"{self.name} has no parameter {name!r}") from None
+
+    def coerce(self, values):
+        """Convert positional string parameters into the tool's arguments dict"""
+        arguments = {}
+        for i, (name, convert) in enumerate(self.params):
+            if i >= len(values):
+                if name in self.required:
+                    raise ValueError(f"Not enough parameters provided for {self.name}")
+                break
+            arguments[name] = convert(values[i])
+        return arguments
+
+    def describe(self, number):
+        properties = self.input_schema.get("properties", {})
+        if properties:
+            params_str = ", ".join(
+                f"{name}: {_schema_type(info)}{' or result handle' if _accepts_handle(info) else ''}"
+                f"{PARAM_HINTS.get((self.name, name), '')}"
+                for name, info in properties.items()
+            )
+        else:
+            params_str = "no parameters"
+        return f"{number}. {self.name}({params_str}) - {self.description}"
+
+
+class ToolCatalog:
+    """Tools indexed by name, plus the system prompt rendered from them"""
+
+    # Catalogs already built in this process, by schema hash
+    _compiled = {}
+
+    def __init__(self, tools, schema_hash):
+        self.tools = {tool.name: CompiledTool(tool) for tool in tools}
+        self.schema_hash = schema_hash
+        self._prompts = {}
+
+    @classmethod
+    def from_tools(cls, tools):
+        """Return the catalog for these tools, reusing one compiled earlier if unchanged"""
+        schema_hash = hash_tools(tools)
+        catalog = cls._compiled.get(schema_hash)
+        if catalog is None:
+            catalog = cls._compiled[schema_hash] = cls(tools, schema_hash)
+        return catalog
+
+    def __len__(self):
+        return len(self.tools)
+
+    def names(self):
+        return list(self.tools)
+
+    def get(self, name):
+        try:
+            return self.tools[name]
+        except KeyError:
+            raise ValueError(f"Unknown tool: {name}") from None
+
+    def describe(self):
+        return "\n".join(tool.describe(i + 1) for i, tool in enumerate(self.tools.values()))
+
+    def render_system_prompt(self, template, cache_dir=None):
+        """Fill the template's {tools_description}, cached on disk by schema + template hash"""
+        key = hashlib.sha256(f"{self.schema_hash}\0{template}".encode("utf-8")).hexdigest()
+        prompt = self._prompts.get(key)
+        if prompt is not None:
+            return prompt
+
+        cache_dir = cache_dir or os.getenv("TOOL_CATALOG_CACHE_DIR", ".tool_catalog_cache")
+        path = os.path.join(cache_dir, f"system_prompt_{key[:32]}.txt")
+        try:
+            with open(path, encoding="utf-8") as f:
+                prompt = f.read()
+        except OSError:
+            prompt = template.replace("{tools_description}", self.describe())
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(prompt)
+                os.replace(tmp, path)
+            except OSError:
+                pass  # the cache is only an optimization
+        self._prompts[key] = prompt
+        return prompt
+
+
+def hash_tools(tools):
+    """Hash of everything about the tools that ends up in the prompt or the coercers"""
+    payload = [
+        {
+            "name": tool.name,
+            "description": getattr(tool, "description", None),
+            "schema": tool.inputSchema,
+            "read_only": bool(getattr(getattr(tool, "annotations", None), "readOnlyHint", False)),
+        }
+        for tool in tools
+    ]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
@@ -0,0 +1,284 @@
+# Budgeted process pool for CPU-heavy tools
+#
+# Tools are cheap unless marked @heavy. Cheap tools run on the event loop as
+# before; a heavy tool (factorial(200000), power(7, 10**7), ...) would block
+# every session on the server for as long as it runs, so its calls go to a
+# small pool of worker processes (tool_worker.py) instead. Each call gets
+# budgets for CPU time and memory, enforced by the worker with setrlimit,
+# plus a wall-clock limit enforced here. A call over budget, or one the
+# client cancels, costs only its worker: the worker is killed and replaced,
+# and the caller gets a BudgetExceeded error describing what ran out.
+#
+# Configuration:
+#   TOOL_WORKERS        worker processes (min(4, CPUs)); 0 runs heavy tools
+#                       inline on the event loop, as before
+#   TOOL_CPU_SECONDS    default CPU budget per call (10)
+#   TOOL_MEMORY_MB      default memory budget per call (512)
+#   TOOL_WALL_FACTOR    wall-clock limit as a multiple of the CPU budget (3)
+import asyncio
+import builtins
+import functools
+import inspect
+import json
+import logging
+import os
+import pickle
+import signal
+import sys
+import time
+
+import tool_cache
+from tracing import metrics
+from tool_worker import HEADER
+
+logger = logging.getLogger("paint_mcp.tool_pool")
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_worker.py")
+START_TIMEOUT = 10
+
+# Return code of a worker the kernel stopped at its CPU limit
+_CPU_LIMIT_CODE = -signal.SIGXCPU if hasattr(signal, "SIGXCPU") else None
+
+
+class BudgetExceeded(RuntimeError):
+    """A heavy tool call ran out of CPU time, memory or wall-clock time"""
+
+    def __init__(self, tool, resource, limit, used=None):
+        self.tool = tool
+        self.resource = resource
+        self.limit = limit
+        self.used = used
+        super().__init__(json.dumps(self.to_dict()))
+
+    def to_dict(self):
+        units = {"cpu": "seconds", "wall": "seconds", "memory": "MB"}
+        data = {
+            "error": "budget_exceeded",
+            "tool": self.tool,
+            "resource": self.resource,
+            "limit": self.limit,
+            "unit": units[self.resource],
+        }
+        if self.used is not None:
+            data["used"] = round(self.used, 3)
+        return data
+
+
+class WorkerError(RuntimeError):
+    """A worker process failed outside of any budget"""
+
+
+def _exception(type_name, message):
+    """Rebuild a tool's exception from the worker's reply, keeping builtin types like ValueError"""
+    cls = getattr(builtins, type_name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        try:
+            return cls(message)
+        except TypeError:
+            pass
+    return RuntimeError(f"{type_name}: {message}")
+
+
+async def _read_frame(stream):
+    (size,) = HEADER.unpack(await stream.readexactly(HEADER.size))
+    return pickle.loads(await stream.readexactly(size))
+
+
+def _frame(message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    return HEADER.pack(len(data)) + data
+
+
+class Worker:
+    """One tool_worker.py process"""
+
+    def __init__(self, process):
+        self.process = process
+
+    @classmethod
+    async def start(cls):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        worker = cls(process)
+        try:
+            ready = await asyncio.wait_for(_read_frame(process.stdout), START_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            await worker.kill()
+            raise WorkerError("Tool worker failed to start") from None
+        logger.info("tool worker started", extra={"pid": ready[1]})
+        return worker
+
+    @property
+    def alive(self):
+        return self.process.returncode is None
+
+    async def call(self, request, timeout):
+        """Send one request and return the worker's reply frame"""
+        self.process.stdin.write(_frame(request))
+        await self.process.stdin.drain()
+        return await asyncio.wait_for(_read_frame(self.process.stdout), timeout)
+
+    async def kill(self):
+        if self.alive:
+            self.process.kill()
+        await self.process.wait()
+
+    async def close(self, timeout=2):
+        if self.alive:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        await self.kill()
+
+
+class ToolPool:
+    """Up to `size` workers, started on demand; callers queue for an idle one"""
+
+    def __init__(self, size, cpu_seconds=10.0, memory_mb=512, wall_factor=3.0):
+        self.size = size
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_factor = wall_factor
+        self._idle = []
+        self._workers = set()
+        self._available = asyncio.Condition()
+        self.calls = 0
+        self.restarts = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            int(os.getenv("TOOL_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            cpu_seconds=float(os.getenv("TOOL_CPU_SECONDS", "10")),
+            memory_mb=float(os.getenv("TOOL_MEMORY_MB", "512")),
+            wall_factor=float(os.getenv("TOOL_WALL_FACTOR", "3")),
+        )
+
+    async def _acquire(self):
+        async with self._available:
+            while not self._idle and len(self._workers) >= self.size:
+                await self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            placeholder = object()  # hold the slot while the worker starts
+            self._workers.add(placeholder)
+        try:
+            worker = await Worker.start()
+        except BaseException:
+            async with self._available:
+                self._workers.discard(placeholder)
+                self._available.notify()
+            raise
+        self._workers.discard(placeholder)
+        self._workers.add(worker)
+        return worker
+
+    async def _release(self, worker):
+        async with self._available:
+            if worker.alive:
+                self._idle.append(worker)
+            else:
+                self._workers.discard(worker)
+                self.restarts += 1
+            self._available.notify()
+
+    async def run(self, module, name, args, kwargs, cpu_seconds=None, memory_mb=None):
+        """Run module.name(*args, **kwargs) in a worker within its budgets"""
+        cpu_seconds = cpu_seconds or self.cpu_seconds
+        memory_mb = memory_mb or self.memory_mb
+        wall_seconds = cpu_seconds * self.wall_factor + 1
+
+        queued = time.perf_counter()
+        worker = await self._acquire()
+        metrics.observe("tool_pool_wait_seconds", time.perf_counter() - queued, tool=name)
+        self.calls += 1
+        outcome = "error"
+        try:
+            request = (module, name, args, kwargs, cpu_seconds, int(memory_mb * 1024 * 1024))
+            started = time.perf_counter()
+            try:
+                reply = await worker.call(request, wall_seconds)
+            except asyncio.TimeoutError:
+                await worker.kill()
+                outcome = "wall"
+                raise BudgetExceeded(name, "wall", wall_seconds, time.perf_counter() - started) from None
+            except (asyncio.IncompleteReadError, BrokenPipeError, ConnectionResetError):
+                await worker.kill()
+                if worker.process.returncode == _CPU_LIMIT_CODE:
+                    outcome = "cpu"
+                    raise BudgetExceeded(name, "cpu", cpu_seconds) from None
+                raise WorkerError(f"Tool worker exited with code {worker.process.returncode}") from None
+            except asyncio.CancelledError:
+                # The client gave up: stop the computation instead of letting it finish
+                await asyncio.shield(worker.kill())
+                outcome = "cancelled"
+                raise
+
+            if reply[0] == "ok":
+                outcome = "ok"
+                return reply[1]
+            if reply[0] == "budget":
+                outcome = reply[1]
+                raise BudgetExceeded(name, "memory", memory_mb)
+            raise _exception(reply[1], reply[2])
+        finally:
+            metrics.inc("tool_pool_calls_total", tool=name, outcome=outcome)
+            if outcome in ("cpu", "memory", "wall"):
+                metrics.inc("tool_budget_exceeded_total", tool=name, resource=outcome)
+            await asyncio.shield(self._release(worker))
+
+    async def close(self):
+        workers, self._workers, self._idle = self._workers, set(), []
+        await asyncio.gather(*(worker.close() for worker in workers if isinstance(worker, Worker)))
+
+
+_pool = None
+
+
+def get_pool():
+    """The process-wide pool, or None when TOOL_WORKERS is 0"""
+    global _pool
+    if _pool is None:
+        _pool = ToolPool.from_env()
+    return _pool if _pool.size > 0 else None
+
+
+async def shutdown():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def heavy(fn=None, *, cpu_seconds=None, memory_mb=None):
+    """Mark a tool as CPU-heavy: its calls run in the worker pool within budgets.
+
+    Use above @pure, so cached results are still served without a worker.
+    """
+    if fn is None:
+        return functools.partial(heavy, cpu_seconds=cpu_seconds, memory_mb=memory_mb)
+    raw = inspect.unwrap(fn)
+    module, name = raw.__module__, raw.__name__
+    cached = getattr(fn, "is_pure", False)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        pool = get_pool()
+        if pool is None:
+            return fn(*args, **kwargs)
+        if cached:
+            hit, value = tool_cache.lookup(name, args, kwargs)
+            if hit:
+                return value
+        value = await pool.run(module, name, args, kwargs, cpu_seconds, memory_mb)
+        if cached:
+            tool_cache.store(name, args, kwargs, value)
+        return value
+
+    wrapper.is_heavy = True
+    return wrapper
@@ -0,0 +1,141 @@
+# Worker process for tool_pool
+#
+# Started by tool_pool.Worker with a pipe on stdin/stdout. It answers with a
+# ready frame, then runs one call per request frame and answers with its
+# result. Frames are a 4-byte big-endian length followed by a pickle; only
+# the server talks to this process, so pickle is safe here.
+#
+# Before each call the worker sets its own limits with setrlimit:
+#   RLIMIT_CPU  soft limit at the CPU time used so far plus the budget. The
+#               kernel then sends SIGXCPU, whose default action kills the
+#               worker even inside a long C call like math.factorial; the
+#               pool sees the signal and reports the CPU budget as exceeded.
+#   RLIMIT_AS   address space at the current size plus the budget, so big
+#               allocations fail with MemoryError (Linux only; macOS doesn't
+#               enforce it).
+# A budget never loosens a lower soft limit the worker started with, and the
+# soft limits are put back after the call, so one worker serves many calls.
+import importlib
+import inspect
+import os
+import pickle
+import struct
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows: no limits, the pool's wall-clock timeout still applies
+    resource = None
+
+HEADER = struct.Struct(">I")
+
+
+def read_frame(stream):
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    (size,) = HEADER.unpack(header)
+    return pickle.loads(stream.read(size))
+
+
+def write_frame(stream, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def cpu_used():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def address_space():
+    """Current virtual memory size in bytes, or None where /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+# Soft limits in force before set_limits changed them, by limit
+_saved_soft = {}
+
+
+def _lower_soft_limit(limit, soft):
+    original, hard = resource.getrlimit(limit)
+    if original != resource.RLIM_INFINITY and original <= soft:
+        return
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        _saved_soft[limit] = original
+        resource.setrlimit(limit, (soft, hard))
+
+
+def set_limits(cpu_seconds, memory_bytes):
+    if resource is None:
+        return
+    if cpu_seconds:
+        # whole seconds, rounded up
+        _lower_soft_limit(resource.RLIMIT_CPU, int(cpu_used() + cpu_seconds) + 1)
+    current = address_space()
+    if memory_bytes and current is not None:
+        _lower_soft_limit(resource.RLIMIT_AS, current + memory_bytes)
+
+
+def clear_limits():
+    """Put back the soft limits set_limits replaced"""
+    if resource is None:
+        return
+    while _saved_soft:
+        limit, soft = _saved_soft.popitem()
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (soft, hard))
+
+
+_functions = {}
+
+
+def resolve(module, name):
+    """The undecorated tool function, so no cache or pool wrapper runs in here"""
+    key = (module, name)
+    if key not in _functions:
+        _functions[key] = inspect.unwrap(getattr(importlib.import_module(module), name))
+    return _functions[key]
+
+
+def run(request):
+    """Run one call; returns the reply frame"""
+    module, name, args, kwargs, cpu_seconds, memory_bytes = request
+    try:
+        fn = resolve(module, name)
+        set_limits(cpu_seconds, memory_bytes)
+        try:
+            value = fn(*args, **kwargs)
+        finally:
+            clear_limits()
+        return ("ok", value)
+    except MemoryError:
+        return ("budget", "memory")
+    except Exception as e:
+        return ("error", type(e).__name__, str(e))
+
+
+def main():
+    channel_in = sys.stdin.buffer
+    channel_out = sys.stdout.buffer
+    # Anything a tool prints must not corrupt the frame stream
+    sys.stdout = sys.stderr
+    if hasattr(sys, "set_int_max_str_digits"):
+        sys.set_int_max_str_digits(0)
+
+    write_frame(channel_out, ("ready", os.getpid()))
+    while (request := read_frame(channel_in)) is not None:
+        reply = run(request)
+        try:
+            write_frame(channel_out, reply)
+        except (MemoryError, pickle.PicklingError, TypeError) as e:
+            write_frame(channel_out, ("error", type(e).__name__, f"Result could not be returned: {e}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# Spans and metrics for the agent client and the MCP server
+#
+# A span times one operation (an LLM generation, a tool dispatch, argument
+# coercion, a session.call_tool round trip, a tool body on the server) and
+# remembers its trace id and parent span through a context variable, so
+# spans opened inside asyncio.gather'ed calls nest correctly. The client
+# sends its trace id and the id of the call_tool span in the request's
+# _meta, and the server's tool spans pick them up, so one JSONL file (or
+# two, one per process) can be joined into a single trace per query.
+#
+# Every finished span also feeds a latency histogram; counters and other
+# histograms (prompt size, result bytes, cache hits) are recorded directly.
+#
+# Configuration (all optional, nothing is written or served by default):
+#   TRACE_FILE                 append finished spans as JSON lines
+#   AGENT_METRICS_PORT         serve the client's metrics on 127.0.0.1:<port>/metrics
+#   SERVER_METRICS_PORT        same for the server
+#
+# Summarize a trace file with: python tracing.py trace.jsonl
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def new_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class MetricsRegistry:
+    """Labelled counters and histograms, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Add a sample; names ending in _bytes or _tokens get size buckets, others latency buckets"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                sized = name.endswith("_bytes") or name.endswith("_tokens")
+                histogram = self._histograms[key] = Histogram(SIZE_BUCKETS if sized else LATENCY_BUCKETS)
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum}
+                    for (name, labels), h in self._histograms.items()
+                ],
+            }
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{name}{_labels(labels)} {value}")
+            for (name, labels), h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+metrics = MetricsRegistry()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start", "duration_s", "error")
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_id()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_s = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "service": _config["service"],
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_s": self.duration_s,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            **self.attributes,
+        }
+
+
+class JsonlExporter:
+    """Appends finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_config = {"service": "agent", "exporter": None, "server": None}
+
+
+def setup(service):
+    """Configure tracing for this process from TRACE_FILE and <SERVICE>_METRICS_PORT"""
+    _config["service"] = service
+    path = os.getenv("TRACE_FILE")
+    if path and _config["exporter"] is None:
+        _config["exporter"] = JsonlExporter(path)
+    port = os.getenv(f"{service.upper()}_METRICS_PORT")
+    if port and _config["server"] is None:
+        _config["server"] = serve_metrics(int(port))
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, trace_id=None, parent_id=None, **attributes):
+    """Time a block as a span, nested under the current span unless ids are given"""
+    parent = _current_span.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else new_id()
+        parent_id = parent.span_id if parent else None
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration_s = time.perf_counter() - start
+        _current_span.reset(token)
+        metrics.observe("span_duration_seconds", current.duration_s, span=name)
+        if current.error:
+            metrics.inc("span_errors_total", span=name)
+        exporter = _config["exporter"]
+        if exporter is not None:
+            exporter.export(current)
+
+
+def outgoing_meta():
+    """_meta fields that link a request to the current span on the other side"""
+    current = _current_span.get()
+    if current is None:
+        return {}
+    return {"trace_id": current.trace_id, "parent_span_id": current.span_id, "request_id": current.span_id}
+
+
+def _incoming_meta():
+    """The trace fields of the MCP request being handled, if any"""
+    try:
+        from mcp.server.lowlevel.server import request_ctx
+        meta = request_ctx.get().meta
+    except (ImportError, LookupError):
+        return {}
+    if meta is None:
+        return {}
+    fields = meta.model_extra or {}
+    return {key: fields.get(key) for key in ("trace_id", "parent_span_id", "request_id")}
+
+
+def traced_tool(fn):
+    """Wrap a tool so each call is a span linked to the client's request"""
+    name = fn.__name__
+
+    def start_span():
+        incoming = _incoming_meta()
+        return span(
+            "tool.run",
+            trace_id=incoming.get("trace_id"),
+            parent_id=incoming.get("parent_span_id"),
+            tool=name,
+            request_id=incoming.get("request_id"),
+        )
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with start_span():
+                result = await fn(*args, **kwargs)
+            metrics.inc("tool_runs_total", tool=name)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with start_span():
+                result = fn(*args, **kwargs)
+            metrics.inc("tool_runs_total", tool=name)
+            return result
+    return wrapper
+
+
+def instrument(mcp):
+    """Trace every tool registered on a FastMCP server from now on"""
+    register = mcp.tool
+
+    @functools.wraps(register)
+    def tool(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda fn: decorator(traced_tool(fn))
+
+    mcp.tool = tool
+    return mcp
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") == "/metrics":
+            body, content_type = metrics.render().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path.rstrip("/") == "/metrics.json":
+            body, content_type = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # stdout belongs to the stdio transport on the server
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def summarize(path):
+    """Per span name: count, total, median and p95 duration"""
+    durations = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            key = f"{record.get('service')}:{record['name']}"
+            durations.setdefault(key, []).append(record["duration_s"])
+    rows = []
+    for key, values in durations.items():
+        values.sort()
+        rows.append((sum(values), key, len(values), values[len(values) // 2], values[min(len(values) - 1, int(len(values) * 0.95))]))
+    rows.sort(reverse=True)
+    print(f"{'span':<32}{'count':>7}{'total':>12}{'median':>12}{'p95':>12}")
+    for total, key, count, median, p95 in rows:
+        print(f"{key:<32}{count:>7}{total * 1e3:>10.1f}ms{median * 1e3:>10.2f}ms{p95 * 1e3:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1] if len(sys.argv) > 1 else os.getenv("TRACE_FILE", "trace.jsonl"))